@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Пакетный предсказатель safety_index по сохранённой модели.
+
+Загружает бустер XGBoost и манифест признаков (save_model_artifact) один
+раз, строит признаки той же логикой, что и при обучении, и оценивает
+большие таблицы погода × дрон батчами фиксированного размера через
+inplace_predict, без пересоздания DMatrix.
+
+xgboost импортируется при загрузке модели, поэтому модули, которым
+нужны только ModelArtifact и build_feature_array, импортируются быстро.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from drone_registry import DroneRegistry, load_drone_registry, weather_arrays
+from train_safety_model import build_feature_matrix, calc_safety_class_vec
+
+if TYPE_CHECKING:
+    import xgboost as xgb
+
+
+DEFAULT_BATCH_SIZE = 65536
+
+
+class ModelArtifact(NamedTuple):
+    """Загруженная модель и её схема признаков."""
+    booster: xgb.Booster
+    feature_cols: List[str]
+    schema: Dict
+
+
+def load_model_artifact(model_dir: str = "models", n_jobs: int = -1) -> ModelArtifact:
+    """Загружает бустер и манифест признаков из каталога модели."""
+    import xgboost as xgb
+
+    with open(os.path.join(model_dir, "feature_schema.json"), 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+
+    booster = xgb.Booster()
+    booster.load_model(os.path.join(model_dir, schema['model_file']))
+    if n_jobs > 0:
+        booster.set_param({'nthread': n_jobs})
+
+    return ModelArtifact(booster=booster, feature_cols=schema['feature_cols'], schema=schema)
+
+
+def build_feature_array(artifact: ModelArtifact, df: pd.DataFrame) -> np.ndarray:
+    """Строит float32 матрицу признаков в порядке схемы модели."""
+    return build_feature_matrix(df, artifact.feature_cols)
+
+
+def predict_safety_index(artifact: ModelArtifact, df: pd.DataFrame,
+                         batch_size: int = DEFAULT_BATCH_SIZE,
+                         verbose: bool = True) -> np.ndarray:
+    """Предсказывает safety_index для строк df (погода + паспорт дрона) батчами."""
+    n_rows = len(df)
+    predictions = np.empty(n_rows, dtype=np.float32)
+
+    started = time.perf_counter()
+    for start in range(0, n_rows, batch_size):
+        batch = df.iloc[start:start + batch_size]
+        X = build_feature_array(artifact, batch)
+        predictions[start:start + len(batch)] = artifact.booster.inplace_predict(X)
+
+    elapsed = time.perf_counter() - started
+    if verbose and n_rows:
+        rows_per_sec = n_rows / elapsed if elapsed > 0 else float('inf')
+        print(f"Оценено {n_rows} строк за {elapsed:.2f} с ({rows_per_sec:,.0f} строк/с)")
+
+    # Модель регрессии может выйти за пределы шкалы
+    return np.clip(predictions, 0, 100)
+
+
+def score_weather_for_drones(artifact: ModelArtifact, weather_df: pd.DataFrame,
+                             drone_specs: Union[pd.DataFrame, DroneRegistry],
+                             drone_ids: Optional[List[str]] = None,
+                             batch_size: int = DEFAULT_BATCH_SIZE) -> pd.DataFrame:
+    """Оценивает каждую погодную строку для каждого выбранного дрона.
+
+    Таблица погода × дрон не материализуется целиком: погодные столбцы
+    извлекаются один раз, а матрица признаков очередного батча собирается
+    из них и строки паспортного блока дрона (см. drone_registry.py).
+    """
+    registry = (drone_specs if isinstance(drone_specs, DroneRegistry)
+                else DroneRegistry.from_dataframe(drone_specs))
+    selected = range(len(registry))
+    if drone_ids is not None:
+        wanted = set(drone_ids)
+        selected = [i for i, drone_id in enumerate(registry.drone_ids) if drone_id in wanted]
+
+    weather = weather_arrays(weather_df, artifact.feature_cols)
+    n_rows = len(weather_df)
+    results = []
+    started = time.perf_counter()
+    for i in selected:
+        safety_index = np.empty(n_rows, dtype=np.float32)
+        for start in range(0, n_rows, batch_size):
+            batch = {col: values[start:start + batch_size] for col, values in weather.items()}
+            X = registry.feature_matrix(artifact.feature_cols, batch, i)
+            safety_index[start:start + len(X)] = artifact.booster.inplace_predict(X)
+        # Модель регрессии может выйти за пределы шкалы
+        safety_index = np.clip(safety_index, 0, 100)
+
+        results.append(pd.DataFrame({
+            'drone_id': registry.drone_ids[i],
+            'timestamp': weather_df['timestamp'].to_numpy(),
+            'lat': weather_df['lat'].to_numpy(),
+            'lon': weather_df['lon'].to_numpy(),
+            'safety_index_pred': safety_index,
+            'safety_class_pred': calc_safety_class_vec(safety_index),
+        }))
+
+    scored_df = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+    elapsed = time.perf_counter() - started
+    rows_per_sec = len(scored_df) / elapsed if elapsed > 0 else float('inf')
+    print(f"Оценено {len(scored_df)} строк погода × дрон за {elapsed:.2f} с "
+          f"({rows_per_sec:,.0f} строк/с)")
+    return scored_df
+
+
+def main(argv: Optional[List[str]] = None):
+    """Оценивает погодную таблицу для всех дронов из паспортов."""
+    parser = argparse.ArgumentParser(description="Пакетная оценка safety_index")
+    parser.add_argument('--model-dir', default="models")
+    parser.add_argument('--weather', default="data/weather.csv",
+                        help="CSV или каталог Parquet-хранилища погоды")
+    parser.add_argument('--drones', default="data/drone_specs.csv")
+    parser.add_argument('--output', default="data/safety_scores.csv")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    artifact = load_model_artifact(args.model_dir)
+    if os.path.isdir(args.weather):
+        from weather_store import read_weather_store
+        weather_df = read_weather_store(args.weather)
+    else:
+        weather_df = pd.read_csv(args.weather, parse_dates=['timestamp'])
+    registry = load_drone_registry(args.drones)
+
+    scored_df = score_weather_for_drones(artifact, weather_df, registry,
+                                         batch_size=args.batch_size)
+    scored_df.to_csv(args.output, index=False)
+    print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
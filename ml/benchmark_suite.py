@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки горячих путей ML пайплайна с отслеживанием регрессий.
+
+Все данные синтетические и создаются локально: сетка погоды задаётся
+размером (--lat × --lon), числом шагов времени (--times) и числом
+дронов (--drones) и записывается в GRIB2 (eccodes) и NetCDF (xarray),
+так что конвертация замеряется на настоящих файлах без ERA5.
+
+Замеряются:
+- synthetic_weather — генерация погодной таблицы (synthetic_weather.py);
+- convert_grib / convert_netcdf — файл → погодная таблица;
+- build_dataset — декартово произведение дрон × погода с признаками;
+- labelling — calc_safety_index_vec;
+- training — train_xgboost_model;
+- batch_inference — predict_safety_index по всей таблице дрон × погода;
+- drone_scoring — score_weather_for_drones: погода × все дроны через реестр;
+- request_latency — ответ на один запрос прогноза (ряд из индекса,
+  признаки из реестра дронов, предсказание), p50 / p99;
+- startup_<модуль> — импорт точки входа в новом интерпретаторе
+  (startup_python — сам интерпретатор без импортов).
+
+Результаты сохраняются базовой линией (--save-baseline), режим
+--compare сравнивает прогон с ней и завершается с кодом 1, если
+лучшее время какого-то замера больше базового больше чем на tolerance.
+
+Запуск (из каталога ml/):
+    python benchmark_suite.py --size small --save-baseline
+    python benchmark_suite.py --size small --compare --tolerance 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+import xgboost as xgb
+
+from batch_predictor import (
+    build_feature_array,
+    load_model_artifact,
+    predict_safety_index,
+    score_weather_for_drones,
+)
+from drone_registry import DroneRegistry
+from flight_analytics import backfill_analytics, synthetic_flight_history
+from flight_monitor import FlightMonitor, synthetic_telemetry
+from train_safety_model import (
+    build_training_dataset,
+    calc_safety_class_vec,
+    calc_safety_index_vec,
+    extract_weather_table,
+    finalize_weather_table,
+    grib_to_weather_table,
+    resolve_grid_coords,
+    resolve_weather_vars,
+    save_model_artifact,
+    train_xgboost_model,
+)
+from safety_explanations import explain_rows
+from safety_tiles import update_safety_tiles
+from synthetic_inputs import synthetic_drone_specs, synthetic_era5_dataset, write_synthetic_grib
+from synthetic_weather import synthetic_weather_table
+from weather_index import WeatherGridIndex
+
+
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+# Наборы размеров: (lat, lon, times, drones)
+SIZES = {
+    'small': (20, 20, 48, 10),
+    'medium': (60, 60, 72, 30),
+    'large': (120, 120, 168, 42),
+}
+
+# Активных полётов в такте бенчмарка monitor_tick
+MONITOR_FLIGHTS = 5000
+
+# Исходов полётов в истории бенчмарка analytics_backfill
+ANALYTICS_FLIGHTS = 100000
+
+# Точки входа, для которых замеряется время запуска (импорт в новом процессе)
+STARTUP_ENTRY_POINTS = [
+    'cli', 'train_safety_model', 'batch_predictor', 'scoring_service', 'route_scoring',
+    'start_time_optimizer', 'incremental_training', 'large_scale_training', 'hyperparameter_search',
+]
+
+
+def write_synthetic_netcdf(ds: xr.Dataset, path: str) -> str:
+    """Записывает датасет в NetCDF."""
+    ds.to_netcdf(path)
+    return path
+
+
+def netcdf_to_weather_table(path: str) -> pd.DataFrame:
+    """Конвертация NetCDF в погодную таблицу тем же векторным путём, что и GRIB."""
+    with xr.open_dataset(path) as ds:
+        var_map = resolve_weather_vars(ds)
+        time_coord, lat_coord, lon_coord = resolve_grid_coords(ds)
+        return finalize_weather_table(extract_weather_table(ds, var_map, time_coord, lat_coord, lon_coord))
+
+
+def measure(fn: Callable, repeat: int = 3) -> Dict[str, float]:
+    """Запускает fn repeat раз без вывода в консоль; медиана и минимум времени."""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+    return {'seconds': float(np.median(timings)), 'min_seconds': float(np.min(timings))}
+
+
+def measure_startup(module: Optional[str], repeat: int = 3) -> Dict[str, float]:
+    """Время запуска интерпретатора с импортом module (None — без импорта)."""
+    code = 'pass' if module is None else f'import {module}'
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    return measure(lambda: subprocess.run([sys.executable, '-c', code], cwd=cwd, check=True), repeat)
+
+
+def run_benchmarks(n_lat: int, n_lon: int, n_times: int, n_drones: int,
+                   repeat: int = 3, latency_requests: int = 200,
+                   only: Optional[List[str]] = None) -> Dict:
+    """Создаёт синтетические данные и замеряет все бенчмарки."""
+    # cfgrib логирует пропущенные при первом открытии переменные с трассировкой
+    logging.getLogger('cfgrib').setLevel(logging.CRITICAL)
+    results = {}
+    # --only startup выбирает все startup_<модуль>
+    selected = lambda name: only is None or any(name == o or name.startswith(o + '_') for o in only)
+
+    def record(name: str, rows: Optional[int], timing: Dict[str, float], **extra):
+        rate = rows / timing['seconds'] if rows and timing['seconds'] > 0 else None
+        timing.update(rows=rows, rows_per_sec=rate, **extra)
+        results[name] = timing
+        throughput = f"{rows:>10d} строк  {rate:>12,.0f} строк/с" if rate else ""
+        print(f"  {name:30s} {timing['seconds'] * 1000:10.1f} мс  {throughput}".rstrip())
+
+    with tempfile.TemporaryDirectory(prefix="guardian_bench_") as tmp:
+        ds = synthetic_era5_dataset(n_lat, n_lon, n_times)
+        drones = synthetic_drone_specs(n_drones)
+        n_cells = n_lat * n_lon * n_times
+
+        if selected('synthetic_weather'):
+            times = pd.DatetimeIndex(ds['time'].values)
+            lats, lons = ds['latitude'].values, ds['longitude'].values
+            record('synthetic_weather', n_cells,
+                   measure(lambda: synthetic_weather_table(times, lats, lons), repeat))
+
+        grib_path = os.path.join(tmp, "bench.grib")
+        nc_path = os.path.join(tmp, "bench.nc")
+        write_synthetic_netcdf(ds, nc_path)
+
+        if selected('convert_grib'):
+            try:
+                write_synthetic_grib(ds, grib_path)
+            except ImportError:
+                print(f"  {'convert_grib':30s} пропущен: eccodes не установлен")
+            else:
+                # cfgrib пишет индекс рядом с файлом; удаляем его, чтобы каждый
+                # повтор замерял полное чтение
+                def convert_grib():
+                    for name in os.listdir(tmp):
+                        if name.endswith('.idx'):
+                            os.remove(os.path.join(tmp, name))
+                    grib_to_weather_table(grib_path)
+                record('convert_grib', n_cells, measure(convert_grib, repeat))
+
+        if selected('convert_netcdf'):
+            record('convert_netcdf', n_cells, measure(lambda: netcdf_to_weather_table(nc_path), repeat))
+
+        weather_df = netcdf_to_weather_table(nc_path)
+
+        # Полное декартово произведение дрон × погода
+        build = lambda: build_training_dataset(drones, weather_df, samples_per_drone=None)
+        if selected('build_dataset'):
+            record('build_dataset', n_cells * n_drones, measure(build, repeat))
+        with contextlib.redirect_stdout(io.StringIO()):
+            train_df = build()
+
+        if selected('labelling'):
+            record('labelling', len(train_df), measure(lambda: calc_safety_index_vec(train_df), repeat))
+
+        # Обучение на ограниченной выборке: время растёт с числом строк и деревьев
+        fit_df = train_df.sample(n=min(len(train_df), 200_000), random_state=42)
+        with contextlib.redirect_stdout(io.StringIO()):
+            model, *_, feature_cols = train_xgboost_model(fit_df)
+        if selected('training'):
+            record('training', len(fit_df), measure(lambda: train_xgboost_model(fit_df), 1))
+
+        model_dir = os.path.join(tmp, "models")
+        with contextlib.redirect_stdout(io.StringIO()):
+            save_model_artifact(model, feature_cols, model_dir)
+        artifact = load_model_artifact(model_dir)
+
+        if selected('batch_inference'):
+            record('batch_inference', len(train_df),
+                   measure(lambda: predict_safety_index(artifact, train_df, verbose=False), repeat))
+
+        # Объяснения тех же строк: разложение по правилам и SHAP approx
+        if selected('explain_factors'):
+            record('explain_factors', len(train_df), measure(lambda: explain_rows(train_df), repeat))
+        if selected('explain_shap'):
+            X_train = build_feature_array(artifact, train_df)
+            record('explain_shap', len(train_df),
+                   measure(lambda: explain_rows(train_df, artifact, 'approx', X_train), repeat))
+
+        registry = DroneRegistry.from_dataframe(drones)
+        if selected('drone_scoring'):
+            record('drone_scoring', n_cells * n_drones,
+                   measure(lambda: score_weather_for_drones(artifact, weather_df, registry), repeat))
+
+        if selected('safety_tiles'):
+            tiles_dir = os.path.join(tmp, "safety_tiles")
+            record('safety_tiles', n_cells * n_drones,
+                   measure(lambda: update_safety_tiles(tiles_dir, artifact, registry, weather_df, full=True),
+                           repeat))
+
+        if selected('request_latency'):
+            index = WeatherGridIndex.from_weather_df(weather_df)
+            rng = np.random.default_rng(0)
+            start = pd.Timestamp(ds['time'].values[0])
+            hours = min(24, n_times)
+
+            def request(lat: float, lon: float):
+                weather = index.series(lat, lon, start, hours)
+                X = registry.feature_matrix(artifact.feature_cols, weather, 0)
+                safety_index = artifact.booster.inplace_predict(X)
+                return calc_safety_class_vec(np.clip(safety_index, 0, 100))
+
+            lats = rng.uniform(ds['latitude'].values.min(), ds['latitude'].values.max(), latency_requests)
+            lons = rng.uniform(ds['longitude'].values.min(), ds['longitude'].values.max(), latency_requests)
+            latencies = []
+            for lat, lon in zip(lats, lons):
+                started = time.perf_counter()
+                request(lat, lon)
+                latencies.append(time.perf_counter() - started)
+            latencies = np.array(latencies)
+            record('request_latency', hours,
+                   {'seconds': float(np.percentile(latencies, 50)),
+                    'min_seconds': float(latencies.min())},
+                   p99_seconds=float(np.percentile(latencies, 99)))
+
+        if selected('monitor_tick'):
+            # Такт монитора: приём телеметрии всех полётов и их пакетная оценка
+            monitor = FlightMonitor(artifact, registry, WeatherGridIndex.from_weather_df(weather_df))
+            messages = [json.loads(line) for line in
+                        synthetic_telemetry(registry, monitor.weather, MONITOR_FLIGHTS, 1)]
+
+            def monitor_tick():
+                for message in messages:
+                    monitor.ingest(message)
+                monitor.score()
+            record('monitor_tick', MONITOR_FLIGHTS, measure(monitor_tick, repeat))
+
+        if selected('analytics_backfill') or selected('analytics_query'):
+            weather_index = WeatherGridIndex.from_weather_df(weather_df)
+            history = synthetic_flight_history(registry, weather_index, ANALYTICS_FLIGHTS)
+            if selected('analytics_backfill'):
+                record('analytics_backfill', ANALYTICS_FLIGHTS,
+                       measure(lambda: backfill_analytics(history, registry, weather_index), repeat))
+            if selected('analytics_query'):
+                # Запрос дашборда читает только роллапы, без истории
+                analytics = backfill_analytics(history, registry, weather_index)
+                record('analytics_query', len(analytics.days), measure(analytics.analytics_data, repeat))
+
+    for module in [None] + STARTUP_ENTRY_POINTS:
+        name = f"startup_{module or 'python'}"
+        if selected(name):
+            record(name, None, measure_startup(module, repeat))
+
+    return results
+
+
+def environment_info() -> Dict:
+    """Окружение прогона: результаты сравнимы только на похожей машине."""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'xgboost': xgb.__version__,
+    }
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Сравнивает с базовой линией лучшее время из повторов; возвращает список регрессий.
+
+    Минимум устойчивее медианы к шуму соседних процессов: замедлить код
+    он может, а ускорить — нет.
+    """
+    regressions = []
+    print(f"\nСРАВНЕНИЕ С БАЗОВОЙ ЛИНИЕЙ (допуск {tolerance:.0%}):")
+    for name, current in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"  {name:30s} нет в базовой линии")
+            continue
+        ratio = current['min_seconds'] / base['min_seconds'] if base['min_seconds'] > 0 else float('inf')
+        status = "РЕГРЕССИЯ" if ratio > 1 + tolerance else "ok"
+        print(f"  {name:30s} {base['min_seconds'] * 1000:10.1f} → {current['min_seconds'] * 1000:10.1f} мс  "
+              f"×{ratio:.2f}  {status}")
+        if status != "ok":
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    """Запускает бенчмарки, сохраняет или сравнивает базовую линию."""
+    parser = argparse.ArgumentParser(description="Бенчмарки ML пайплайна")
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--lat', type=int, help="точек сетки по широте (переопределяет --size)")
+    parser.add_argument('--lon', type=int)
+    parser.add_argument('--times', type=int)
+    parser.add_argument('--drones', type=int)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', default=None, help="запустить только эти бенчмарки")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="допустимое замедление относительно базовой линии (0.2 = 20%%)")
+    parser.add_argument('--output', default=None, help="сохранить результаты прогона в JSON")
+    args = parser.parse_args(argv)
+
+    n_lat, n_lon, n_times, n_drones = SIZES[args.size]
+    params = {
+        'lat': args.lat or n_lat, 'lon': args.lon or n_lon,
+        'times': args.times or n_times, 'drones': args.drones or n_drones,
+    }
+    print(f"БЕНЧМАРКИ: сетка {params['lat']}×{params['lon']}, {params['times']} шагов времени, "
+          f"{params['drones']} дронов\n")
+    results = run_benchmarks(params['lat'], params['lon'], params['times'], params['drones'],
+                             repeat=args.repeat, only=args.only)
+    run = {'params': params, 'environment': environment_info(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(run, f, ensure_ascii=False, indent=2)
+        print(f"\nБазовая линия сохранена в {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['params'] != params:
+            print(f"\nWARNING: размеры прогона {params} отличаются от базовой линии {baseline['params']}")
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nРегрессии производительности: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nРегрессий нет")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Единая точка входа ML пайплайна с подкомандами.
+
+Каждая подкоманда импортирует только свой модуль и его зависимости:
+`cli.py predict` не загружает xarray / cfgrib и sklearn, `cli.py build`
+не загружает xgboost. Сам cli.py импортирует только стандартную
+библиотеку, поэтому `cli.py --help` отвечает сразу.
+
+Запуск (из каталога ml/):
+    python cli.py convert --grib data/data.grib --store data/weather_store
+    python cli.py build --samples-per-drone 50
+    python cli.py train --report reports/run_report.json
+    python cli.py predict --weather data/weather_store
+    python cli.py bench --size small --compare
+"""
+
+import argparse
+import importlib
+import os
+import sys
+from typing import List, Optional
+
+
+def convert(argv: Optional[List[str]] = None):
+    """GRIB → data/weather.csv и колоночное хранилище."""
+    parser = argparse.ArgumentParser(prog="cli.py convert", description=convert.__doc__)
+    parser.add_argument('--grib', default="data/data.grib")
+    parser.add_argument('--output', default="data/weather.csv")
+    parser.add_argument('--store', default="data/weather_store",
+                        help="каталог колоночного хранилища ('' — не писать)")
+    parser.add_argument('--cache-dir', default="data/cache", help="'' — без кэша конвертации")
+    parser.add_argument('--stream', action='store_true',
+                        help="потоковая конвертация кусками по времени с ограниченной памятью")
+    parser.add_argument('--chunk-size', type=int, default=24, help="шагов времени в куске (--stream)")
+    args = parser.parse_args(argv)
+
+    from train_safety_model import convert_grib_to_weather_csv, stream_grib_to_weather_csv
+
+    if args.stream:
+        stream_grib_to_weather_csv(args.grib, args.output, args.chunk_size, store_dir=args.store or None)
+    else:
+        convert_grib_to_weather_csv(args.grib, args.output, store_dir=args.store or None,
+                                    cache_dir=args.cache_dir or None)
+
+
+def build(argv: Optional[List[str]] = None):
+    """Обучающий датасет дрон × погода с разметкой safety_index."""
+    parser = argparse.ArgumentParser(prog="cli.py build", description=build.__doc__)
+    parser.add_argument('--drones', default="data/drone_specs.csv")
+    parser.add_argument('--weather', default="data/weather.csv",
+                        help="CSV или каталог Parquet-хранилища погоды")
+    parser.add_argument('--output', default="data/training_dataset.csv")
+    parser.add_argument('--samples-per-drone', type=int, default=20)
+    parser.add_argument('--full', action='store_true',
+                        help="полное декартово произведение дрон × погода")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    from train_safety_model import build_training_dataset, load_drone_specs
+
+    if os.path.isdir(args.weather):
+        from weather_store import read_weather_store
+        weather_df = read_weather_store(args.weather)
+    else:
+        weather_df = pd.read_csv(args.weather, parse_dates=['timestamp'])
+    drone_specs_df = load_drone_specs(args.drones)
+
+    samples = None if args.full else args.samples_per_drone
+    train_df = build_training_dataset(drone_specs_df, weather_df, samples_per_drone=samples)
+    train_df.to_csv(args.output, index=False)
+    print(f"\nДатасет из {len(train_df)} строк сохранён в {args.output}")
+
+
+# Подкоманда → (модуль, функция, описание); модуль импортируется только при вызове,
+# None — функция этого файла
+COMMANDS = {
+    'convert': (None, 'convert', "GRIB → погодная таблица и колоночное хранилище"),
+    'build': (None, 'build', "обучающий датасет дрон × погода с разметкой"),
+    'train': ('train_safety_model', 'cli_main', "полный пайплайн обучения с отчётом запуска"),
+    'tune': ('hyperparameter_search', 'main', "параллельный подбор гиперпараметров"),
+    'synth': ('synthetic_weather', 'main', "синтетическая погода в CSV / хранилище"),
+    'ingest': ('grib_ingest', 'main', "параллельная загрузка архива GRIB в хранилище"),
+    'predict': ('batch_predictor', 'main', "пакетная оценка safety_index по сохранённой модели"),
+    'explain': ('safety_explanations', 'main', "разложение safety_index по факторам и SHAP"),
+    'monitor': ('flight_monitor', 'main', "мониторинг активных полётов по телеметрии, нагрузочный тест"),
+    'tiles': ('safety_tiles', 'main', "тайлы safety_index по категориям и часам для карты"),
+    'analytics': ('flight_analytics', 'main', "роллапы аналитики полётов по истории (backfill)"),
+    'bench': ('benchmark_suite', 'main', "бенчмарки горячих путей и сравнение с базовой линией"),
+}
+
+
+def print_usage():
+    """Печатает список подкоманд."""
+    print("Использование: python cli.py <команда> [параметры]\n\nКоманды:")
+    for name, (_, _, description) in COMMANDS.items():
+        print(f"  {name:10s} {description}")
+    print("\npython cli.py <команда> --help — параметры команды")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Разбирает подкоманду и передаёт остальные аргументы её обработчику."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print_usage()
+        return 0
+    if argv[0] not in COMMANDS:
+        print(f"Неизвестная команда: {argv[0]}\n")
+        print_usage()
+        return 2
+
+    module_name, func_name, _ = COMMANDS[argv[0]]
+    if module_name is None:
+        handler = globals()[func_name]
+    else:
+        handler = getattr(importlib.import_module(module_name), func_name)
+    handler(argv[1:])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
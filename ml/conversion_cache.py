@@ -0,0 +1,185 @@
+"""
+Кэш конвертации GRIB -> колоночная погодная таблица.
+
+Ключ записи — SHA-256 содержимого GRIB файла плюс таблица псевдонимов
+переменных, по которой определяется состав столбцов. Хэш файла
+запоминается по (размер, mtime), поэтому повторный запуск не читает
+многогигабайтный файл заново. Размер каталога кэша ограничен: при
+превышении лимита удаляются давно не использованные записи (LRU).
+
+Записи хранят столбцы в float64: попадание в кэш возвращает ту же
+таблицу, что и конвертация, и разметка не зависит от состояния кэша.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from weather_store import read_weather_store, write_weather_store
+
+
+# Версия формата записей; увеличивается при изменении логики конвертации
+CACHE_FORMAT_VERSION = 2
+
+DEFAULT_CACHE_DIR = "data/cache"
+DEFAULT_MAX_CACHE_BYTES = 10 * 1024 ** 3
+
+_FINGERPRINTS_FILE = "fingerprints.json"
+_META_FILE = "meta.json"
+_STORE_SUBDIR = "store"
+
+
+def _read_json(path: str) -> Dict:
+    """Читает JSON файл, возвращает пустой словарь, если файла нет."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data: Dict):
+    """Атомарно записывает JSON файл."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _dir_size(path: str) -> int:
+    """Возвращает суммарный размер файлов в каталоге (байт)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def file_fingerprint(path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """Возвращает SHA-256 содержимого файла, переиспользуя хэш при неизменных размере и mtime."""
+    os.makedirs(cache_dir, exist_ok=True)
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    fingerprints_path = os.path.join(cache_dir, _FINGERPRINTS_FILE)
+    fingerprints = _read_json(fingerprints_path)
+
+    known = fingerprints.get(abs_path)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['sha256']
+
+    digest = hashlib.sha256()
+    with open(abs_path, 'rb') as f:
+        for block in iter(lambda: f.read(4 * 1024 * 1024), b''):
+            digest.update(block)
+
+    fingerprints[abs_path] = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest.hexdigest(),
+    }
+    _write_json(fingerprints_path, fingerprints)
+    return digest.hexdigest()
+
+
+def cache_key(grib_path: str, var_aliases: Dict, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """Строит ключ записи кэша по содержимому файла и таблице псевдонимов переменных."""
+    payload = json.dumps({
+        'sha256': file_fingerprint(grib_path, cache_dir),
+        'aliases': var_aliases,
+        'version': CACHE_FORMAT_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def load_cached_weather(key: str, cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[pd.DataFrame]:
+    """Загружает погодную таблицу из кэша, возвращает None при промахе."""
+    entry_dir = os.path.join(cache_dir, key)
+    meta_path = os.path.join(entry_dir, _META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    meta = _read_json(meta_path)
+    meta['last_used'] = time.time()
+    _write_json(meta_path, meta)
+
+    return read_weather_store(os.path.join(entry_dir, _STORE_SUBDIR))
+
+
+def save_cached_weather(key: str, grib_path: str, weather_df: pd.DataFrame,
+                        var_map: Dict[str, Optional[str]],
+                        cache_dir: str = DEFAULT_CACHE_DIR,
+                        max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+    """Сохраняет результат конвертации в кэш и применяет ограничение размера."""
+    entry_dir = os.path.join(cache_dir, key)
+    write_weather_store(weather_df, os.path.join(entry_dir, _STORE_SUBDIR), float_dtype=np.float64)
+    _write_json(os.path.join(entry_dir, _META_FILE), {
+        'grib_path': os.path.abspath(grib_path),
+        'var_map': var_map,
+        'rows': len(weather_df),
+        'created': time.time(),
+        'last_used': time.time(),
+    })
+    evict_cache(cache_dir, max_bytes)
+
+
+def _cache_entries(cache_dir: str):
+    """Возвращает список (ключ, meta) всех записей кэша."""
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, name, _META_FILE)
+        if os.path.exists(meta_path):
+            entries.append((name, _read_json(meta_path)))
+    return entries
+
+
+def evict_cache(cache_dir: str = DEFAULT_CACHE_DIR,
+                max_bytes: int = DEFAULT_MAX_CACHE_BYTES) -> int:
+    """Удаляет давно не использованные записи, пока кэш не уложится в max_bytes.
+
+    Возвращает число удалённых записей.
+    """
+    entries = _cache_entries(cache_dir)
+    sizes = {key: _dir_size(os.path.join(cache_dir, key)) for key, _ in entries}
+    total = sum(sizes.values())
+
+    removed = 0
+    for key, _ in sorted(entries, key=lambda e: e[1].get('last_used', 0)):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+        total -= sizes[key]
+        removed += 1
+    return removed
+
+
+def invalidate_cache(grib_path: Optional[str] = None,
+                     cache_dir: str = DEFAULT_CACHE_DIR) -> int:
+    """Удаляет записи кэша для файла grib_path или весь кэш, если путь не задан.
+
+    Возвращает число удалённых записей.
+    """
+    if grib_path is None:
+        removed = len(_cache_entries(cache_dir))
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return removed
+
+    abs_path = os.path.abspath(grib_path)
+    removed = 0
+    for key, meta in _cache_entries(cache_dir):
+        if meta.get('grib_path') == abs_path:
+            shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+            removed += 1
+
+    # Забываем и запомненный хэш, чтобы следующий запуск пересчитал его
+    fingerprints_path = os.path.join(cache_dir, _FINGERPRINTS_FILE)
+    fingerprints = _read_json(fingerprints_path)
+    if fingerprints.pop(abs_path, None) is not None:
+        _write_json(fingerprints_path, fingerprints)
+    return removed
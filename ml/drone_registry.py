@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Реестр паспортов дронов: структура массивов с поиском по drone_id за O(1).
+
+Паспорта загружаются один раз: числовые характеристики лежат одной
+float64 матрицей (дрон × столбец), категории и идентификаторы — массивами,
+drone_id → номер строки — словарём. Заранее вычисляются константы дрона:
+1 / max_wind_mps для отношений ветра к лимиту и, для каждой схемы
+признаков модели, блок паспортных признаков вместе с one-hot вектором
+категории. Матрица признаков пар дрон × погода собирается выборкой строк
+этого блока и погодных столбцов по индексам, без копирования паспорта в
+каждую строку DataFrame.
+
+Массивы реестра только для чтения. save() пишет их в .npy, а
+DroneRegistry.load(..., mmap=True) открывает через memory-map, так что
+процессы-воркеры делят одни страницы памяти.
+
+Запуск (из каталога ml/):
+    python drone_registry.py --drones data/drone_specs.csv --output data/drone_registry
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from train_safety_model import DRONE_SPEC_COLUMNS
+
+
+# Числовые столбцы паспорта в порядке столбцов матрицы specs
+NUMERIC_SPEC_COLUMNS = [c for c in DRONE_SPEC_COLUMNS if c != 'category']
+
+# Погодные столбцы, из которых вычисляются отношения к лимитам дрона
+PAIR_WEATHER_COLUMNS = ['wind_speed', 'wind_gust', 'temp_c', 'precip']
+
+# Видимость по умолчанию, как в calc_safety_index и build_feature_matrix
+DEFAULT_VISIBILITY_KM = 10.0
+
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    values.setflags(write=False)
+    return values
+
+
+def weather_arrays(weather_df: pd.DataFrame, feature_cols: Sequence[str]) -> Dict[str, np.ndarray]:
+    """float64 столбцы погоды, нужные схеме признаков; извлекаются один раз на таблицу."""
+    needed = set(feature_cols) | set(PAIR_WEATHER_COLUMNS)
+    return {col: weather_df[col].to_numpy(dtype=np.float64)
+            for col in weather_df.columns if col in needed}
+
+
+class DroneRegistry:
+    """Паспорта дронов в виде структуры массивов."""
+
+    __slots__ = ('drone_ids', 'categories', 'specs', 'inv_max_wind', '_row', '_blocks')
+
+    def __init__(self, drone_ids: Sequence[str], categories: Sequence[str],
+                 specs: np.ndarray, inv_max_wind: Optional[np.ndarray] = None):
+        self.drone_ids = _read_only(np.asarray(drone_ids, dtype=object))
+        self.categories = _read_only(np.asarray(categories, dtype=object))
+        self.specs = _read_only(specs)
+        if inv_max_wind is None:
+            # При max_wind = 0 получаем inf, как и при делении в engineered_features
+            with np.errstate(divide='ignore'):
+                inv_max_wind = 1.0 / self.column('max_wind_mps')
+        self.inv_max_wind = _read_only(inv_max_wind)
+        self._row = {drone_id: i for i, drone_id in enumerate(self.drone_ids)}
+        if len(self._row) != len(self.drone_ids):
+            raise ValueError("drone_id в паспортах дронов повторяются")
+        # Блоки паспортных признаков по схеме признаков модели
+        self._blocks: Dict[tuple, np.ndarray] = {}
+
+    @classmethod
+    def from_dataframe(cls, drone_specs_df: pd.DataFrame) -> 'DroneRegistry':
+        """Строит реестр из таблицы паспортов (формат data/drone_specs.csv)."""
+        specs = drone_specs_df[NUMERIC_SPEC_COLUMNS].to_numpy(dtype=np.float64)
+        return cls(drone_specs_df['drone_id'].astype(str).to_numpy(),
+                   drone_specs_df['category'].to_numpy(), np.ascontiguousarray(specs))
+
+    def __len__(self) -> int:
+        return len(self.drone_ids)
+
+    def __contains__(self, drone_id: str) -> bool:
+        return drone_id in self._row
+
+    def index(self, drone_id: str) -> int:
+        """Номер строки дрона; KeyError для неизвестного drone_id."""
+        return self._row[drone_id]
+
+    def indices(self, drone_ids: Sequence[str]) -> np.ndarray:
+        """Номера строк для списка drone_id."""
+        return np.fromiter((self._row[d] for d in drone_ids), dtype=np.intp, count=len(drone_ids))
+
+    def column(self, name: str) -> np.ndarray:
+        """Числовой столбец паспорта по всем дронам (представление без копии)."""
+        return self.specs[:, NUMERIC_SPEC_COLUMNS.index(name)]
+
+    def spec(self, drone_id: str) -> Dict:
+        """Паспорт одного дрона словарём (для route_scoring и start_time_optimizer)."""
+        i = self._row[drone_id]
+        spec = {col: float(value) for col, value in zip(NUMERIC_SPEC_COLUMNS, self.specs[i])}
+        spec['category'] = self.categories[i]
+        spec['drone_id'] = drone_id
+        return spec
+
+    def to_frame(self) -> pd.DataFrame:
+        """Таблица паспортов в формате data/drone_specs.csv."""
+        df = pd.DataFrame(np.asarray(self.specs), columns=NUMERIC_SPEC_COLUMNS)
+        df.insert(0, 'drone_id', self.drone_ids)
+        df['category'] = self.categories
+        return df[['drone_id'] + DRONE_SPEC_COLUMNS]
+
+    def feature_block(self, feature_cols: Sequence[str]) -> np.ndarray:
+        """float32 матрица дрон × признак: паспортные столбцы и one-hot категории.
+
+        Погодные и парные столбцы заполнены нулями. Вычисляется один раз
+        на схему признаков.
+        """
+        key = tuple(feature_cols)
+        block = self._blocks.get(key)
+        if block is None:
+            block = np.zeros((len(self), len(feature_cols)), dtype=np.float32)
+            for j, col in enumerate(feature_cols):
+                if col.startswith('category_'):
+                    block[:, j] = self.categories == col[len('category_'):]
+                elif col in NUMERIC_SPEC_COLUMNS:
+                    block[:, j] = self.column(col)
+            block[np.isnan(block)] = 0
+            self._blocks[key] = _read_only(block)
+        return block
+
+    def feature_matrix(self, feature_cols: Sequence[str],
+                       weather: Union[pd.DataFrame, Mapping[str, np.ndarray]],
+                       drone_idx: Union[int, np.ndarray]) -> np.ndarray:
+        """Матрица признаков для пар (дрон drone_idx[i], погодная строка i).
+
+        weather — погодная таблица или её столбцы (weather_arrays), drone_idx —
+        номер дрона для всех строк или массив номеров по строкам. Совпадает с
+        build_feature_matrix по той же таблице пар (с точностью до округления
+        float32: отношения ветра считаются умножением на 1 / max_wind_mps).
+        """
+        if isinstance(weather, pd.DataFrame):
+            weather = weather_arrays(weather, feature_cols)
+        n_rows = len(next(iter(weather.values())))
+        drone_idx = np.broadcast_to(np.asarray(drone_idx, dtype=np.intp), (n_rows,))
+        X = self.feature_block(feature_cols).take(drone_idx, axis=0)
+
+        weather_col = lambda name: weather[name]
+        spec_col = lambda name: self.column(name)[drone_idx]
+        for j, col in enumerate(feature_cols):
+            if col.startswith('category_') or col in NUMERIC_SPEC_COLUMNS:
+                continue
+            if col == 'wind_ratio':
+                values = weather_col('wind_speed') * self.inv_max_wind[drone_idx]
+            elif col == 'gust_ratio':
+                values = weather_col('wind_gust') * self.inv_max_wind[drone_idx]
+            elif col == 'temp_below':
+                values = np.maximum(0, spec_col('temp_min_c') - weather_col('temp_c'))
+            elif col == 'temp_above':
+                values = np.maximum(0, weather_col('temp_c') - spec_col('temp_max_c'))
+            elif col == 'precip_excess':
+                values = np.maximum(0, weather_col('precip') - spec_col('allow_precip_mmph'))
+            elif col in weather:
+                values = weather[col]
+            elif col == 'visibility_km':
+                values = DEFAULT_VISIBILITY_KM
+            else:
+                raise KeyError(f"Признак {col} не найден в погодной таблице")
+            X[:, j] = values
+        X[np.isnan(X)] = 0
+        return X
+
+    def save(self, directory: str) -> str:
+        """Сохраняет реестр в каталог: .npy массивы и JSON с идентификаторами."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "specs.npy"), np.asarray(self.specs))
+        np.save(os.path.join(directory, "inv_max_wind.npy"), np.asarray(self.inv_max_wind))
+        with open(os.path.join(directory, "registry.json"), 'w', encoding='utf-8') as f:
+            json.dump({'columns': NUMERIC_SPEC_COLUMNS,
+                       'drone_ids': list(self.drone_ids),
+                       'categories': list(self.categories)}, f, ensure_ascii=False)
+        return directory
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'DroneRegistry':
+        """Загружает реестр, сохранённый save(); mmap=True — массивы через memory-map."""
+        with open(os.path.join(directory, "registry.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['columns'] != NUMERIC_SPEC_COLUMNS:
+            raise ValueError(f"Реестр в {directory} сохранён с другими столбцами паспорта")
+        mmap_mode = 'r' if mmap else None
+        load = lambda name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+        return cls(meta['drone_ids'], meta['categories'], load('specs'), load('inv_max_wind'))
+
+
+def load_drone_registry(path: str = "data/drone_specs.csv") -> DroneRegistry:
+    """Загружает реестр из CSV паспортов или из каталога, сохранённого save()."""
+    if os.path.isdir(path):
+        return DroneRegistry.load(path)
+    return DroneRegistry.from_dataframe(pd.read_csv(path))
+
+
+def main(argv: Optional[List[str]] = None):
+    """Сохраняет реестр паспортов для загрузки через memory-map."""
+    parser = argparse.ArgumentParser(description="Реестр паспортов дронов")
+    parser.add_argument('--drones', default="data/drone_specs.csv")
+    parser.add_argument('--output', default="data/drone_registry")
+    args = parser.parse_args(argv)
+
+    registry = load_drone_registry(args.drones)
+    registry.save(args.output)
+    print(f"Реестр из {len(registry)} дронов сохранён в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Аналитика полётов (AnalyticsData / AnalyticsSummary фронтенда) на роллапах.
+
+Вместо пересчёта по всей истории полётов и погоды на каждую загрузку
+дашборда агрегаты хранятся готовыми: по дню (дата planned_start, UTC) и
+погодной корзине — матрица счётчиков корзина × METRICS (полёты,
+завершённые, сорванные, отменённые, отложенные, минуты налёта,
+предупреждения, экономия и потери). Запрос дашборда суммирует матрицы дней
+выбранного периода и не трогает историю.
+
+Погодная корзина полёта — класс безопасности calc_safety_class по
+правилам разметки и главный снижающий индекс фактор (ветер, температура,
+осадки, видимость по матрице штрафов calc_penalties_vec) или 'calm', если
+ни один фактор не снимает больше CALM_PENALTY пунктов. Всего
+len(SAFETY_CLASSES) × len(CONDITION_FACTORS) корзин.
+
+Исход полёта (completed, failed, cancelled, postponed) добавляется
+record за O(1): корзина считается по погоде одной точки, затем
+прибавляется строка метрик к матрице дня. Повторно пришедший исход того
+же полёта (flight_id, status) не учитывается дважды. Backfill строит
+роллапы по таблице истории одним векторным проходом: погода всех полётов —
+одним WeatherGridIndex.nearest, корзины — одной матрицей штрафов, суммы —
+np.bincount по (день, корзина). Корзину одного полёта flight_bucket
+считает тем же flight_buckets (погода ближайшего часа planned_start в UTC),
+поэтому исходы, записанные через record и через backfill, дают одинаковые
+матрицы.
+
+Роллапы, открытые через FlightAnalytics.open, пишут каждый исход record
+строкой в журнал рядом со снимком (JOURNAL_SUFFIX) и переживают падение
+процесса: при открытии журнал доигрывается поверх снимка, save сохраняет
+снимок и очищает журнал.
+
+Экономия — оценка предотвращённых потерь: отмена или перенос полёта из-за
+погоды в корзине yellow/red оценивается в AVOIDED_LOSS_RUB, сорванный
+полёт — в FAILURE_LOSS_RUB потерь; значения savings_rub / losses_rub в
+записи полёта заменяют оценки.
+
+Запуск (из каталога ml/):
+    python flight_analytics.py --flights data/flight_history.csv --weather data/weather_store
+    python flight_analytics.py --synthetic 100000 --weather data/weather_store --query
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Mapping, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from drone_registry import PAIR_WEATHER_COLUMNS, DroneRegistry, load_drone_registry
+from safety_explanations import FACTOR_NAMES, FACTORS, factor_deltas, pair_columns
+from train_safety_model import calc_penalties_vec, calc_safety_class_vec, safety_index_from_penalties
+from weather_index import WeatherGridIndex
+
+
+SAFETY_CLASSES = ['green', 'yellow', 'red']
+
+# Главный фактор корзины: 'calm' — погода почти не снижает индекс
+CONDITION_FACTORS = ['calm'] + FACTORS
+
+# Штраф (пунктов индекса), ниже которого фактор не считается главным
+CALM_PENALTY = 2.0
+
+BUCKETS = [f"{safety_class}/{factor}" for safety_class in SAFETY_CLASSES for factor in CONDITION_FACTORS]
+
+CLASS_NAMES = {'green': "Безопасно", 'yellow': "Осторожно", 'red': "Опасно"}
+CONDITION_NAMES = {'calm': "без ограничений", **FACTOR_NAMES}
+
+# Исходы полёта, которые попадают в аналитику; planned / in_flight ещё не исход
+FLIGHT_OUTCOMES = ('completed', 'failed', 'cancelled', 'postponed')
+
+# Счётчики корзины за день
+METRICS = [
+    'flights',          # завершённые, сорванные и отменённые (перенос — не отдельный полёт)
+    'completed',
+    'failed',
+    'cancelled',
+    'weather_cancels',  # отмены по погоде
+    'postponed',
+    'flight_minutes',   # налёт завершённых и сорванных полётов
+    'saved_minutes',    # плановые минуты отменённых и перенесённых из-за опасной погоды
+    'warnings',
+    'savings_rub',
+    'losses_rub',
+]
+_M = {name: k for k, name in enumerate(METRICS)}
+
+# Оценки экономики, если в записи полёта нет savings_rub / losses_rub
+AVOIDED_LOSS_RUB = 5000.0
+FAILURE_LOSS_RUB = 15000.0
+# Стоимость часа налёта для roi_percent
+FLIGHT_HOUR_COST_RUB = 3000.0
+RUB_PER_USD = 90.0
+
+# Столбцы таблицы истории полётов (поля Flight; location — плоскими lat / lon)
+HISTORY_COLUMNS = ['id', 'drone_id', 'status', 'planned_start', 'duration_minutes', 'lat', 'lon']
+OPTIONAL_HISTORY_COLUMNS = ['cancel_reason', 'warnings', 'savings_rub', 'losses_rub']
+
+ANALYTICS_VERSION = 1
+
+# Журнал исходов, записанных после последнего снимка
+JOURNAL_SUFFIX = ".journal"
+
+
+def weather_buckets(columns: Mapping[str, np.ndarray]) -> np.ndarray:
+    """Номера корзин BUCKETS для пар погода × паспорт (столбцы как у calc_penalties_vec)."""
+    penalties = calc_penalties_vec(columns)
+    safety_class = calc_safety_class_vec(safety_index_from_penalties(penalties))
+    class_idx = np.select([safety_class == 'green', safety_class == 'yellow'], [0, 1], 2)
+
+    losses = -factor_deltas(penalties)
+    worst = np.argmax(losses, axis=1)
+    factor_idx = np.where(losses[np.arange(len(losses)), worst] >= CALM_PENALTY, worst + 1, 0)
+    return (class_idx * len(CONDITION_FACTORS) + factor_idx).astype(np.intp)
+
+
+def _optional_column(values, n_rows: int, default) -> np.ndarray:
+    if values is None:
+        return np.full(n_rows, default)
+    return np.asarray(values)
+
+
+def outcome_metrics(status: np.ndarray, buckets: np.ndarray, duration_minutes: np.ndarray,
+                    cancel_reason: Optional[np.ndarray] = None, warnings: Optional[np.ndarray] = None,
+                    savings_rub: Optional[np.ndarray] = None,
+                    losses_rub: Optional[np.ndarray] = None) -> np.ndarray:
+    """Строки METRICS для исходов полётов (общая для record и backfill)."""
+    status = np.asarray(status, dtype=object)
+    n_rows = len(status)
+    duration = np.nan_to_num(np.asarray(duration_minutes, dtype=np.float64))
+    completed, failed = status == 'completed', status == 'failed'
+    cancelled, postponed = status == 'cancelled', status == 'postponed'
+
+    # Причина не указана — отмена в корзине yellow/red считается погодной
+    risky = np.asarray(buckets) >= len(CONDITION_FACTORS)
+    reason = _optional_column(cancel_reason, n_rows, None).astype(object)
+    unknown = pd.isna(reason) | (reason == '')
+    weather_reason = (reason == 'weather') | (unknown & risky)
+    avoided = (cancelled | postponed) & weather_reason & risky
+
+    savings = _optional_column(savings_rub, n_rows, np.nan).astype(np.float64)
+    losses = _optional_column(losses_rub, n_rows, np.nan).astype(np.float64)
+
+    metrics = np.zeros((n_rows, len(METRICS)), dtype=np.float64)
+    metrics[:, _M['flights']] = completed | failed | cancelled
+    metrics[:, _M['completed']] = completed
+    metrics[:, _M['failed']] = failed
+    metrics[:, _M['cancelled']] = cancelled
+    metrics[:, _M['weather_cancels']] = cancelled & weather_reason
+    metrics[:, _M['postponed']] = postponed
+    metrics[:, _M['flight_minutes']] = np.where(completed | failed, duration, 0.0)
+    metrics[:, _M['saved_minutes']] = np.where(avoided, duration, 0.0)
+    metrics[:, _M['warnings']] = np.nan_to_num(_optional_column(warnings, n_rows, 0).astype(np.float64))
+    metrics[:, _M['savings_rub']] = np.where(np.isnan(savings), avoided * AVOIDED_LOSS_RUB, savings)
+    metrics[:, _M['losses_rub']] = np.where(np.isnan(losses), failed * FAILURE_LOSS_RUB, np.abs(losses))
+    return metrics
+
+
+def flight_days(planned_start) -> np.ndarray:
+    """Дни (datetime64[D], UTC) ключей роллапа; время без зоны считается UTC."""
+    times = pd.to_datetime(pd.Series(planned_start), utc=True).dt.tz_localize(None)
+    return times.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+
+
+def flight_day(planned_start) -> str:
+    """Дата одного полёта (YYYY-MM-DD, UTC) без накладных расходов Series."""
+    timestamp = pd.Timestamp(planned_start)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC')
+    return timestamp.strftime('%Y-%m-%d')
+
+
+def _outcome_key(flight_id, status) -> str:
+    return f"{flight_id}:{status}"
+
+
+def _rate(part: float, total: float) -> float:
+    return round(float(100.0 * part / total), 1) if total else 0.0
+
+
+class FlightAnalytics:
+    """Роллапы аналитики: день → матрица корзина × METRICS и итог за всё время."""
+
+    def __init__(self, days: Optional[Dict[str, np.ndarray]] = None,
+                 seen: Optional[Iterable[str]] = None):
+        self.days: Dict[str, np.ndarray] = dict(days or {})
+        self.totals = np.zeros((len(BUCKETS), len(METRICS)), dtype=np.float64)
+        for matrix in self.days.values():
+            self.totals += matrix
+        self._seen: Set[str] = set(seen or ())
+        self._journal = None
+
+    def __len__(self) -> int:
+        """Число учтённых исходов."""
+        return len(self._seen)
+
+    def record(self, flight: Mapping, bucket: int) -> bool:
+        """Учитывает исход полёта (поля Flight) в корзине bucket за O(1).
+
+        Возвращает False, если это не исход или он уже учтён.
+        """
+        status = flight['status']
+        key = _outcome_key(flight['id'], status)
+        if status not in FLIGHT_OUTCOMES or key in self._seen:
+            return False
+        metrics = outcome_metrics(
+            np.array([status], dtype=object), np.array([bucket]), [flight.get('duration_minutes', 0.0)],
+            [flight.get('cancel_reason')], [flight.get('warnings', 0)],
+            [flight.get('savings_rub', np.nan)], [flight.get('losses_rub', np.nan)])[0]
+
+        day = flight_day(flight['planned_start'])
+        self._add(key, day, bucket, metrics)
+        if self._journal is not None:
+            self._journal.write(json.dumps({'key': key, 'day': day, 'bucket': int(bucket),
+                                            'metrics': metrics.tolist()}) + "\n")
+            self._journal.flush()
+        return True
+
+    def _add(self, key: str, day: str, bucket: int, metrics: np.ndarray):
+        matrix = self.days.get(day)
+        if matrix is None:
+            matrix = self.days[day] = np.zeros((len(BUCKETS), len(METRICS)), dtype=np.float64)
+        matrix[bucket] += metrics
+        self.totals[bucket] += metrics
+        self._seen.add(key)
+
+    def rollup(self, start: Optional[str] = None, end: Optional[str] = None) -> np.ndarray:
+        """Сумма матриц дней периода [start, end] (даты включительно); без границ — итог."""
+        if start is None and end is None:
+            return self.totals
+        start, end = start or '', end or '9999-12-31'
+        total = np.zeros((len(BUCKETS), len(METRICS)), dtype=np.float64)
+        for day, matrix in self.days.items():
+            if start <= day <= end:
+                total += matrix
+        return total
+
+    def summary(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict:
+        """AnalyticsSummary фронтенда."""
+        total = self.rollup(start, end).sum(axis=0)
+        return {
+            'totalFlights': int(total[_M['flights']]),
+            'successRatePct': _rate(total[_M['completed']], total[_M['flights']]),
+            'weatherRelatedCancels': int(total[_M['weather_cancels']]),
+            'savedHours': round(float(total[_M['saved_minutes']]) / 60.0, 1),
+            'savedCostUsd': round(float(total[_M['savings_rub']]) / RUB_PER_USD, 2),
+        }
+
+    def success_by_weather(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """flights_success_by_weather: доля состоявшихся полётов по корзинам с полётами."""
+        rollup = self.rollup(start, end)
+        records = []
+        for bucket, row in zip(BUCKETS, rollup):
+            if not row[_M['flights']]:
+                continue
+            safety_class, factor = bucket.split('/')
+            success = _rate(row[_M['completed']], row[_M['flights']])
+            records.append({
+                'condition': f"{CLASS_NAMES[safety_class]}: {CONDITION_NAMES[factor]}",
+                'bucket': bucket,
+                'flights': int(row[_M['flights']]),
+                'success_rate': success,
+                'failed_rate': round(100.0 - success, 1),
+            })
+        return records
+
+    def downtime(self, start: Optional[str] = None, end: Optional[str] = None,
+                 period: str = 'week') -> List[Dict]:
+        """downtime_stats: отмены и переносы по неделям (ISO) или дням."""
+        start, end = start or '', end or '9999-12-31'
+        grouped: Dict[str, np.ndarray] = {}
+        for day in sorted(self.days):
+            if not start <= day <= end:
+                continue
+            if period == 'week':
+                year, week, _ = pd.Timestamp(day).isocalendar()
+                label = f"{year}-W{week:02d}"
+            else:
+                label = day
+            row = self.days[day].sum(axis=0)
+            grouped[label] = grouped[label] + row if label in grouped else row
+        return [{'period': label, 'cancellations': int(row[_M['cancelled']]),
+                 'postponements': int(row[_M['postponed']])} for label, row in grouped.items()]
+
+    def analytics_data(self, start: Optional[str] = None, end: Optional[str] = None,
+                       period: str = 'week') -> Dict:
+        """AnalyticsData фронтенда по готовым роллапам."""
+        total = self.rollup(start, end).sum(axis=0)
+        flight_hours = float(total[_M['flight_minutes']]) / 60.0
+        savings, losses = float(total[_M['savings_rub']]), float(total[_M['losses_rub']])
+        operating_cost = flight_hours * FLIGHT_HOUR_COST_RUB
+        return {
+            'summary': {
+                'total_flights': int(total[_M['flights']]),
+                'success_rate': _rate(total[_M['completed']], total[_M['flights']]),
+                'total_flight_hours': round(flight_hours, 1),
+                'total_warnings': int(total[_M['warnings']]),
+            },
+            'flights_success_by_weather': self.success_by_weather(start, end),
+            'downtime_stats': self.downtime(start, end, period),
+            'economy_metrics': {
+                'savings_rub': round(savings, 2),
+                'losses_rub': round(0.0 - losses, 2),
+                'roi_percent': _rate(savings - losses, operating_cost),
+            },
+        }
+
+    def save(self, path: str):
+        """Атомарно сохраняет роллапы в JSON."""
+        payload = {
+            'version': ANALYTICS_VERSION,
+            'buckets': BUCKETS,
+            'metrics': METRICS,
+            'days': {day: self.days[day].tolist() for day in sorted(self.days)},
+            'seen': sorted(self._seen),
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        # Исходы журнала теперь в снимке
+        if self._journal is not None and self._journal.name == path + JOURNAL_SUFFIX:
+            self._journal.seek(0)
+            self._journal.truncate()
+
+    @classmethod
+    def load(cls, path: str) -> 'FlightAnalytics':
+        """Роллапы из JSON; корзины и метрики должны совпадать с текущими."""
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload['buckets'] != BUCKETS or payload['metrics'] != METRICS:
+            raise ValueError(f"Роллапы {path} построены для других корзин или метрик, "
+                             f"пересоберите их backfill")
+        days = {day: np.asarray(matrix, dtype=np.float64) for day, matrix in payload['days'].items()}
+        return cls(days, payload['seen'])
+
+    @classmethod
+    def open(cls, path: str) -> 'FlightAnalytics':
+        """Снимок path (если есть) с доигранным журналом; record пишет в журнал."""
+        analytics = cls.load(path) if os.path.exists(path) else cls()
+        journal_path = path + JOURNAL_SUFFIX
+        if os.path.exists(journal_path):
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # строка, недописанная при падении
+                    # Исход уже в снимке, если процесс упал между save и очисткой журнала
+                    if entry['key'] not in analytics._seen:
+                        analytics._add(entry['key'], entry['day'], entry['bucket'],
+                                       np.asarray(entry['metrics'], dtype=np.float64))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        analytics._journal = open(journal_path, 'a', encoding='utf-8')
+        return analytics
+
+    def close(self):
+        """Закрывает журнал."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+def _weather_variables(weather: WeatherGridIndex) -> List[str]:
+    return [v for v in PAIR_WEATHER_COLUMNS + ['visibility_km'] if v in weather.variables]
+
+
+def flight_buckets(flights: pd.DataFrame, registry: DroneRegistry,
+                   weather: WeatherGridIndex) -> np.ndarray:
+    """Корзины полётов таблицы: погода в ближайшем узле и часе planned_start."""
+    times = pd.to_datetime(flights['planned_start'], utc=True).dt.tz_localize(None)
+    weather_columns = weather.nearest(flights['lat'].to_numpy(dtype=np.float64),
+                                      flights['lon'].to_numpy(dtype=np.float64),
+                                      times.to_numpy(dtype='datetime64[ns]'),
+                                      _weather_variables(weather))
+    drone_idx = registry.indices(flights['drone_id'].tolist())
+    return weather_buckets(pair_columns(registry, weather_columns, drone_idx))
+
+
+def flight_bucket(flight: Mapping, registry: DroneRegistry, weather: WeatherGridIndex) -> int:
+    """Корзина одного полёта (поля Flight) тем же flight_buckets, что и в backfill."""
+    location = flight.get('location') or flight
+    frame = pd.DataFrame({'drone_id': [flight['drone_id']],
+                          'planned_start': [flight['planned_start']],
+                          'lat': [float(location['lat'])],
+                          'lon': [float(location['lon'])]})
+    return int(flight_buckets(frame, registry, weather)[0])
+
+
+def backfill_analytics(flights: pd.DataFrame, registry: DroneRegistry,
+                       weather: WeatherGridIndex) -> FlightAnalytics:
+    """Роллапы по таблице истории полётов одним векторным проходом."""
+    missing = [c for c in HISTORY_COLUMNS if c not in flights.columns]
+    if missing:
+        raise ValueError(f"В истории полётов нет столбцов: {', '.join(missing)}")
+
+    flights = flights[flights['status'].isin(FLIGHT_OUTCOMES)]
+    flights = flights.drop_duplicates(['id', 'status'], keep='last')
+    known = flights['drone_id'].isin(set(registry.drone_ids))
+    if not known.all():
+        print(f"Пропущено {int((~known).sum())} исходов с неизвестными drone_id")
+        flights = flights[known]
+
+    buckets = flight_buckets(flights, registry, weather)
+    optional = {c: flights[c].to_numpy() if c in flights.columns else None
+                for c in OPTIONAL_HISTORY_COLUMNS}
+    metrics = outcome_metrics(flights['status'].to_numpy(dtype=object), buckets,
+                              flights['duration_minutes'].to_numpy(), optional['cancel_reason'],
+                              optional['warnings'], optional['savings_rub'], optional['losses_rub'])
+
+    # Строки дат только для уникальных дней: strftime по всем строкам дороже всего backfill
+    days, day_codes = np.unique(flight_days(flights['planned_start']), return_inverse=True)
+    days = np.datetime_as_string(days, unit='D').tolist()
+    cells = day_codes * len(BUCKETS) + buckets
+    size = len(days) * len(BUCKETS)
+    cube = np.empty((size, len(METRICS)), dtype=np.float64)
+    for m in range(len(METRICS)):
+        cube[:, m] = np.bincount(cells, weights=metrics[:, m], minlength=size)
+    cube = cube.reshape(len(days), len(BUCKETS), len(METRICS))
+
+    keys = [_outcome_key(i, s) for i, s in zip(flights['id'].tolist(), flights['status'].tolist())]
+    return FlightAnalytics({day: cube[k] for k, day in enumerate(days)}, keys)
+
+
+def synthetic_flight_history(registry: DroneRegistry, weather: WeatherGridIndex,
+                             n_flights: int, seed: int = 42) -> pd.DataFrame:
+    """История полётов над областью погоды; исходы зависят от класса погоды."""
+    rng = np.random.default_rng(seed)
+    t_min, t_max = weather.times[0].astype(np.int64), weather.times[-1].astype(np.int64)
+    flights = pd.DataFrame({
+        'id': [f"FLT-{k:07d}" for k in range(n_flights)],
+        'drone_id': registry.drone_ids[rng.integers(len(registry), size=n_flights)],
+        'planned_start': pd.to_datetime(rng.integers(t_min, t_max + 1, n_flights)).tz_localize('UTC'),
+        'duration_minutes': rng.integers(15, 91, n_flights),
+        'lat': rng.uniform(weather.lats.min(), weather.lats.max(), n_flights),
+        'lon': rng.uniform(weather.lons.min(), weather.lons.max(), n_flights),
+    })
+    class_idx = flight_buckets(flights, registry, weather) // len(CONDITION_FACTORS)
+
+    # Вероятности completed / failed / cancelled / postponed по классам green, yellow, red
+    probabilities = np.cumsum([[0.95, 0.01, 0.03, 0.01],
+                               [0.80, 0.05, 0.10, 0.05],
+                               [0.40, 0.15, 0.30, 0.15]], axis=1)[class_idx]
+    outcome = (rng.random(n_flights)[:, None] > probabilities).sum(axis=1)
+    flights['status'] = np.array(FLIGHT_OUTCOMES, dtype=object)[np.minimum(outcome, 3)]
+    flights['cancel_reason'] = np.where(class_idx > 0, 'weather', 'other')
+    flights['warnings'] = rng.poisson(np.array([0.05, 0.5, 1.5])[class_idx])
+    return flights
+
+
+def print_analytics(analytics: FlightAnalytics):
+    """Итоги роллапов в консоль."""
+    summary = analytics.summary()
+    print(f"Полётов: {summary['totalFlights']}, успешных: {summary['successRatePct']}%, "
+          f"отмен по погоде: {summary['weatherRelatedCancels']}, "
+          f"сэкономлено {summary['savedHours']} ч (${summary['savedCostUsd']:,.0f})")
+    for row in analytics.success_by_weather():
+        print(f"  {row['condition']:<32} {row['flights']:>8} полётов, успешных {row['success_rate']:5.1f}%")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Строит роллапы аналитики по истории полётов (backfill)."""
+    from flight_monitor import load_weather_index
+
+    parser = argparse.ArgumentParser(description="Роллапы аналитики полётов")
+    parser.add_argument('--flights', help="CSV или Parquet истории полётов (столбцы HISTORY_COLUMNS)")
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help="вместо --flights сгенерировать столько полётов")
+    parser.add_argument('--weather', default=None,
+                        help="CSV или каталог хранилища погоды (по умолчанию — синтетическая)")
+    parser.add_argument('--drones', default="data/drone_specs.csv",
+                        help="CSV паспортов или каталог реестра drone_registry.py")
+    parser.add_argument('--output', default="data/analytics_rollups.json")
+    parser.add_argument('--query', action='store_true', help="напечатать AnalyticsData в JSON")
+    args = parser.parse_args(argv)
+    if not args.flights and not args.synthetic:
+        parser.error("нужен --flights или --synthetic")
+
+    registry = load_drone_registry(args.drones)
+    weather = load_weather_index(args.weather)
+    if args.synthetic:
+        flights = synthetic_flight_history(registry, weather, args.synthetic)
+    elif args.flights.endswith('.parquet'):
+        flights = pd.read_parquet(args.flights)
+    else:
+        flights = pd.read_csv(args.flights)
+
+    started = time.perf_counter()
+    analytics = backfill_analytics(flights, registry, weather)
+    elapsed = time.perf_counter() - started
+    analytics.save(args.output)
+    print(f"Роллапы {len(analytics.days)} дней из {len(analytics)} исходов за {elapsed:.2f} с "
+          f"({len(flights) / elapsed if elapsed > 0 else float('inf'):,.0f} полётов/с) → {args.output}")
+    print_analytics(analytics)
+    if args.query:
+        print(json.dumps(analytics.analytics_data(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
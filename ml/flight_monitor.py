@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Потоковый мониторинг безопасности активных полётов.
+
+Движок принимает поток телеметрии множества дронов в полёте (из локальной
+asyncio очереди или воспроизведения файла) и раз в такт (по умолчанию 1 с)
+переоценивает все активные полёты одним батчем: погода для всех позиций
+интерполируется одним вызовом WeatherGridIndex.bilinear, признаки
+собираются DroneRegistry.feature_matrix, и все полёты оцениваются одним
+вызовом модели. Результат — current_safety_index / current_safety_class
+и предупреждения в форматах ActiveFlightTelemetry / ActiveFlightWarning
+фронтенда.
+
+Предупреждения выдаются при смене класса безопасности с гистерезисом:
+класс ухудшается, только когда safety_index опустился ниже порога
+calc_safety_class на margin пунктов, а улучшается — когда поднялся выше
+порога на margin; новый класс должен продержаться confirm_ticks тактов
+подряд. Поэтому колебания около 80 или 60 не дают потока предупреждений.
+Ухудшение до yellow — 'warning', до red — 'critical', улучшение — 'info'.
+
+Состояние полётов хранится массивами numpy (слот на полёт, flight_id →
+слот словарём), так что такт не зависит от числа полётов в Python-циклах;
+цикл идёт только по сообщениям телеметрии и по сменам класса.
+
+Запуск (из каталога ml/):
+    python flight_monitor.py --replay data/telemetry.jsonl --weather data/weather_store
+    python flight_monitor.py --load-test --flights 5000 --duration 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from batch_predictor import ModelArtifact, load_model_artifact
+from drone_registry import PAIR_WEATHER_COLUMNS, DroneRegistry, load_drone_registry
+from safe_windows import SAFETY_CLASS_THRESHOLDS
+from weather_index import WeatherGridIndex, utc_naive
+
+
+# Классы по возрастанию опасности: номер класса — уровень в массивах состояния
+SAFETY_CLASSES = ['green', 'yellow', 'red']
+
+# Уровень ActiveFlightWarning при переходе в класс (ухудшение)
+DEGRADE_LEVELS = {'yellow': 'warning', 'red': 'critical'}
+
+# Статусы ActiveFlightTelemetry; прочие (landed, completed, ...) завершают полёт
+ACTIVE_STATUSES = ('in_flight', 'landing', 'returning')
+
+# Запас вокруг порогов класса, пунктов safety_index
+DEFAULT_MARGIN = 3.0
+
+# Сколько тактов подряд должен держаться новый класс
+DEFAULT_CONFIRM_TICKS = 2
+
+# Полёт без телеметрии дольше этого считается завершённым, с
+DEFAULT_STALE_SECONDS = 30.0
+
+
+def safety_levels(safety_index: np.ndarray, shift: float = 0.0) -> np.ndarray:
+    """Номер класса (0 — green, 1 — yellow, 2 — red) при порогах, сдвинутых на shift."""
+    return ((safety_index < SAFETY_CLASS_THRESHOLDS['green'] + shift).astype(np.int8)
+            + (safety_index < SAFETY_CLASS_THRESHOLDS['yellow'] + shift))
+
+
+def _telemetry_time(value) -> np.datetime64:
+    # Время со смещением (Z, +03:00) переводится в UTC; без смещения считается UTC
+    return np.datetime64(utc_naive(value if value is not None else pd.Timestamp.now(tz='UTC')), 'ns')
+
+
+class FlightMonitor:
+    """Состояние активных полётов и их пакетная переоценка по тактам."""
+
+    def __init__(self, artifact: ModelArtifact, registry: DroneRegistry,
+                 weather: WeatherGridIndex, tick_seconds: float = 1.0,
+                 margin: float = DEFAULT_MARGIN, confirm_ticks: int = DEFAULT_CONFIRM_TICKS,
+                 stale_seconds: float = DEFAULT_STALE_SECONDS, capacity: int = 1024):
+        self.artifact = artifact
+        self.registry = registry
+        self.weather = weather
+        self.tick_seconds = tick_seconds
+        self.margin = margin
+        self.confirm_ticks = confirm_ticks
+        self.stale = np.timedelta64(int(stale_seconds * 1e9), 'ns')
+        self._variables = [v for v in weather.variables
+                           if v in set(artifact.feature_cols) | set(PAIR_WEATHER_COLUMNS)]
+
+        # flight_id → слот; освобождённые слоты используются повторно
+        self._slot: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self.flight_ids: List[Optional[str]] = []
+        self.operator_ids: List[Optional[str]] = []
+        self.statuses: List[Optional[str]] = []
+        self.last_warning: List[Optional[Dict]] = []
+        self._allocate_arrays(capacity)
+
+        # Время потока телеметрии: максимум времени полученных сообщений
+        self.clock: Optional[np.datetime64] = None
+        self.unknown_drones = 0
+        self.tick_ms: List[float] = []
+        self.ticks_flights: List[int] = []
+        self.overruns = 0
+        self.warnings_emitted = 0
+
+    def _allocate_arrays(self, capacity: int):
+        old = {name: getattr(self, name, None) for name in
+               ('active', 'lat', 'lon', 'altitude_m', 'drone_idx', 'seen',
+                'safety_index', 'level', 'pending', 'pending_count')}
+        self.active = np.zeros(capacity, dtype=bool)
+        self.lat = np.zeros(capacity, dtype=np.float64)
+        self.lon = np.zeros(capacity, dtype=np.float64)
+        self.altitude_m = np.zeros(capacity, dtype=np.float64)
+        self.drone_idx = np.zeros(capacity, dtype=np.intp)
+        self.seen = np.zeros(capacity, dtype='datetime64[ns]')
+        self.safety_index = np.full(capacity, np.nan, dtype=np.float32)
+        # -1 — полёт ещё не оценивался
+        self.level = np.full(capacity, -1, dtype=np.int8)
+        self.pending = np.full(capacity, -1, dtype=np.int8)
+        self.pending_count = np.zeros(capacity, dtype=np.int16)
+        if old['active'] is not None:
+            n = len(old['active'])
+            for name, values in old.items():
+                getattr(self, name)[:n] = values
+        grow = capacity - len(self.flight_ids)
+        for column in (self.flight_ids, self.operator_ids, self.statuses, self.last_warning):
+            column.extend([None] * grow)
+
+    def __len__(self) -> int:
+        return len(self._slot)
+
+    def _acquire(self, flight_id: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == len(self.active):
+                self._allocate_arrays(2 * len(self.active))
+            slot = self._size
+            self._size += 1
+        self._slot[flight_id] = slot
+        self.flight_ids[slot] = flight_id
+        self.active[slot] = True
+        self.level[slot] = -1
+        self.pending[slot] = -1
+        self.pending_count[slot] = 0
+        self.safety_index[slot] = np.nan
+        self.last_warning[slot] = None
+        return slot
+
+    def _release(self, slot: int):
+        del self._slot[self.flight_ids[slot]]
+        self.active[slot] = False
+        self.flight_ids[slot] = None
+        self._free.append(slot)
+
+    def ingest(self, message: Dict):
+        """Применяет сообщение телеметрии (O(1)).
+
+        Поля: id, drone_id, operator_id, status, lat, lon, altitude_m и
+        time (ISO UTC; без него — текущее время). Статус вне ACTIVE_STATUSES
+        завершает полёт.
+        """
+        flight_id = message['id']
+        slot = self._slot.get(flight_id)
+        status = message.get('status', 'in_flight')
+        if status not in ACTIVE_STATUSES:
+            if slot is not None:
+                self._release(slot)
+            return
+        if slot is None:
+            drone_id = message['drone_id']
+            if drone_id not in self.registry:
+                self.unknown_drones += 1
+                return
+            slot = self._acquire(flight_id)
+            self.drone_idx[slot] = self.registry.index(drone_id)
+            self.operator_ids[slot] = message.get('operator_id')
+
+        seen = _telemetry_time(message.get('time'))
+        self.lat[slot] = message['lat']
+        self.lon[slot] = message['lon']
+        self.altitude_m[slot] = message.get('altitude_m', 0.0)
+        self.seen[slot] = seen
+        self.statuses[slot] = status
+        if self.clock is None or seen > self.clock:
+            self.clock = seen
+
+    def drain(self, telemetry: asyncio.Queue) -> bool:
+        """Применяет всё, что накопилось в очереди; False, если поток закончился (None)."""
+        while True:
+            try:
+                message = telemetry.get_nowait()
+            except asyncio.QueueEmpty:
+                return True
+            if message is None:
+                return False
+            self.ingest(message)
+
+    def expire_stale(self):
+        """Завершает полёты без телеметрии дольше stale_seconds."""
+        if self.clock is None:
+            return
+        stale = np.flatnonzero(self.active[:self._size] & (self.seen[:self._size] < self.clock - self.stale))
+        for slot in stale:
+            self._release(int(slot))
+
+    def features(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Слоты активных полётов и их матрица признаков на время потока."""
+        slots = np.flatnonzero(self.active[:self._size])
+        if not len(slots) or self.clock is None:
+            return slots, None
+        weather = self.weather.bilinear(self.lat[slots], self.lon[slots], self.clock,
+                                        variables=self._variables)
+        X = self.registry.feature_matrix(self.artifact.feature_cols, weather, self.drone_idx[slots])
+        return slots, X
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Один вызов модели на все полёты такта."""
+        # Модель регрессии может выйти за пределы шкалы
+        return np.clip(self.artifact.booster.inplace_predict(X), 0, 100)
+
+    def apply(self, slots: np.ndarray, safety_index: np.ndarray) -> List[Dict]:
+        """Обновляет индексы и классы с гистерезисом; возвращает новые предупреждения."""
+        self.safety_index[slots] = safety_index
+        current = self.level[slots]
+        # Ухудшение — только ниже порога на margin, улучшение — только выше порога на margin
+        worse = safety_levels(safety_index, -self.margin)
+        better = safety_levels(safety_index, self.margin)
+        candidate = np.where(worse > current, worse, np.where(better < current, better, current))
+
+        changing = (candidate != current) & (current >= 0)
+        count = np.where(changing & (self.pending[slots] == candidate),
+                         self.pending_count[slots] + 1, changing.astype(np.int16))
+        confirmed = changing & (count >= self.confirm_ticks)
+        self.pending[slots] = np.where(changing, candidate, current)
+        self.pending_count[slots] = np.where(confirmed, 0, count)
+
+        # Первая оценка полёта: класс без гистерезиса, предупреждение, если не green
+        first = current < 0
+        new_level = np.where(first, safety_levels(safety_index), np.where(confirmed, candidate, current))
+        self.level[slots] = new_level
+
+        events = []
+        for k in np.flatnonzero(confirmed | (first & (new_level > 0))):
+            slot = int(slots[k])
+            events.append(self._warning(slot, int(current[k]), int(new_level[k])))
+        self.warnings_emitted += len(events)
+        return events
+
+    def _warning(self, slot: int, old_level: int, new_level: int) -> Dict:
+        new_class = SAFETY_CLASSES[new_level]
+        safety_index = float(self.safety_index[slot])
+        if old_level < 0:
+            level = DEGRADE_LEVELS[new_class]
+            message = f"Полёт начат в условиях класса {new_class} (safety_index {safety_index:.0f})"
+        elif new_level > old_level:
+            level = DEGRADE_LEVELS[new_class]
+            message = (f"Безопасность снизилась: {SAFETY_CLASSES[old_level]} → {new_class} "
+                       f"(safety_index {safety_index:.0f})")
+        else:
+            level = 'info'
+            message = (f"Условия улучшились: {SAFETY_CLASSES[old_level]} → {new_class} "
+                       f"(safety_index {safety_index:.0f})")
+        warning = {'time': pd.Timestamp(self.clock).tz_localize('UTC').isoformat(),
+                   'level': level, 'message': message}
+        self.last_warning[slot] = warning
+        return {'flight_id': self.flight_ids[slot],
+                'drone_id': self.registry.drone_ids[self.drone_idx[slot]],
+                **warning}
+
+    def score(self) -> List[Dict]:
+        """Синхронный такт: признаки, предсказание и гистерезис."""
+        self.expire_stale()
+        slots, X = self.features()
+        if X is None:
+            return []
+        return self.apply(slots, self.predict(X))
+
+    def telemetry(self, flight_id: str) -> Dict:
+        """Состояние полёта в формате ActiveFlightTelemetry."""
+        slot = self._slot[flight_id]
+        level = int(self.level[slot])
+        record = {
+            'id': flight_id,
+            'drone_id': self.registry.drone_ids[self.drone_idx[slot]],
+            'operator_id': self.operator_ids[slot],
+            'status': self.statuses[slot],
+            'current_position': {'lat': float(self.lat[slot]), 'lon': float(self.lon[slot]),
+                                 'altitude_m': float(self.altitude_m[slot])},
+            'current_safety_index': round(float(self.safety_index[slot]), 1),
+            'current_safety_class': SAFETY_CLASSES[level] if level >= 0 else None,
+        }
+        if self.last_warning[slot] is not None:
+            record['last_warning'] = self.last_warning[slot]
+        return record
+
+    def snapshot(self) -> List[Dict]:
+        """Все активные полёты в формате ActiveFlightTelemetry."""
+        return [self.telemetry(flight_id) for flight_id in self._slot]
+
+    async def run(self, telemetry: asyncio.Queue, warnings: Optional[asyncio.Queue] = None):
+        """Цикл мониторинга: раз в такт применяет телеметрию и переоценивает полёты.
+
+        Телеметрия — сообщения ingest в очереди, None завершает поток.
+        Предсказание выполняется в отдельном потоке, чтобы цикл событий
+        продолжал принимать телеметрию. Предупреждения кладутся в warnings.
+        """
+        loop = asyncio.get_running_loop()
+        # Один поток: вызовы XGBoost и так используют все ядра
+        executor = ThreadPoolExecutor(max_workers=1)
+        next_tick = loop.time()
+        running = True
+        try:
+            while running:
+                next_tick += self.tick_seconds
+                await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+                started = time.perf_counter()
+                running = self.drain(telemetry)
+                self.expire_stale()
+                slots, X = self.features()
+                events = []
+                if X is not None:
+                    safety_index = await loop.run_in_executor(executor, self.predict, X)
+                    events = self.apply(slots, safety_index)
+                self.tick_ms.append((time.perf_counter() - started) * 1000)
+                self.ticks_flights.append(len(slots))
+
+                if warnings is not None:
+                    for event in events:
+                        warnings.put_nowait(event)
+                if loop.time() > next_tick + self.tick_seconds:
+                    # Такт не уложился в интервал: пропускаем, а не копим отставание
+                    self.overruns += 1
+                    next_tick = loop.time()
+        finally:
+            executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Время такта (p50 / p99 / max, мс), число полётов и пропущенные такты."""
+        if not self.tick_ms:
+            return {'ticks': 0}
+        tick_ms = np.asarray(self.tick_ms)
+        return {
+            'ticks': len(tick_ms),
+            'tick_p50_ms': float(np.percentile(tick_ms, 50)),
+            'tick_p99_ms': float(np.percentile(tick_ms, 99)),
+            'tick_max_ms': float(tick_ms.max()),
+            'max_flights': int(max(self.ticks_flights)),
+            'overruns': self.overruns,
+            'warnings': self.warnings_emitted,
+            'unknown_drones': self.unknown_drones,
+        }
+
+
+async def replay_telemetry(path: str, telemetry: asyncio.Queue, speed: float = 1.0):
+    """Воспроизводит JSONL файл телеметрии в очередь в темпе поля time.
+
+    speed > 1 ускоряет воспроизведение; в конце в очередь кладётся None.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    first_time = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            message_time = _telemetry_time(message.get('time'))
+            if first_time is None:
+                first_time = message_time
+            due = started + (message_time - first_time) / np.timedelta64(1, 's') / speed
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            telemetry.put_nowait(message)
+    telemetry.put_nowait(None)
+
+
+def synthetic_telemetry(registry: DroneRegistry, weather: WeatherGridIndex, n_flights: int,
+                        seconds: int, seed: int = 42) -> Iterable[str]:
+    """Строки JSONL телеметрии: n_flights полётов над областью погоды, сообщение в секунду."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(weather.lats.min(), weather.lats.max(), n_flights)
+    lon = rng.uniform(weather.lons.min(), weather.lons.max(), n_flights)
+    heading = rng.uniform(0, 2 * np.pi, n_flights)
+    speed_deg = rng.uniform(10, 25, n_flights) / 111_000  # м/с → градусы широты в секунду
+    altitude = rng.uniform(50, 120, n_flights)
+    drones = registry.drone_ids[rng.integers(len(registry), size=n_flights)]
+    start = pd.Timestamp(weather.times[0])
+
+    for second in range(seconds):
+        timestamp = (start + pd.Timedelta(seconds=second)).isoformat()
+        status = 'landing' if second == seconds - 1 else 'in_flight'
+        for k in range(n_flights):
+            yield json.dumps({'time': timestamp, 'id': f"flight_{k:05d}", 'drone_id': drones[k],
+                              'operator_id': f"op_{k % 50:02d}", 'status': status,
+                              'lat': round(float(lat[k]), 6), 'lon': round(float(lon[k]), 6),
+                              'altitude_m': round(float(altitude[k]), 1)})
+        lat += speed_deg * np.sin(heading)
+        lon += speed_deg * np.cos(heading) / np.cos(np.radians(lat))
+
+
+def load_weather_index(source: Optional[str]) -> WeatherGridIndex:
+    """Индекс погоды из хранилища или CSV; None — синтетическая погода по умолчанию."""
+    if source is None:
+        from synthetic_weather import default_synthetic_grid, synthetic_weather_table
+        return WeatherGridIndex.from_weather_df(synthetic_weather_table(*default_synthetic_grid()))
+    if os.path.isdir(source):
+        return WeatherGridIndex.from_store(source)
+    return WeatherGridIndex.from_weather_df(pd.read_csv(source, parse_dates=['timestamp']))
+
+
+async def monitor_replay(monitor: FlightMonitor, path: str, speed: float = 1.0,
+                         warnings_path: Optional[str] = None) -> Dict:
+    """Воспроизводит файл телеметрии через монитор; предупреждения — в JSONL файл или консоль."""
+    telemetry: asyncio.Queue = asyncio.Queue()
+    warnings: asyncio.Queue = asyncio.Queue()
+    monitor_task = asyncio.create_task(monitor.run(telemetry, warnings))
+    await replay_telemetry(path, telemetry, speed)
+    await monitor_task
+
+    out = open(warnings_path, 'w', encoding='utf-8') if warnings_path else None
+    try:
+        while not warnings.empty():
+            event = warnings.get_nowait()
+            if out is not None:
+                out.write(json.dumps(event, ensure_ascii=False) + "\n")
+            else:
+                print(f"  [{event['level']}] {event['time']} {event['flight_id']}: {event['message']}")
+    finally:
+        if out is not None:
+            out.close()
+    return monitor.stats()
+
+
+def print_stats(stats: Dict, tick_seconds: float):
+    if not stats['ticks']:
+        print("Телеметрия не получена")
+        return
+    print(f"\nТактов: {stats['ticks']}, полётов до {stats['max_flights']}, "
+          f"предупреждений: {stats['warnings']}, неизвестных дронов: {stats['unknown_drones']}")
+    print(f"Такт: p50 {stats['tick_p50_ms']:.1f} мс, p99 {stats['tick_p99_ms']:.1f} мс, "
+          f"max {stats['tick_max_ms']:.1f} мс при интервале {tick_seconds * 1000:.0f} мс; "
+          f"пропущено тактов: {stats['overruns']}")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Мониторинг активных полётов по файлу телеметрии или нагрузочный тест."""
+    parser = argparse.ArgumentParser(description="Потоковый мониторинг активных полётов")
+    parser.add_argument('--model-dir', default="models")
+    parser.add_argument('--drones', default="data/drone_specs.csv",
+                        help="CSV паспортов или каталог реестра drone_registry.py")
+    parser.add_argument('--weather', default=None,
+                        help="CSV или каталог хранилища погоды (по умолчанию — синтетическая)")
+    parser.add_argument('--replay', default=None, help="JSONL файл телеметрии")
+    parser.add_argument('--speed', type=float, default=1.0, help="ускорение воспроизведения")
+    parser.add_argument('--warnings-out', default=None, help="JSONL файл предупреждений")
+    parser.add_argument('--tick', type=float, default=1.0, help="интервал такта, с")
+    parser.add_argument('--margin', type=float, default=DEFAULT_MARGIN)
+    parser.add_argument('--confirm-ticks', type=int, default=DEFAULT_CONFIRM_TICKS)
+    parser.add_argument('--load-test', action='store_true',
+                        help="сгенерировать телеметрию --flights полётов и воспроизвести её")
+    parser.add_argument('--flights', type=int, default=5000)
+    parser.add_argument('--duration', type=int, default=30, help="секунд телеметрии (--load-test)")
+    args = parser.parse_args(argv)
+
+    if not args.replay and not args.load_test:
+        parser.error("нужно указать --replay или --load-test")
+
+    artifact = load_model_artifact(args.model_dir)
+    registry = load_drone_registry(args.drones)
+    weather = load_weather_index(args.weather)
+    monitor = FlightMonitor(artifact, registry, weather, tick_seconds=args.tick,
+                            margin=args.margin, confirm_ticks=args.confirm_ticks)
+
+    if not args.load_test:
+        stats = asyncio.run(monitor_replay(monitor, args.replay, args.speed, args.warnings_out))
+        print_stats(stats, args.tick)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="guardian_telemetry_") as tmp:
+        path = os.path.join(tmp, "telemetry.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for line in synthetic_telemetry(registry, weather, args.flights, args.duration):
+                f.write(line + "\n")
+        print(f"Нагрузка: {args.flights} полётов, {args.duration} с телеметрии "
+              f"({os.path.getsize(path) / 1024 ** 2:.0f} МБ), такт {args.tick:.1f} с")
+        stats = asyncio.run(monitor_replay(monitor, path, args.speed,
+                                           args.warnings_out or os.devnull))
+    print_stats(stats, args.tick)
+
+    # Цель: такт укладывается в интервал, тактов не пропущено
+    passed = stats['ticks'] > 0 and stats['overruns'] == 0 and stats['tick_p99_ms'] <= args.tick * 1000
+    print(f"Цель {args.flights} полётов с тактом {args.tick:.1f} с: "
+          f"{'выполнена' if passed else 'НЕ выполнена'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
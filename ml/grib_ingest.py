@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Пакетная загрузка архива GRIB файлов в колоночное хранилище погоды.
+
+convert_grib_to_weather_csv обрабатывает один файл в одном процессе.
+Архив из сотен месячных или суточных файлов здесь декодируется
+параллельно в пуле процессов: каждый воркер открывает свой файл один раз
+(open_grib_hypercubes — один индекс сообщений вместо цепочки повторных
+открытий), извлекает погодную таблицу кусками по времени и дописывает
+их в общее Parquet-хранилище с партициями по дате. Части пишутся под
+уникальными именами, поэтому воркерам не нужна блокировка; префикс имени
+указывает на файл-источник, и при повторной загрузке изменённого файла
+его старые части заменяются.
+
+После каждого файла печатаются прогресс, строки/с и МБ/с, итог — общая
+пропускная способность. Список загруженных файлов (размер, mtime, строки)
+сохраняется в манифест хранилища; с --append уже загруженные
+неизменённые файлы пропускаются.
+
+Запуск (из каталога ml/):
+    python grib_ingest.py --source "data/archive/*.grib" --store data/weather_store --workers 4
+    python grib_ingest.py --source data/archive --store data/weather_store --append
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from instrumentation import peak_rss_mb
+
+
+# Манифест загруженных файлов; имя с '_' сканер хранилища пропускает
+INGEST_MANIFEST = "_ingest_manifest.json"
+
+GRIB_EXTENSIONS = ('.grib', '.grib1', '.grib2', '.grb', '.grb1', '.grb2')
+
+
+def find_grib_files(sources: List[str]) -> List[str]:
+    """Раскрывает каталоги, маски и пути в отсортированный список GRIB файлов."""
+    files = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for name in os.listdir(source):
+                if name.lower().endswith(GRIB_EXTENSIONS):
+                    files.add(os.path.join(source, name))
+        elif glob.has_magic(source):
+            files.update(p for p in glob.glob(source) if os.path.isfile(p))
+        elif os.path.isfile(source):
+            files.add(source)
+        else:
+            raise FileNotFoundError(f"GRIB файлы не найдены: {source}")
+    return sorted(files)
+
+
+def source_part_prefix(grib_path: str) -> str:
+    """Префикс файлов-частей хранилища, записанных из grib_path."""
+    return "src-" + hashlib.sha1(os.path.abspath(grib_path).encode('utf-8')).hexdigest()[:16]
+
+
+def _file_stamp(path: str) -> Dict:
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def load_ingest_manifest(store_dir: str) -> Dict[str, Dict]:
+    """Манифест загруженных файлов хранилища: путь → размер, mtime, строки."""
+    path = os.path.join(store_dir, INGEST_MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_ingest_manifest(store_dir: str, manifest: Dict[str, Dict]):
+    """Атомарно сохраняет манифест загруженных файлов."""
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, INGEST_MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def ingest_grib_file(grib_path: str, store_dir: str, chunk_size: int = 24) -> Dict:
+    """Декодирует один GRIB файл и дописывает его в хранилище (выполняется в воркере).
+
+    Части пишутся с префиксом файла-источника; оставшиеся от прошлой
+    загрузки этого файла части удаляются. Ошибка файла не прерывает
+    загрузку архива: она возвращается в отчёте, а уже записанные части
+    файла удаляются.
+    """
+    import contextlib
+    import io
+
+    from train_safety_model import (
+        iter_weather_chunks,
+        open_grib_hypercubes,
+        resolve_grid_coords,
+        resolve_weather_vars,
+    )
+    from weather_store import remove_store_parts, write_weather_store
+
+    started = time.perf_counter()
+    report = {'path': grib_path, 'rows': 0, 'bytes': os.path.getsize(grib_path), **_file_stamp(grib_path)}
+    part_prefix = source_part_prefix(grib_path)
+    try:
+        report['replaced_parts'] = remove_store_parts(store_dir, part_prefix)
+        # Печать cfgrib и конвертации из воркеров перемешалась бы в консоли
+        with contextlib.redirect_stdout(io.StringIO()):
+            ds = open_grib_hypercubes(grib_path)
+            var_map = resolve_weather_vars(ds)
+            time_coord, lat_coord, lon_coord = resolve_grid_coords(ds)
+            for chunk_df in iter_weather_chunks(ds, var_map, time_coord, lat_coord, lon_coord, chunk_size):
+                write_weather_store(chunk_df, store_dir, overwrite=False, part_prefix=part_prefix)
+                report['rows'] += len(chunk_df)
+        report['missing'] = [column for column, name in var_map.items() if name is None]
+        report['error'] = None
+    except Exception as e:
+        # Части, успевшие записаться до ошибки, не должны остаться в хранилище без манифеста
+        remove_store_parts(store_dir, part_prefix)
+        report['rows'] = 0
+        report['error'] = f"{type(e).__name__}: {e}"
+    report['seconds'] = time.perf_counter() - started
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def ingest_grib_files(sources: List[str], store_dir: str = "data/weather_store",
+                      workers: int = -1, chunk_size: int = 24,
+                      append: bool = False) -> Dict:
+    """Параллельно загружает GRIB файлы в одно хранилище.
+
+    append=False пересоздаёт хранилище; append=True дописывает только новые
+    и изменённые файлы (по манифесту). Возвращает итоговый отчёт.
+    """
+    files = find_grib_files(sources)
+    if append:
+        manifest = load_ingest_manifest(store_dir)
+        pending = [p for p in files
+                   if {k: manifest.get(os.path.abspath(p), {}).get(k) for k in ('size', 'mtime')}
+                   != _file_stamp(p)]
+        print(f"Найдено {len(files)} GRIB файлов, новых или изменённых: {len(pending)}")
+    else:
+        manifest = {}
+        if os.path.exists(store_dir):
+            shutil.rmtree(store_dir)
+        pending = files
+        print(f"Найдено {len(files)} GRIB файлов")
+
+    workers = workers if workers > 0 else os.cpu_count()
+    workers = max(1, min(workers, len(pending)))
+    total_bytes = sum(os.path.getsize(p) for p in pending)
+    if pending:
+        print(f"Загрузка {total_bytes / 1024 ** 2:.1f} МБ в {store_dir}, процессов: {workers}\n")
+
+    started = time.perf_counter()
+    done_rows = done_bytes = 0
+    failed = []
+    if pending:
+        # spawn: воркеры не наследуют открытые родителем дескрипторы eccodes
+        pool = ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=multiprocessing.get_context('spawn'))
+        with pool:
+            futures = [pool.submit(ingest_grib_file, path, store_dir, chunk_size) for path in pending]
+            for k, future in enumerate(as_completed(futures), 1):
+                report = future.result()
+                done_bytes += report['bytes']
+                elapsed = time.perf_counter() - started
+                name = os.path.basename(report['path'])
+                if report['error']:
+                    # Старые части файла воркер уже удалил: манифест должен совпадать с хранилищем
+                    manifest.pop(os.path.abspath(report['path']), None)
+                    failed.append(report)
+                    print(f"  [{k}/{len(pending)}] {name}: ОШИБКА {report['error']}")
+                    continue
+
+                done_rows += report['rows']
+                manifest[os.path.abspath(report['path'])] = {
+                    'size': report['size'], 'mtime': report['mtime'], 'rows': report['rows'],
+                }
+                eta = elapsed / done_bytes * (total_bytes - done_bytes) if done_bytes else 0.0
+                missing = f", нет столбцов: {', '.join(report['missing'])}" if report['missing'] else ""
+                print(f"  [{k}/{len(pending)}] {name}: {report['rows']} строк за {report['seconds']:.1f} с "
+                      f"({report['rows'] / max(report['seconds'], 1e-9):,.0f} строк/с){missing}; "
+                      f"всего {done_rows / elapsed:,.0f} строк/с, "
+                      f"{done_bytes / 1024 ** 2 / elapsed:.1f} МБ/с, осталось ~{eta:.0f} с")
+        save_ingest_manifest(store_dir, manifest)
+
+    total_time = time.perf_counter() - started
+    summary = {
+        'files': len(pending),
+        'failed': [r['path'] for r in failed],
+        'rows': done_rows,
+        'bytes': total_bytes,
+        'seconds': total_time,
+        'rows_per_sec': done_rows / total_time if total_time > 0 else 0.0,
+        'mb_per_sec': total_bytes / 1024 ** 2 / total_time if total_time > 0 else 0.0,
+        'workers': workers,
+    }
+    print(f"\nЗагружено {done_rows} строк из {len(pending) - len(failed)} файлов за {total_time:.1f} с "
+          f"({summary['rows_per_sec']:,.0f} строк/с, {summary['mb_per_sec']:.1f} МБ/с)")
+    if failed:
+        print(f"Не удалось загрузить {len(failed)} файлов: {', '.join(summary['failed'])}")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    """Загружает архив GRIB файлов в колоночное хранилище."""
+    parser = argparse.ArgumentParser(description="Пакетная загрузка GRIB архива в хранилище погоды")
+    parser.add_argument('--source', nargs='+', required=True,
+                        help="каталоги, маски (в кавычках) или пути GRIB файлов")
+    parser.add_argument('--store', default="data/weather_store")
+    parser.add_argument('--workers', type=int, default=-1, help="процессов (по умолчанию — ядер)")
+    parser.add_argument('--chunk-size', type=int, default=24, help="шагов времени в куске записи")
+    parser.add_argument('--append', action='store_true',
+                        help="дописать новые и изменённые файлы вместо пересоздания хранилища")
+    args = parser.parse_args(argv)
+
+    summary = ingest_grib_files(args.source, args.store, args.workers, args.chunk_size, args.append)
+    if summary['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
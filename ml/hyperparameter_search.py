@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Параллельный подбор гиперпараметров XGBoost.
+
+Датасет размечается и переводится в float32 матрицы один раз, матрицы
+сохраняются в .npy и открываются рабочими процессами через memory-map.
+Каждый процесс строит QuantileDMatrix один раз и переиспользует его во
+всех своих испытаниях. Ядра делятся между процессами: workers ×
+threads_per_trial = число ядер.
+
+Стратегии:
+- random — случайные конфигурации на полном числе деревьев; испытание
+  прерывается, если на контрольной итерации RMSE валидации хуже медианы
+  уже завершённых испытаний на той же итерации;
+- halving — successive halving: все конфигурации на малом числе
+  деревьев, в следующий раунд проходит лучшая 1/eta часть с числом
+  деревьев × eta.
+
+Бюджет времени ограничивает весь подбор: новые испытания не запускаются,
+а идущие останавливаются по дедлайну. Результат — таблица лидеров
+(MAE / RMSE / R² из evaluate_model, время обучения, скорость инференса)
+и лучшие параметры в формате XGB_PARAMS.
+
+Запуск (из каталога ml/):
+    python hyperparameter_search.py --strategy halving --trials 27 --budget 600
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+
+from train_safety_model import (
+    BASE_FEATURE_COLUMNS,
+    XGB_PARAMS,
+    build_feature_matrix,
+    build_training_dataset,
+    category_feature_columns,
+    evaluate_model,
+)
+
+
+# Пространство поиска: (тип, нижняя граница, верхняя граница)
+SEARCH_SPACE = {
+    'max_depth': ('int', 3, 10),
+    'learning_rate': ('log', 0.02, 0.3),
+    'subsample': ('uniform', 0.6, 1.0),
+    'colsample_bytree': ('uniform', 0.6, 1.0),
+    'min_child_weight': ('log', 1.0, 20.0),
+    'reg_lambda': ('log', 0.1, 10.0),
+    'gamma': ('uniform', 0.0, 2.0),
+}
+
+# Каждые CHECKPOINT_EVERY деревьев RMSE валидации сравнивается с медианой
+CHECKPOINT_EVERY = 25
+
+# Медиана для отсечения считается, когда завершено хотя бы столько испытаний
+MIN_TRIALS_FOR_PRUNING = 3
+
+LEADERBOARD_COLUMNS = ['trial', 'rung', 'status', 'n_estimators', 'MAE', 'RMSE', 'R2',
+                       'train_seconds', 'predict_rows_per_sec']
+
+# Данные рабочего процесса: матрицы строятся один раз на процесс
+_WORKER = {}
+
+
+def sample_params(rng: np.random.Generator, space: Dict = SEARCH_SPACE) -> Dict:
+    """Случайная конфигурация из пространства поиска."""
+    params = {}
+    for name, (kind, low, high) in space.items():
+        if kind == 'int':
+            params[name] = int(rng.integers(low, high + 1))
+        elif kind == 'log':
+            params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            params[name] = float(rng.uniform(low, high))
+    return params
+
+
+def split_cores(n_trials: int, n_workers: Optional[int] = None) -> Tuple[int, int]:
+    """Делит ядра между процессами и потоками XGBoost: (workers, threads_per_trial).
+
+    По умолчанию на испытание приходится 4 потока: меньшие деревья плохо
+    масштабируются на большее число потоков, а параллельные испытания — почти линейно.
+    """
+    cores = os.cpu_count() or 1
+    if n_workers is None:
+        n_workers = max(1, cores // 4)
+    n_workers = max(1, min(n_workers, n_trials, cores))
+    return n_workers, max(1, cores // n_workers)
+
+
+def prepare_search_data(train_df: pd.DataFrame, data_dir: str) -> List[str]:
+    """Строит float32 матрицы признаков и сохраняет их в data_dir.
+
+    Разбиение train/validation такое же, как в train_xgboost_model.
+    Возвращает список признаков.
+    """
+    feature_cols = BASE_FEATURE_COLUMNS + category_feature_columns(train_df['category'])
+    X = build_feature_matrix(train_df, feature_cols)
+    y = train_df['safety_index'].to_numpy(dtype=np.float32)
+    X_train, X_valid, y_train, y_valid = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    os.makedirs(data_dir, exist_ok=True)
+    for name, array in [('X_train', X_train), ('X_valid', X_valid),
+                        ('y_train', y_train), ('y_valid', y_valid)]:
+        np.save(os.path.join(data_dir, f"{name}.npy"), np.ascontiguousarray(array))
+    return feature_cols
+
+
+def _init_worker(data_dir: str, feature_cols: List[str], threads: int, max_bin: int):
+    """Загружает матрицы через memory-map и строит DMatrix один раз на процесс."""
+    load = lambda name: np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode='r')
+    X_train, X_valid = load('X_train'), load('X_valid')
+    _WORKER['y_valid'] = np.asarray(load('y_valid'))
+    _WORKER['X_valid'] = np.asarray(X_valid)
+    _WORKER['dtrain'] = xgb.QuantileDMatrix(X_train, label=load('y_train'), max_bin=max_bin,
+                                            nthread=threads, feature_names=feature_cols)
+    _WORKER['dvalid'] = xgb.QuantileDMatrix(X_valid, label=_WORKER['y_valid'], max_bin=max_bin,
+                                            nthread=threads, feature_names=feature_cols,
+                                            ref=_WORKER['dtrain'])
+    _WORKER['threads'] = threads
+
+
+class _PruneCallback(xgb.callback.TrainingCallback):
+    """Останавливает испытание при отставании от медианы или по дедлайну."""
+
+    def __init__(self, prune_at: Dict[int, float], deadline: float, n_estimators: int):
+        super().__init__()
+        self.prune_at = prune_at
+        self.n_estimators = n_estimators
+        self.deadline = deadline
+        self.status = 'ok'
+        self.curve = {}
+
+    def after_iteration(self, model, epoch: int, evals_log) -> bool:
+        n_trees = epoch + 1
+        if n_trees % CHECKPOINT_EVERY == 0:
+            rmse = evals_log['valid']['rmse'][-1]
+            self.curve[n_trees] = rmse
+            # На последней итерации отсекать уже нечего: испытание завершено
+            if (n_trees < self.n_estimators and n_trees in self.prune_at
+                    and rmse > self.prune_at[n_trees]):
+                self.status = 'pruned'
+                return True
+        if time.time() > self.deadline:
+            self.status = 'timeout'
+            return True
+        return False
+
+
+def run_trial(trial: int, rung: int, params: Dict, n_estimators: int,
+              prune_at: Dict[int, float], deadline: float,
+              early_stopping_rounds: int, seed: int) -> Dict:
+    """Обучает одну конфигурацию в рабочем процессе и считает метрики."""
+    callback = _PruneCallback(prune_at, deadline, n_estimators)
+    train_params = {
+        'objective': 'reg:squarederror',
+        'tree_method': 'hist',
+        'eval_metric': 'rmse',
+        'nthread': _WORKER['threads'],
+        'seed': seed,
+        **params,
+    }
+
+    started = time.perf_counter()
+    booster = xgb.train(train_params, _WORKER['dtrain'], num_boost_round=n_estimators,
+                        evals=[(_WORKER['dvalid'], 'valid')],
+                        early_stopping_rounds=early_stopping_rounds,
+                        callbacks=[callback], verbose_eval=False)
+    train_seconds = time.perf_counter() - started
+
+    # Если испытание остановлено раньше первой оценки, best_iteration не задан
+    best_iteration = booster.attr('best_iteration')
+    best_rounds = int(best_iteration) + 1 if best_iteration is not None else booster.num_boosted_rounds()
+    predict_started = time.perf_counter()
+    y_pred = booster.inplace_predict(_WORKER['X_valid'], iteration_range=(0, best_rounds))
+    predict_seconds = time.perf_counter() - predict_started
+
+    # evaluate_model печатает метрики; в рабочих процессах вывод не нужен
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = evaluate_model(_WORKER['y_valid'], y_pred, "Validation")
+
+    return {
+        'trial': trial,
+        'rung': rung,
+        'status': callback.status,
+        'n_estimators': best_rounds,
+        **{k: float(v) for k, v in metrics.items()},
+        'train_seconds': train_seconds,
+        'predict_rows_per_sec': len(y_pred) / predict_seconds if predict_seconds > 0 else float('inf'),
+        'params': params,
+        'curve': callback.curve,
+    }
+
+
+def _median_thresholds(curves: List[Dict[int, float]]) -> Dict[int, float]:
+    """Медиана RMSE завершённых испытаний на каждой контрольной итерации."""
+    by_round = {}
+    for curve in curves:
+        for n_trees, rmse in curve.items():
+            by_round.setdefault(n_trees, []).append(rmse)
+    return {n: float(np.median(v)) for n, v in by_round.items() if len(v) >= MIN_TRIALS_FOR_PRUNING}
+
+
+def _run_batch(pool: ProcessPoolExecutor, n_workers: int, jobs: List[Tuple[int, Dict]],
+               rung: int, n_estimators: int, deadline: float, prune: bool,
+               early_stopping_rounds: int, seed: int) -> List[Dict]:
+    """Выполняет испытания, держа в работе не больше n_workers.
+
+    Новое испытание отправляется, когда завершилось предыдущее, чтобы
+    порог отсечения учитывал все уже известные кривые обучения.
+    """
+    results, curves, pending = [], [], {}
+    queue = list(jobs)
+    while queue or pending:
+        while queue and len(pending) < n_workers and time.time() < deadline:
+            trial, params = queue.pop(0)
+            prune_at = _median_thresholds(curves) if prune else {}
+            future = pool.submit(run_trial, trial, rung, params, n_estimators, prune_at,
+                                 deadline, early_stopping_rounds, seed + trial)
+            pending[future] = trial
+        if not pending:
+            break
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.pop(future)
+            result = future.result()
+            results.append(result)
+            if result['status'] == 'ok':
+                curves.append(result['curve'])
+            print(f"  Испытание {result['trial']:3d} (раунд {rung}): {result['status']:7s} "
+                  f"RMSE {result['RMSE']:.4f}, деревьев {result['n_estimators']}, "
+                  f"{result['train_seconds']:.1f} с")
+    return results
+
+
+def search_hyperparameters(train_df: pd.DataFrame,
+                           strategy: str = 'halving',
+                           n_trials: int = 27,
+                           max_estimators: int = 500,
+                           min_estimators: int = 50,
+                           eta: int = 3,
+                           time_budget: float = 600.0,
+                           n_workers: Optional[int] = None,
+                           early_stopping_rounds: int = 30,
+                           max_bin: int = 256,
+                           output_dir: str = "models/tuning",
+                           seed: int = 42) -> pd.DataFrame:
+    """Подбирает гиперпараметры и пишет таблицу лидеров в output_dir.
+
+    Возвращает таблицу лидеров, отсортированную по RMSE валидации. Лучшие
+    параметры сохраняются в best_params.json в формате XGB_PARAMS.
+    """
+    print("ПОДБОР ГИПЕРПАРАМЕТРОВ")
+    started = time.time()
+    deadline = started + time_budget
+    rng = np.random.default_rng(seed)
+    configs = [(trial, sample_params(rng)) for trial in range(n_trials)]
+
+    n_workers, threads = split_cores(n_trials, n_workers)
+    print(f"\nСтратегия: {strategy}, испытаний: {n_trials}, бюджет: {time_budget:.0f} с")
+    print(f"Процессов: {n_workers}, потоков XGBoost на испытание: {threads}")
+
+    data_dir = tempfile.mkdtemp(prefix="guardian_tuning_")
+    results = []
+    try:
+        feature_cols = prepare_search_data(train_df, data_dir)
+        # spawn: рабочие процессы не наследуют состояние OpenMP родителя
+        pool = ProcessPoolExecutor(max_workers=n_workers,
+                                   mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker,
+                                   initargs=(data_dir, feature_cols, threads, max_bin))
+        with pool:
+            if strategy == 'random':
+                results = _run_batch(pool, n_workers, configs, 0, max_estimators, deadline,
+                                     True, early_stopping_rounds, seed)
+            elif strategy == 'halving':
+                survivors, rung, n_estimators = configs, 0, min_estimators
+                while survivors and time.time() < deadline:
+                    print(f"\nРаунд {rung}: {len(survivors)} конфигураций по {n_estimators} деревьев")
+                    rung_results = _run_batch(pool, n_workers, survivors, rung, n_estimators,
+                                              deadline, False, early_stopping_rounds, seed)
+                    results.extend(rung_results)
+                    if n_estimators >= max_estimators or len(survivors) == 1:
+                        break
+                    finished = sorted((r for r in rung_results if r['status'] == 'ok'),
+                                      key=lambda r: r['RMSE'])
+                    keep = {r['trial'] for r in finished[:max(1, math.ceil(len(survivors) / eta))]}
+                    survivors = [(t, p) for t, p in survivors if t in keep]
+                    rung, n_estimators = rung + 1, min(n_estimators * eta, max_estimators)
+            else:
+                raise ValueError(f"Неизвестная стратегия: {strategy}")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if not results:
+        raise RuntimeError("Бюджет времени исчерпан до завершения первого испытания")
+
+    # В таблицу лидеров — последний (самый полный) раунд каждой конфигурации
+    leaderboard = pd.DataFrame([
+        {**{k: r[k] for k in LEADERBOARD_COLUMNS}, **r['params']} for r in results
+    ])
+    leaderboard = (leaderboard.sort_values('rung').drop_duplicates('trial', keep='last')
+                   .sort_values(['status', 'RMSE'], key=lambda c: c.ne('ok') if c.name == 'status' else c)
+                   .reset_index(drop=True))
+
+    os.makedirs(output_dir, exist_ok=True)
+    leaderboard.to_csv(os.path.join(output_dir, "leaderboard.csv"), index=False)
+
+    best = leaderboard.iloc[0]
+    best_params = {**XGB_PARAMS, 'n_estimators': int(best['n_estimators'])}
+    best_params.update({k: (int(best[k]) if SEARCH_SPACE[k][0] == 'int' else float(best[k]))
+                        for k in SEARCH_SPACE})
+    with open(os.path.join(output_dir, "best_params.json"), 'w', encoding='utf-8') as f:
+        json.dump(best_params, f, ensure_ascii=False, indent=2)
+
+    print(f"\nПодбор занял {time.time() - started:.1f} с, испытаний: {len(results)}")
+    print(leaderboard[LEADERBOARD_COLUMNS].head(10).to_string(index=False))
+    print(f"\nТаблица лидеров и лучшие параметры сохранены в {output_dir}")
+    return leaderboard
+
+
+def main(argv: Optional[List[str]] = None):
+    """Подбор гиперпараметров на датасете из паспортов дронов и погоды."""
+    parser = argparse.ArgumentParser(description="Параллельный подбор гиперпараметров XGBoost")
+    parser.add_argument('--drones', default="data/drone_specs.csv")
+    parser.add_argument('--weather', default="data/weather.csv",
+                        help="CSV или каталог Parquet-хранилища погоды")
+    parser.add_argument('--samples-per-drone', type=int, default=200)
+    parser.add_argument('--strategy', choices=['random', 'halving'], default='halving')
+    parser.add_argument('--trials', type=int, default=27)
+    parser.add_argument('--max-estimators', type=int, default=500)
+    parser.add_argument('--min-estimators', type=int, default=50)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=600.0, help="бюджет времени, с")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output-dir', default="models/tuning")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.weather):
+        from weather_store import read_weather_store
+        weather_df = read_weather_store(args.weather)
+    else:
+        weather_df = pd.read_csv(args.weather, parse_dates=['timestamp'])
+    train_df = build_training_dataset(pd.read_csv(args.drones), weather_df,
+                                      samples_per_drone=args.samples_per_drone)
+
+    search_hyperparameters(train_df, strategy=args.strategy, n_trials=args.trials,
+                           max_estimators=args.max_estimators,
+                           min_estimators=args.min_estimators, eta=args.eta,
+                           time_budget=args.budget, n_workers=args.workers,
+                           output_dir=args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Инкрементальное дообучение модели при поступлении новых GRIB файлов
+и паспортов дронов.
+
+Манифест (models/training_manifest.json) хранит отпечатки уже
+обработанных GRIB файлов, хэши паспортов дронов и эталонные
+распределения погоды последнего полного обучения. При запуске
+конвертируются и размечаются только новые данные:
+- новые GRIB файлы × все дроны;
+- новые или изменённые дроны × уже обработанная погода.
+
+Если распределение новой погоды заметно сдвинулось (PSI выше порога)
+или появилась новая категория дронов, модель обучается заново на всех
+данных; иначе бустинг продолжается от сохранённой модели (xgb_model=).
+
+Запуск (из каталога ml/):
+    python incremental_training.py --grib "data/grib/*.grib"
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+
+from batch_predictor import load_model_artifact
+from conversion_cache import (
+    DEFAULT_CACHE_DIR,
+    cache_key,
+    file_fingerprint,
+    load_cached_weather,
+    save_cached_weather,
+)
+from train_safety_model import (
+    DRONE_SPEC_COLUMNS,
+    WEATHER_VAR_ALIASES,
+    XGB_PARAMS,
+    build_feature_frame,
+    build_training_dataset,
+    evaluate_model,
+    grib_to_weather_table,
+    save_model_artifact,
+    train_xgboost_model,
+)
+from weather_store import write_weather_store
+
+
+MANIFEST_FILE = "training_manifest.json"
+MANIFEST_VERSION = 1
+
+# Погодные признаки, по которым отслеживается сдвиг распределения
+DRIFT_COLUMNS = ['temp_c', 'wind_speed', 'wind_gust', 'precip', 'cloud_cover']
+
+# PSI > 0.25 принято считать существенным сдвигом распределения
+DEFAULT_DRIFT_THRESHOLD = 0.25
+
+# Число деревьев, добавляемых при дообучении
+DEFAULT_WARM_ROUNDS = 20
+
+
+def load_manifest(model_dir: str = "models") -> Dict:
+    """Читает манифест обработанных данных; при отсутствии возвращает пустой."""
+    path = os.path.join(model_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    return {'version': MANIFEST_VERSION, 'files': {}, 'drones': {}, 'baseline': {}, 'history': []}
+
+
+def save_manifest(manifest: Dict, model_dir: str = "models"):
+    """Атомарно записывает манифест рядом с моделью."""
+    os.makedirs(model_dir, exist_ok=True)
+    path = os.path.join(model_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def drone_spec_hashes(drone_specs_df: pd.DataFrame) -> Dict[str, str]:
+    """Хэш паспортных признаков каждого дрона: изменение паспорта = новый дрон."""
+    hashes = pd.util.hash_pandas_object(drone_specs_df[DRONE_SPEC_COLUMNS], index=False)
+    return dict(zip(drone_specs_df['drone_id'].astype(str), hashes.astype(str)))
+
+
+def load_grib_weather(grib_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """Погодная таблица GRIB файла: из кэша конвертации или декодированием."""
+    key = cache_key(grib_path, WEATHER_VAR_ALIASES, cache_dir)
+    weather_df = load_cached_weather(key, cache_dir)
+    if weather_df is None:
+        weather_df, var_map = grib_to_weather_table(grib_path)
+        save_cached_weather(key, grib_path, weather_df, var_map, cache_dir)
+    return weather_df
+
+
+def _load_weather(paths: List[str], cache_dir: str) -> pd.DataFrame:
+    frames = [load_grib_weather(p, cache_dir) for p in paths]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def drift_baseline(df: pd.DataFrame, n_bins: int = 10) -> Dict[str, Dict]:
+    """Эталон для PSI: границы квантильных корзин и доли строк в них."""
+    baseline = {}
+    for col in DRIFT_COLUMNS:
+        values = df[col].to_numpy(dtype=np.float64)
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        baseline[col] = {'edges': edges.tolist(), 'proportions': (counts / len(values)).tolist()}
+    return baseline
+
+
+def population_stability(df: pd.DataFrame, baseline: Dict[str, Dict]) -> Dict[str, float]:
+    """PSI каждого погодного признака новых данных относительно эталона."""
+    eps = 1e-4
+    psi = {}
+    for col, ref in baseline.items():
+        values = df[col].to_numpy(dtype=np.float64)
+        edges = np.asarray(ref['edges'])
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        actual = np.maximum(counts / max(len(values), 1), eps)
+        expected = np.maximum(np.asarray(ref['proportions']), eps)
+        psi[col] = float(np.sum((actual - expected) * np.log(actual / expected)))
+    return psi
+
+
+def warm_start_model(model_dir: str, new_df: pd.DataFrame,
+                     rounds: int = DEFAULT_WARM_ROUNDS):
+    """Продолжает бустинг сохранённой модели на новых данных.
+
+    Возвращает (модель, признаки, метрики до и после на отложенной части новых данных).
+    """
+    artifact = load_model_artifact(model_dir)
+    # Бустер обучен на DataFrame и проверяет имена признаков
+    X = build_feature_frame(new_df, artifact.feature_cols)
+    y = new_df['safety_index'].to_numpy()
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    before = evaluate_model(y_val, artifact.booster.inplace_predict(X_val), "новых данных до дообучения")
+
+    model = xgb.XGBRegressor(**{**XGB_PARAMS, 'n_estimators': rounds})
+    model.fit(X_train, y_train, xgb_model=artifact.booster)
+
+    after = evaluate_model(y_val, model.predict(X_val), "новых данных после дообучения")
+    return model, artifact.feature_cols, before, after
+
+
+def incremental_update(grib_paths: List[str],
+                       drone_specs_path: str = "data/drone_specs.csv",
+                       model_dir: str = "models",
+                       cache_dir: str = DEFAULT_CACHE_DIR,
+                       store_dir: Optional[str] = None,
+                       rounds: int = DEFAULT_WARM_ROUNDS,
+                       drift_threshold: float = DEFAULT_DRIFT_THRESHOLD,
+                       samples_per_drone: Optional[int] = 20,
+                       force_full: bool = False) -> Dict:
+    """Обновляет модель по новым GRIB файлам и паспортам дронов.
+
+    Возвращает отчёт запуска: режим ('skip', 'warm' или 'full'), причину,
+    число новых файлов, дронов и строк, PSI и время.
+    """
+    print("ИНКРЕМЕНТАЛЬНОЕ ОБУЧЕНИЕ МОДЕЛИ")
+    started = time.perf_counter()
+    manifest = load_manifest(model_dir)
+
+    drone_specs_df = pd.read_csv(drone_specs_path)
+    hashes = drone_spec_hashes(drone_specs_df)
+    new_drone_mask = np.array([manifest['drones'].get(d) != h for d, h in hashes.items()])
+
+    fingerprints = {os.path.abspath(p): file_fingerprint(p, cache_dir) for p in grib_paths}
+    new_files = [p for p, sha in fingerprints.items()
+                 if manifest['files'].get(p, {}).get('sha256') != sha]
+    old_files = [p for p in manifest['files'] if p not in new_files and os.path.exists(p)]
+    has_model = os.path.exists(os.path.join(model_dir, "feature_schema.json"))
+
+    print(f"\nНовых GRIB файлов: {len(new_files)}, новых или изменённых дронов: {int(new_drone_mask.sum())}")
+    report = {
+        'new_files': len(new_files),
+        'new_drones': int(new_drone_mask.sum()),
+        'rows': 0,
+        'psi': {},
+    }
+
+    if not new_files and not new_drone_mask.any() and has_model and not force_full:
+        print("Новых данных нет, модель не изменилась")
+        report.update(mode='skip', reason='нет новых данных', seconds=time.perf_counter() - started)
+        return report
+
+    # Размечаем только новые комбинации дрон × погода
+    new_weather = _load_weather(new_files, cache_dir)
+    if store_dir and len(new_weather):
+        write_weather_store(new_weather, store_dir, overwrite=False)
+
+    parts = []
+    if len(new_weather):
+        parts.append(build_training_dataset(drone_specs_df, new_weather,
+                                            samples_per_drone=samples_per_drone))
+    if new_drone_mask.any() and old_files:
+        parts.append(build_training_dataset(drone_specs_df[new_drone_mask].reset_index(drop=True),
+                                            _load_weather(old_files, cache_dir),
+                                            samples_per_drone=samples_per_drone))
+    new_df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    report['rows'] = len(new_df)
+
+    # Выбор режима: полное обучение или продолжение бустинга
+    if not has_model or force_full:
+        mode, reason = 'full', 'полное обучение запрошено' if force_full else 'нет сохранённой модели'
+    elif new_df.empty:
+        mode, reason = 'skip', 'новые дроны без обработанной погоды'
+    else:
+        schema_categories = set(load_model_artifact(model_dir).schema['categories'])
+        unseen = set(new_df['category'].unique()) - schema_categories
+        # Манифест без эталона (модель дообучалась только warm): эталон — уже обработанная погода
+        if len(new_weather) and not manifest['baseline'] and old_files:
+            manifest['baseline'] = drift_baseline(_load_weather(old_files, cache_dir))
+        # Сдвиг считается по всей новой погоде, а не по выборке пар дрон × погода
+        if len(new_weather) and manifest['baseline']:
+            report['psi'] = population_stability(new_weather, manifest['baseline'])
+            print(f"\nPSI новой погоды: {', '.join(f'{k}={v:.3f}' for k, v in report['psi'].items())}")
+        max_psi = max(report['psi'].values(), default=0.0)
+        if unseen:
+            mode, reason = 'full', f"новые категории дронов: {sorted(unseen)}"
+        elif len(new_weather) and not manifest['baseline']:
+            # Модель обучена train_safety_model.py без манифеста: сдвиг сравнить не с чем
+            mode, reason = 'full', 'нет эталона распределения погоды для PSI'
+        elif max_psi > drift_threshold:
+            mode, reason = 'full', f"сдвиг распределения PSI={max_psi:.3f} > {drift_threshold}"
+        elif report['psi']:
+            mode, reason = 'warm', f"PSI={max_psi:.3f} <= {drift_threshold}"
+        else:
+            mode, reason = 'warm', 'новые дроны, погода без изменений'
+    print(f"\nРежим: {mode} ({reason})")
+
+    if mode == 'full':
+        all_weather = _load_weather(old_files + new_files, cache_dir)
+        train_df = build_training_dataset(drone_specs_df, all_weather,
+                                          samples_per_drone=samples_per_drone)
+        model, _, _, _, y_test, _, y_test_pred, feature_cols = train_xgboost_model(train_df)
+        report['metrics'] = evaluate_model(y_test, y_test_pred, "Test")
+        manifest['baseline'] = drift_baseline(all_weather)
+        save_model_artifact(model, feature_cols, model_dir)
+    elif mode == 'warm':
+        model, feature_cols, before, after = warm_start_model(model_dir, new_df, rounds)
+        report['metrics_before'], report['metrics'] = before, after
+        save_model_artifact(model, feature_cols, model_dir)
+
+    # Данные считаются обработанными только после сохранения модели
+    if mode != 'skip':
+        for path in new_files:
+            manifest['files'][path] = {'sha256': fingerprints[path], 'processed_at': time.time()}
+        manifest['drones'] = hashes
+        manifest['trees'] = model.get_booster().num_boosted_rounds()
+
+    report.update(mode=mode, reason=reason, seconds=time.perf_counter() - started)
+    manifest['history'].append({k: v for k, v in report.items() if k != 'psi'})
+    save_manifest(manifest, model_dir)
+
+    print(f"\nОбновление завершено за {report['seconds']:.1f} с")
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    """Обрабатывает новые GRIB файлы и паспорта дронов."""
+    parser = argparse.ArgumentParser(description="Инкрементальное дообучение модели безопасности")
+    parser.add_argument('--grib', nargs='+', default=["data/data.grib"],
+                        help="GRIB файлы или шаблоны glob")
+    parser.add_argument('--drones', default="data/drone_specs.csv")
+    parser.add_argument('--model-dir', default="models")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--store-dir', default=None,
+                        help="дописывать новую погоду в Parquet-хранилище")
+    parser.add_argument('--rounds', type=int, default=DEFAULT_WARM_ROUNDS)
+    parser.add_argument('--drift-threshold', type=float, default=DEFAULT_DRIFT_THRESHOLD)
+    parser.add_argument('--samples-per-drone', type=int, default=20)
+    parser.add_argument('--full', action='store_true', help="обучить модель заново на всех данных")
+    args = parser.parse_args(argv)
+
+    grib_paths = sorted({p for pattern in args.grib for p in (glob.glob(pattern) or [pattern])})
+    incremental_update(grib_paths, args.drones, args.model_dir, args.cache_dir,
+                       store_dir=args.store_dir, rounds=args.rounds,
+                       drift_threshold=args.drift_threshold,
+                       samples_per_drone=args.samples_per_drone, force_full=args.full)
+
+
+if __name__ == "__main__":
+    main()
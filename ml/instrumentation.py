@@ -0,0 +1,162 @@
+"""
+Замеры этапов пайплайна обучения.
+
+Каждый этап оборачивается в контекст RunReport.stage(...), который
+записывает время по часам, процессорное время, пиковую память процесса
+и скорость (строк/с, если этап сообщил число строк). Итог сохраняется
+в машиночитаемый JSON отчёт запуска. Для одного выбранного этапа можно
+включить профилировщик cProfile (или pyinstrument, если установлен).
+"""
+
+import cProfile
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    """Возвращает пиковое потребление памяти процессом (МБ)."""
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На macOS ru_maxrss в байтах, на Linux — в килобайтах
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class StageRecord:
+    """Замер одного этапа; rows заполняет сам этап, если обрабатывает строки."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: Optional[int] = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self.rss_growth_mb = 0.0
+        self.profile_path: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        record = {
+            'name': self.name,
+            'wall_seconds': round(self.wall_seconds, 4),
+            'cpu_seconds': round(self.cpu_seconds, 4),
+            # CPU / wall > 1 — этап использует несколько ядер
+            'cpu_utilization': round(self.cpu_seconds / self.wall_seconds, 3) if self.wall_seconds > 0 else None,
+            'peak_rss_mb': round(self.peak_rss_mb, 1),
+            'rss_growth_mb': round(self.rss_growth_mb, 1),
+            'rows': self.rows,
+            'rows_per_sec': (round(self.rows / self.wall_seconds, 1)
+                             if self.rows is not None and self.wall_seconds > 0 else None),
+        }
+        if self.profile_path:
+            record['profile'] = self.profile_path
+        return record
+
+
+class RunReport:
+    """Отчёт запуска пайплайна: список замеров этапов.
+
+    profile_stage — имя этапа для профилирования, profile_format —
+    'cprofile' (файл .prof для pstats / snakeviz) или 'pyinstrument' (HTML).
+    """
+
+    def __init__(self, profile_stage: Optional[str] = None,
+                 profile_format: str = 'cprofile',
+                 profile_dir: str = "reports"):
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        self.stages: List[StageRecord] = []
+        self.profile_stage = profile_stage
+        self.profile_format = profile_format
+        self.profile_dir = profile_dir
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Замеряет этап name; внутри можно задать record.rows."""
+        record = StageRecord(name)
+        profiler = self._start_profiler(name)
+        rss_before = peak_rss_mb()
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_seconds = time.perf_counter() - wall_started
+            record.cpu_seconds = time.process_time() - cpu_started
+            record.peak_rss_mb = peak_rss_mb()
+            record.rss_growth_mb = record.peak_rss_mb - rss_before
+            if profiler is not None:
+                record.profile_path = self._stop_profiler(name, profiler)
+            self.stages.append(record)
+            print(f"\n[{name}] {record.wall_seconds:.2f} с (CPU {record.cpu_seconds:.2f} с), "
+                  f"пиковая память {record.peak_rss_mb:.1f} МБ"
+                  + (f", {record.rows} строк" if record.rows is not None else ""))
+
+    def _start_profiler(self, name: str):
+        if name != self.profile_stage:
+            return None
+        if self.profile_format == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def _stop_profiler(self, name: str, profiler) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if self.profile_format == 'pyinstrument':
+            profiler.stop()
+            path = os.path.join(self.profile_dir, f"profile_{name}.html")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.disable()
+            path = os.path.join(self.profile_dir, f"profile_{name}.prof")
+            profiler.dump_stats(path)
+        print(f"Профиль этапа {name} сохранён в {path}")
+        return path
+
+    def to_dict(self) -> Dict:
+        return {
+            'started_at': self.started_at,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'total_wall_seconds': round(time.perf_counter() - self._started, 4),
+            'total_cpu_seconds': round(time.process_time() - self._cpu_started, 4),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'stages': [s.to_dict() for s in self.stages],
+        }
+
+    def write(self, path: str) -> str:
+        """Сохраняет отчёт запуска в JSON."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"\nОтчёт запуска сохранён в {path}")
+        return path
+
+    def print_summary(self):
+        """Короткая таблица этапов: доля времени каждого этапа в запуске."""
+        total = sum(s.wall_seconds for s in self.stages) or 1.0
+        print("\nВРЕМЯ ПО ЭТАПАМ:")
+        for s in self.stages:
+            rate = f"{s.rows / s.wall_seconds:,.0f} строк/с" if s.rows and s.wall_seconds > 0 else ""
+            print(f"  {s.name:10s} {s.wall_seconds:8.2f} с  {100 * s.wall_seconds / total:5.1f}%  "
+                  f"CPU {s.cpu_seconds:8.2f} с  {s.peak_rss_mb:8.1f} МБ  {rate}")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Обучение модели безопасности на данных больше оперативной памяти.
+
+В отличие от train_xgboost_model (pandas DataFrame целиком в памяти),
+обучающие строки строятся потоково из колоночного хранилища погоды:
+итератор xgb.DataIter читает хранилище кусками, сопоставляет каждой
+погодной строке случайных дронов, размечает их векторным labeller'ом и
+отдаёт XGBoost float32 матрицы. Из кусков XGBoost строит
+QuantileDMatrix (квантованные гистограммы вместо исходных float), а в
+режиме external memory — страницы на диске (ExtMemQuantileDMatrix).
+Обучение идёт методом 'hist' на всех ядрах с ранней остановкой по
+валидационной выборке — последним дням хранилища.
+
+Запуск (из каталога ml/):
+    python large_scale_training.py --store data/weather_store --external-memory
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from train_safety_model import (
+    BASE_FEATURE_COLUMNS,
+    WEATHER_SAMPLE_COLUMNS,
+    add_engineered_features,
+    build_feature_matrix,
+    calc_safety_index_vec,
+    category_feature_columns,
+    gather_pair_columns,
+    peak_rss_mb,
+    save_model_artifact,
+)
+from weather_store import iter_weather_batches, store_dates
+
+
+# Параметры бустинга для больших выборок
+LARGE_SCALE_PARAMS = {
+    'objective': 'reg:squarederror',
+    'tree_method': 'hist',
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'max_bin': 256,
+    'eval_metric': ['rmse', 'mae'],
+    'seed': 42,
+}
+
+
+class TrainingBatchIter(xgb.DataIter):
+    """Итератор обучающих батчей поверх колоночного хранилища погоды.
+
+    XGBoost проходит по данным несколько раз, поэтому каждый проход должен
+    давать одинаковые батчи: генератор случайных чисел батча k
+    инициализируется от seed + k.
+    """
+
+    def __init__(self, store_dir: str, drone_specs_df: pd.DataFrame,
+                 feature_cols: List[str], start: Optional[str] = None,
+                 end: Optional[str] = None, drones_per_row: int = 1,
+                 batch_rows: int = 1_000_000, seed: int = 42,
+                 cache_prefix: Optional[str] = None):
+        self.store_dir = store_dir
+        self.drone_specs_df = drone_specs_df.reset_index(drop=True)
+        self.feature_cols = feature_cols
+        self.start = start
+        self.end = end
+        self.drones_per_row = drones_per_row
+        self.batch_rows = batch_rows
+        self.seed = seed
+        self._batches = None
+        self._k = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._batches = iter_weather_batches(self.store_dir, self.start, self.end,
+                                             columns=WEATHER_SAMPLE_COLUMNS,
+                                             batch_rows=self.batch_rows)
+        self._k = 0
+
+    def next(self, input_data) -> bool:
+        if self._batches is None:
+            self.reset()
+        weather_df = next(self._batches, None)
+        if weather_df is None:
+            return False
+
+        rng = np.random.default_rng(self.seed + self._k)
+        X, y = label_weather_batch(self.drone_specs_df, weather_df, self.feature_cols,
+                                   self.drones_per_row, rng)
+        input_data(data=X, label=y, feature_names=self.feature_cols)
+        self._k += 1
+        return True
+
+
+def label_weather_batch(drone_specs_df: pd.DataFrame, weather_df: pd.DataFrame,
+                        feature_cols: List[str], drones_per_row: int,
+                        rng: np.random.Generator):
+    """Размечает кусок погоды: каждой строке — drones_per_row случайных дронов.
+
+    Возвращает (X float32, y float32).
+    """
+    weather_idx = np.repeat(np.arange(len(weather_df)), drones_per_row)
+    drone_idx = rng.integers(len(drone_specs_df), size=len(weather_idx))
+
+    df = gather_pair_columns(drone_specs_df, weather_df, drone_idx, weather_idx)
+    add_engineered_features(df)
+    df['visibility_km'] = rng.uniform(0.5, 15.0, len(df))
+
+    y = calc_safety_index_vec(df).astype(np.float32)
+    return build_feature_matrix(df, feature_cols), y
+
+
+def _quantile_matrix(data_iter: TrainingBatchIter, max_bin: int, n_jobs: int,
+                     external_memory: bool, ref=None):
+    """QuantileDMatrix из итератора; при external_memory страницы хранятся на диске."""
+    if external_memory:
+        if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+            return xgb.ExtMemQuantileDMatrix(data_iter, max_bin=max_bin, nthread=n_jobs, ref=ref)
+        # До XGBoost 3.0 внешняя память доступна через DMatrix с cache_prefix
+        return xgb.DMatrix(data_iter, nthread=n_jobs)
+    return xgb.QuantileDMatrix(data_iter, max_bin=max_bin, nthread=n_jobs, ref=ref)
+
+
+def train_large_scale(store_dir: str, drone_specs_df: pd.DataFrame,
+                      model_dir: str = "models",
+                      valid_from: Optional[str] = None,
+                      drones_per_row: int = 1,
+                      batch_rows: int = 1_000_000,
+                      num_boost_round: int = 1000,
+                      early_stopping_rounds: int = 50,
+                      external_memory: bool = False,
+                      cache_dir: str = "data/xgb_cache",
+                      n_jobs: int = -1,
+                      params: Optional[Dict] = None) -> Dict:
+    """Обучает модель потоково по хранилищу с ранней остановкой.
+
+    valid_from — первый день валидационной выборки (по умолчанию последний
+    день хранилища); обучающая выборка — все дни до него. Возвращает
+    отчёт: строки, лучшая итерация, метрики валидации, время и пиковая память.
+    """
+    print("ШАГ 4: Обучение модели на большом датасете")
+    started = time.perf_counter()
+    params = {**LARGE_SCALE_PARAMS, **(params or {})}
+    n_jobs = n_jobs if n_jobs > 0 else os.cpu_count()
+    params['nthread'] = n_jobs
+
+    dates = store_dates(store_dir)
+    if len(dates) < 2:
+        raise ValueError("Для валидации по времени в хранилище нужно минимум два дня")
+    valid_from = valid_from or dates[-1]
+    train_end = (pd.Timestamp(valid_from) - pd.Timedelta(1, 'ns')).isoformat()
+    print(f"\nОбучение: {dates[0]} .. {train_end[:10]}, валидация: {valid_from} .. {dates[-1]}")
+
+    feature_cols = BASE_FEATURE_COLUMNS + category_feature_columns(drone_specs_df['category'])
+
+    cache_prefix = None
+    if external_memory:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_prefix = os.path.join(cache_dir, "train")
+    train_iter = TrainingBatchIter(store_dir, drone_specs_df, feature_cols, end=train_end,
+                                   drones_per_row=drones_per_row, batch_rows=batch_rows,
+                                   cache_prefix=cache_prefix)
+    valid_iter = TrainingBatchIter(store_dir, drone_specs_df, feature_cols, start=valid_from,
+                                   drones_per_row=drones_per_row, batch_rows=batch_rows,
+                                   seed=10_000)
+
+    dtrain = _quantile_matrix(train_iter, params['max_bin'], n_jobs, external_memory)
+    # Валидация квантуется по границам обучающей матрицы
+    dvalid = xgb.QuantileDMatrix(valid_iter, max_bin=params['max_bin'], nthread=n_jobs, ref=dtrain)
+    build_time = time.perf_counter() - started
+    print(f"\nМатрицы построены за {build_time:.1f} с: обучение {dtrain.num_row()} строк, "
+          f"валидация {dvalid.num_row()} строк, пиковая память {peak_rss_mb():.1f} МБ")
+
+    evals_result = {}
+    booster = xgb.train(
+        params, dtrain,
+        num_boost_round=num_boost_round,
+        evals=[(dtrain, 'train'), (dvalid, 'valid')],
+        early_stopping_rounds=early_stopping_rounds,
+        evals_result=evals_result,
+        verbose_eval=50,
+    )
+
+    # Сохраняем только деревья до лучшей итерации
+    best_iteration = booster.best_iteration
+    best_booster = booster[:best_iteration + 1]
+    save_model_artifact(best_booster, feature_cols, model_dir)
+
+    total_time = time.perf_counter() - started
+    report = {
+        'train_rows': dtrain.num_row(),
+        'valid_rows': dvalid.num_row(),
+        'best_iteration': best_iteration,
+        'valid_rmse': evals_result['valid']['rmse'][best_iteration],
+        'valid_mae': evals_result['valid']['mae'][best_iteration],
+        'matrix_seconds': build_time,
+        'seconds': total_time,
+        'matrix_rows_per_sec': (dtrain.num_row() + dvalid.num_row()) / max(build_time, 1e-9),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    print(f"\nЛучшая итерация: {best_iteration}, валидация RMSE {report['valid_rmse']:.4f}, "
+          f"MAE {report['valid_mae']:.4f}")
+    print(f"Обучение заняло {total_time:.1f} с, пиковая память {report['peak_rss_mb']:.1f} МБ")
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    """Обучает модель по колоночному хранилищу погоды."""
+    parser = argparse.ArgumentParser(description="Обучение модели безопасности на большом датасете")
+    parser.add_argument('--store', default="data/weather_store")
+    parser.add_argument('--drones', default="data/drone_specs.csv")
+    parser.add_argument('--model-dir', default="models")
+    parser.add_argument('--valid-from', default=None, help="первый день валидации (YYYY-MM-DD)")
+    parser.add_argument('--drones-per-row', type=int, default=1)
+    parser.add_argument('--batch-rows', type=int, default=1_000_000)
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--early-stopping', type=int, default=50)
+    parser.add_argument('--external-memory', action='store_true',
+                        help="хранить квантованную матрицу на диске, а не в памяти")
+    parser.add_argument('--cache-dir', default="data/xgb_cache")
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    args = parser.parse_args(argv)
+
+    train_large_scale(args.store, pd.read_csv(args.drones), args.model_dir,
+                      valid_from=args.valid_from, drones_per_row=args.drones_per_row,
+                      batch_rows=args.batch_rows, num_boost_round=args.rounds,
+                      early_stopping_rounds=args.early_stopping,
+                      external_memory=args.external_memory, cache_dir=args.cache_dir,
+                      n_jobs=args.n_jobs)
+
+
+if __name__ == "__main__":
+    main()
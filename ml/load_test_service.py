@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест сервиса оценки безопасности (scoring_service.py).
+
+Поднимает сервис в отдельном процессе с локальной синтетической погодой
+(GUARDIAN_WEATHER=stub), обстреливает его конкурентными запросами
+в течение заданного времени и сравнивает p50/p99 задержки с целевыми
+значениями LATENCY_TARGETS_MS. Код возврата 1, если цели не достигнуты.
+
+Пример (из каталога ml/):
+    python load_test_service.py --concurrency 64 --duration 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from scoring_service import LATENCY_TARGETS_MS
+
+
+def _get_json(url: str, timeout: float = 10.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def wait_until_ready(base_url: str, timeout: float = 60.0):
+    """Ждёт, пока сервис начнёт отвечать на /health."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            _get_json(f"{base_url}/health", timeout=1.0)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Сервис не запустился за отведённое время")
+
+
+def run_client(base_url: str, drone_ids, deadline: float, seed: int):
+    """Шлёт запросы к случайным точкам и дронам до дедлайна, возвращает задержки (мс)."""
+    rng = np.random.default_rng(seed)
+    latencies = []
+    errors = 0
+    while time.time() < deadline:
+        lat = rng.uniform(40.0, 70.0)
+        lon = rng.uniform(20.0, 60.0)
+        drone_id = drone_ids[rng.integers(len(drone_ids))]
+        if rng.random() < 0.5:
+            url = f"{base_url}/weather/current?lat={lat:.4f}&lon={lon:.4f}&drone_id={drone_id}"
+        else:
+            url = f"{base_url}/weather/forecast?lat={lat:.4f}&lon={lon:.4f}&hours=24&drone_id={drone_id}"
+        started = time.perf_counter()
+        try:
+            _get_json(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        except OSError:
+            errors += 1
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервиса оценки безопасности")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15.0, help="секунд нагрузки")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--model-dir', default="models")
+    parser.add_argument('--drones', default="data/drone_specs.csv")
+    args = parser.parse_args()
+
+    import pandas as pd
+    drone_ids = pd.read_csv(args.drones)['drone_id'].tolist()
+
+    env = dict(os.environ,
+               GUARDIAN_MODEL_DIR=args.model_dir,
+               GUARDIAN_DRONE_SPECS=args.drones,
+               GUARDIAN_WEATHER="stub")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "scoring_service:app",
+         "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(base_url)
+        print(f"Нагрузка: {args.concurrency} клиентов, {args.duration:.0f} с")
+
+        deadline = time.time() + args.duration
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(
+                lambda seed: run_client(base_url, drone_ids, deadline, seed),
+                range(args.concurrency),
+            ))
+        server_metrics = _get_json(f"{base_url}/metrics")
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = np.concatenate([np.asarray(lat, dtype=np.float64) for lat, _ in results])
+    errors = sum(err for _, err in results)
+    if len(latencies) == 0:
+        print("Ни один запрос не выполнен успешно")
+        sys.exit(1)
+
+    p50 = float(np.percentile(latencies, 50))
+    p99 = float(np.percentile(latencies, 99))
+    print(f"\nЗапросов: {len(latencies)}, ошибок: {errors}, "
+          f"{len(latencies) / args.duration:,.0f} запросов/с")
+    print(f"Клиент:  p50 {p50:.1f} мс, p99 {p99:.1f} мс")
+    server_latency = server_metrics['latency_ms']
+    print(f"Сервер:  p50 {server_latency['p50']:.1f} мс, p99 {server_latency['p99']:.1f} мс")
+    batching = server_metrics['batching']
+    print(f"Микро-батчи: {batching['batches']}, в среднем {batching['avg_batch_requests']:.1f} "
+          f"запросов / {batching['avg_batch_rows']:.0f} строк на вызов модели")
+
+    # Цели проверяем по серверной задержке: клиентская включает накладные расходы тестового клиента
+    passed = (server_latency['p50'] <= LATENCY_TARGETS_MS['p50']
+              and server_latency['p99'] <= LATENCY_TARGETS_MS['p99'])
+    print(f"Цели p50 ≤ {LATENCY_TARGETS_MS['p50']:.0f} мс, p99 ≤ {LATENCY_TARGETS_MS['p99']:.0f} мс: "
+          f"{'выполнены' if passed else 'НЕ выполнены'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
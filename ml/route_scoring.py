@@ -0,0 +1,116 @@
+"""
+Оценка безопасности маршрутов полёта (FlightPlanRequest / FlightPlanResponse).
+
+Все точки всех маршрутов плана (основного и альтернативных) обрабатываются
+вместе: погода интерполируется для всех точек одним запросом к
+WeatherGridIndex, признаки строятся той же логикой, что и при обучении,
+и оцениваются одним вызовом модели. Результат — safety_index и класс
+каждой точки и сводка по маршруту (средний, минимальный индекс, длина).
+"""
+
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from batch_predictor import ModelArtifact, build_feature_array
+from train_safety_model import DRONE_SPEC_COLUMNS, calc_safety_class_vec
+from weather_index import WeatherGridIndex, utc_naive
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Расстояние по большому кругу между массивами точек, км."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def route_arrays(waypoints: Sequence[Mapping], default_time=None) -> Dict[str, np.ndarray]:
+    """Переводит список точек FlightRoutePoint в массивы lat, lon, altitude_m, eta.
+
+    Все моменты приводятся к наивному UTC (ось времени погоды); точки без
+    eta получают default_time, по умолчанию — текущий момент.
+    """
+    default_eta = utc_naive(default_time if default_time is not None else pd.Timestamp.now(tz='UTC'))
+    etas = [utc_naive(p['eta']) if p.get('eta') else default_eta for p in waypoints]
+    return {
+        'lat': np.array([p['lat'] for p in waypoints], dtype=np.float64),
+        'lon': np.array([p['lon'] for p in waypoints], dtype=np.float64),
+        'altitude_m': np.array([p.get('altitude_m', 0.0) for p in waypoints], dtype=np.float64),
+        'eta': np.array(etas, dtype='datetime64[ns]'),
+    }
+
+
+def score_routes(artifact: ModelArtifact, index: WeatherGridIndex,
+                 drone_spec: Mapping, routes: List[Dict[str, np.ndarray]]) -> List[Dict]:
+    """Оценивает несколько маршрутов одного дрона одним батчем.
+
+    routes — список словарей массивов (см. route_arrays). Возвращает для
+    каждого маршрута точки с safety_index / safety_class и сводку в формате
+    FlightPlan.route фронтенда, плюс min_safety_index.
+    """
+    lengths = [len(r['lat']) for r in routes]
+    lats = np.concatenate([r['lat'] for r in routes])
+    lons = np.concatenate([r['lon'] for r in routes])
+    etas = np.concatenate([r['eta'] for r in routes])
+
+    # Погода во всех точках всех маршрутов — одна векторная интерполяция
+    rows = pd.DataFrame(index.bilinear(lats, lons, etas))
+    for col in DRONE_SPEC_COLUMNS:
+        rows[col] = drone_spec[col]
+
+    safety_index = np.clip(artifact.booster.inplace_predict(build_feature_array(artifact, rows)), 0, 100)
+    safety_class = calc_safety_class_vec(safety_index)
+
+    results = []
+    offsets = np.cumsum([0] + lengths)
+    for k, route in enumerate(routes):
+        part = slice(offsets[k], offsets[k + 1])
+        route_index = safety_index[part].astype(np.float64)
+        distance = float(haversine_km(route['lat'][:-1], route['lon'][:-1],
+                                      route['lat'][1:], route['lon'][1:]).sum())
+        avg_index = float(route_index.mean()) if len(route_index) else 0.0
+
+        waypoints = [
+            {'lat': lat, 'lon': lon, 'altitude_m': alt,
+             'eta': pd.Timestamp(eta).tz_localize('UTC').isoformat(),
+             'safety_index': round(si, 1), 'safety_class': cls}
+            for lat, lon, alt, eta, si, cls in zip(
+                route['lat'].tolist(), route['lon'].tolist(), route['altitude_m'].tolist(),
+                route['eta'], route_index.tolist(), safety_class[part].tolist())
+        ]
+        results.append({
+            'waypoints': waypoints,
+            'distance_km': round(distance, 3),
+            'max_altitude_m': float(route['altitude_m'].max()) if len(route_index) else 0.0,
+            'avg_safety_index': round(avg_index, 1),
+            'avg_safety_class': calc_safety_class_vec(np.array([avg_index]))[0],
+            'min_safety_index': round(float(route_index.min()), 1) if len(route_index) else 0.0,
+        })
+    return results
+
+
+def score_flight_plan(artifact: ModelArtifact, index: WeatherGridIndex,
+                      drone_spec: Mapping, primary_route: Sequence[Mapping],
+                      alternative_routes: Optional[List[Sequence[Mapping]]] = None,
+                      start_time=None) -> Dict:
+    """Оценивает основной и альтернативные маршруты плана за один вызов модели.
+
+    Возвращает поля FlightPlanResponse: primary_route, alternative_routes
+    (точки с safety_index) и route_safety_index, а также сводки маршрутов.
+    """
+    routes = [route_arrays(primary_route, start_time)]
+    routes += [route_arrays(r, start_time) for r in (alternative_routes or [])]
+    scored = score_routes(artifact, index, drone_spec, routes)
+
+    return {
+        'primary_route': scored[0]['waypoints'],
+        'alternative_routes': [r['waypoints'] for r in scored[1:]],
+        'route_safety_index': scored[0]['avg_safety_index'],
+        'route': scored[0],
+        'alternatives': scored[1:],
+    }
@@ -0,0 +1,122 @@
+"""
+Поиск безопасных окон полёта по прогнозу safety_index.
+
+Серверный аналог deriveSafeWindows из frontend/lib/api/weatherApi.ts для
+масштаба парка: принимает массив safety_index формы (..., время),
+например (дрон × узел сетки × время), и находит непрерывные отрезки
+safety_index >= порога сразу для всех рядов векторным кодированием длин
+серий (run-length encoding), без цикла по рядам и моментам времени.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+# Нижняя граница safety_index для каждого уровня calc_safety_class
+SAFETY_CLASS_THRESHOLDS = {'green': 80.0, 'yellow': 60.0, 'red': 0.0}
+
+
+class SafeWindows(NamedTuple):
+    """Найденные окна; все поля — массивы одинаковой длины (по окну на элемент).
+
+    series — индекс ряда в исходных ведущих измерениях (кортеж массивов,
+    как у np.unravel_index); start / end — индексы первого и последнего
+    безопасного шага (включительно).
+    """
+    series: tuple
+    start: np.ndarray
+    end: np.ndarray
+    max_safety_index: np.ndarray
+
+
+def resolve_threshold(level: Union[str, float]) -> float:
+    """Переводит уровень класса ('green', 'yellow') или число в порог safety_index."""
+    if isinstance(level, str):
+        return SAFETY_CLASS_THRESHOLDS[level]
+    return float(level)
+
+
+def _step_minutes(times: np.ndarray) -> float:
+    """Шаг временной оси в минутах (медиана разностей), для одной точки — 60."""
+    times = np.asarray(times, dtype='datetime64[s]')
+    if len(times) < 2:
+        return 60.0
+    return float(np.median(np.diff(times).astype(np.int64))) / 60.0
+
+
+def find_safe_windows(safety_index: np.ndarray,
+                      level: Union[str, float] = 'green',
+                      times: Optional[np.ndarray] = None,
+                      min_duration_minutes: Optional[float] = None) -> SafeWindows:
+    """Находит все безопасные окна в массиве safety_index формы (..., время).
+
+    Окно — максимальная серия шагов с safety_index >= порога уровня level.
+    Длительность окна — от начала первого шага до конца последнего
+    (число шагов × шаг времени); при min_duration_minutes короткие окна,
+    в которые полёт не помещается, отбрасываются (нужен times).
+    """
+    values = np.asarray(safety_index, dtype=np.float64)
+    lead_shape = values.shape[:-1]
+    n_steps = values.shape[-1]
+    flat = values.reshape(-1, n_steps)
+
+    # Границы серий: +1 — начало, -1 — конец (исключительно)
+    safe = flat >= resolve_threshold(level)
+    padded = np.zeros((flat.shape[0], n_steps + 2), dtype=np.int8)
+    padded[:, 1:-1] = safe
+    edges = np.diff(padded, axis=1)
+    series_idx, starts = np.nonzero(edges == 1)
+    _, stops = np.nonzero(edges == -1)
+
+    if min_duration_minutes is not None:
+        if times is None:
+            raise ValueError("Для фильтра по длительности нужен массив times")
+        step_minutes = _step_minutes(times)
+        keep = (stops - starts) * step_minutes >= min_duration_minutes
+        series_idx, starts, stops = series_idx[keep], starts[keep], stops[keep]
+
+    # Максимум внутри каждой серии одним reduceat по плоскому массиву;
+    # хвостовой элемент нужен, чтобы граница последней серии была допустимым индексом
+    if len(starts):
+        flat_values = np.append(flat.ravel(), -np.inf)
+        bounds = np.empty(2 * len(starts), dtype=np.intp)
+        bounds[0::2] = series_idx * n_steps + starts
+        bounds[1::2] = series_idx * n_steps + stops
+        max_safety = np.maximum.reduceat(flat_values, bounds)[0::2]
+    else:
+        max_safety = np.empty(0, dtype=np.float64)
+
+    return SafeWindows(
+        series=np.unravel_index(series_idx, lead_shape) if lead_shape else (),
+        start=starts,
+        end=stops - 1,
+        max_safety_index=max_safety,
+    )
+
+
+def windows_to_records(windows: SafeWindows, times: np.ndarray,
+                       series: Optional[tuple] = None) -> List[Dict]:
+    """Переводит окна в записи SafeWindow фронтенда (start, end, max_safety_index).
+
+    series — индекс одного ряда в ведущих измерениях; если не задан,
+    возвращаются окна всех рядов с полем series.
+    """
+    times = pd.DatetimeIndex(times)
+    mask = np.ones(len(windows.start), dtype=bool)
+    if series is not None:
+        for axis, value in zip(windows.series, series):
+            mask &= axis == value
+
+    records = []
+    for k in np.nonzero(mask)[0]:
+        record = {
+            'start': times[windows.start[k]].isoformat(),
+            'end': times[windows.end[k]].isoformat(),
+            'max_safety_index': round(float(windows.max_safety_index[k]), 1),
+        }
+        if series is None and windows.series:
+            record['series'] = tuple(int(axis[k]) for axis in windows.series)
+        records.append(record)
+    return records
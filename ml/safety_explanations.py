@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Пакетные объяснения safety_index (SafetyFactorContribution фронтенда).
+
+Разложение индекса по факторам строится сразу для всех строк: матрица
+штрафов calc_penalties_vec (строка × штраф) сворачивается в факторы
+фронтенда — ветер (скорость и порывы), температура, осадки, видимость.
+delta фактора — его вклад в индекс со знаком минус, так что
+safety_index = clip(100 + сумма delta, 0, 100), как в calc_safety_index.
+
+Дополнительно по модели считаются SHAP значения XGBoost (pred_contribs)
+батчами фиксированного размера и сворачиваются по тем же факторам:
+признаки ветра, температуры, осадков и видимости, прочие признаки
+(облачность, масса, категория) — в 'other', плюс смещение модели.
+
+Разложение по правилам стоит в десятки раз меньше предсказания: нет
+цикла по строкам, описания SafetyFactorContribution строятся только для
+тех строк, которые отдаются фронтенду. SHAP в режиме 'approx'
+(approx_contribs) стоит порядка нескольких предсказаний; точный TreeSHAP
+('exact') на порядки дороже и нужен для разборов, а не для потока.
+
+Запуск (из каталога ml/):
+    python safety_explanations.py --weather data/weather_store --output data/safety_factors.csv
+    python safety_explanations.py --weather data/weather.csv --drone d1 --shap approx
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from batch_predictor import DEFAULT_BATCH_SIZE, ModelArtifact, build_feature_array, load_model_artifact
+from drone_registry import NUMERIC_SPEC_COLUMNS, DroneRegistry, load_drone_registry, weather_arrays
+from train_safety_model import (
+    PENALTY_COLUMNS,
+    calc_penalties_vec,
+    calc_safety_class_vec,
+    safety_index_from_penalties,
+)
+
+
+# Факторы SafetyFactorContribution и штрафы calc_penalties_vec, из которых они складываются
+FACTOR_PENALTIES = {
+    'wind': ['wind', 'gust'],
+    'temperature': ['temp'],
+    'precipitation': ['precip'],
+    'visibility': ['visibility'],
+}
+FACTORS = list(FACTOR_PENALTIES)
+
+# Признаки модели по факторам для свёртки SHAP; остальные — в 'other'
+FACTOR_FEATURES = {
+    'wind': ['wind_speed', 'wind_gust', 'max_wind_mps', 'wind_ratio', 'gust_ratio'],
+    'temperature': ['temp_c', 'temp_min_c', 'temp_max_c', 'temp_below', 'temp_above'],
+    'precipitation': ['precip', 'allow_precip_mmph', 'precip_excess'],
+    'visibility': ['visibility_km', 'min_visibility_km'],
+}
+SHAP_COLUMNS = FACTORS + ['other', 'bias']
+
+# Режимы SHAP: приближённые вклады по путям деревьев или точный TreeSHAP
+SHAP_MODES = ('approx', 'exact')
+
+FACTOR_NAMES = {
+    'wind': "ветер",
+    'temperature': "температура",
+    'precipitation': "осадки",
+    'visibility': "видимость",
+}
+
+
+class SafetyExplanation(NamedTuple):
+    """Объяснения для строк; все массивы — по строке на пару погода × дрон.
+
+    deltas — вклад факторов FACTORS в safety_index по правилам разметки
+    (≤ 0), safety_index — индекс по правилам. shap — SHAP модели по
+    SHAP_COLUMNS (None, если не запрашивался); сумма строки равна
+    предсказанию модели до ограничения шкалой.
+    """
+    deltas: np.ndarray
+    safety_index: np.ndarray
+    shap: Optional[np.ndarray] = None
+
+
+def factor_deltas(penalties: np.ndarray) -> np.ndarray:
+    """Сворачивает матрицу штрафов (строка × PENALTY_COLUMNS) в delta факторов (строка × FACTORS)."""
+    deltas = np.empty((len(penalties), len(FACTORS)), dtype=np.float64)
+    for j, factor in enumerate(FACTORS):
+        columns = [PENALTY_COLUMNS.index(p) for p in FACTOR_PENALTIES[factor]]
+        # 0.0 - x, а не -x: нулевой штраф даёт 0.0, а не -0.0
+        deltas[:, j] = 0.0 - penalties[:, columns].sum(axis=1)
+    return deltas
+
+
+def shap_aggregation(feature_cols: Sequence[str]) -> np.ndarray:
+    """Матрица (признак + смещение) × SHAP_COLUMNS для свёртки pred_contribs по факторам."""
+    aggregation = np.zeros((len(feature_cols) + 1, len(SHAP_COLUMNS)), dtype=np.float32)
+    feature_factor = {f: factor for factor, features in FACTOR_FEATURES.items() for f in features}
+    for i, col in enumerate(feature_cols):
+        aggregation[i, SHAP_COLUMNS.index(feature_factor.get(col, 'other'))] = 1.0
+    # Последний столбец pred_contribs — смещение модели
+    aggregation[-1, SHAP_COLUMNS.index('bias')] = 1.0
+    return aggregation
+
+
+def shap_contributions(artifact: ModelArtifact, X: np.ndarray, mode: str = 'approx',
+                       batch_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+    """SHAP значения модели, свёрнутые по SHAP_COLUMNS, батчами по batch_size строк.
+
+    mode — 'approx' (approx_contribs) или 'exact' (TreeSHAP).
+    """
+    import xgboost as xgb
+
+    if mode not in SHAP_MODES:
+        raise ValueError(f"Неизвестный режим SHAP: {mode}")
+    aggregation = shap_aggregation(artifact.feature_cols)
+    result = np.empty((len(X), len(SHAP_COLUMNS)), dtype=np.float32)
+    for start in range(0, len(X), batch_size):
+        batch = xgb.DMatrix(X[start:start + batch_size], feature_names=artifact.feature_cols)
+        contribs = artifact.booster.predict(batch, pred_contribs=True,
+                                           approx_contribs=(mode == 'approx'))
+        result[start:start + len(contribs)] = contribs @ aggregation
+    return result
+
+
+def explain_rows(df: Union[pd.DataFrame, Mapping[str, np.ndarray]],
+                 artifact: Optional[ModelArtifact] = None, shap: Optional[str] = None,
+                 X: Optional[np.ndarray] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> SafetyExplanation:
+    """Объяснения для строк погода + паспорт дрона (как в predict_safety_index).
+
+    shap — режим SHAP_MODES (нужна модель artifact) или None; X — уже
+    собранная матрица признаков (иначе она строится build_feature_matrix).
+    """
+    penalties = calc_penalties_vec(df)
+    contributions = None
+    if shap is not None:
+        if X is None:
+            X = build_feature_array(artifact, df)
+        contributions = shap_contributions(artifact, X, shap, batch_size)
+    return SafetyExplanation(factor_deltas(penalties), safety_index_from_penalties(penalties),
+                             contributions)
+
+
+def pair_columns(registry: DroneRegistry, weather: Mapping[str, np.ndarray],
+                 drone_idx: Union[int, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Столбцы пар погода × паспорт для calc_penalties_vec без сборки DataFrame."""
+    n_rows = len(next(iter(weather.values())))
+    drone_idx = np.broadcast_to(np.asarray(drone_idx, dtype=np.intp), (n_rows,))
+    columns = dict(weather)
+    for col in NUMERIC_SPEC_COLUMNS:
+        columns[col] = registry.column(col)[drone_idx]
+    return columns
+
+
+def describe_factors(deltas: np.ndarray, data: Union[pd.DataFrame, Mapping[str, np.ndarray]],
+                     rows: Optional[Sequence[int]] = None) -> List[List[Dict]]:
+    """Списки SafetyFactorContribution (factor, delta, description) для строк rows."""
+    rows = np.arange(len(deltas)) if rows is None else np.asarray(rows)
+    values = lambda name: np.asarray(data[name], dtype=np.float64)[rows].tolist()
+    wind, gust, max_wind = values('wind_speed'), values('wind_gust'), values('max_wind_mps')
+    temp, temp_min, temp_max = values('temp_c'), values('temp_min_c'), values('temp_max_c')
+    precip, allow_precip = values('precip'), values('allow_precip_mmph')
+    visibility = values('visibility_km') if 'visibility_km' in data else [10.0] * len(rows)
+    min_visibility = values('min_visibility_km')
+
+    records = []
+    # + 0.0 убирает -0.0 после округления малых вкладов
+    for k, row_deltas in enumerate((np.round(deltas[rows], 1) + 0.0).tolist()):
+        descriptions = [
+            f"Ветер {wind[k]:.1f} м/с, порывы {gust[k]:.1f} м/с при допустимых {max_wind[k]:.0f} м/с",
+            f"Температура {temp[k]:.1f}°C при допустимых {temp_min[k]:.0f}…{temp_max[k]:.0f}°C",
+            f"Осадки {precip[k]:.1f} мм/ч при допустимых {allow_precip[k]:.1f} мм/ч",
+            f"Видимость {visibility[k]:.1f} км при минимальной {min_visibility[k]:.1f} км",
+        ]
+        records.append([{'factor': factor, 'delta': delta, 'description': description}
+                        for factor, delta, description in zip(FACTORS, row_deltas, descriptions)])
+    return records
+
+
+def safety_message(deltas: np.ndarray) -> List[str]:
+    """Короткое сообщение SafetyResult.message: главный фактор снижения индекса."""
+    worst = np.argmin(deltas, axis=1)
+    messages = []
+    for factor_idx, delta in zip(worst.tolist(), deltas[np.arange(len(deltas)), worst].tolist()):
+        if delta > -0.05:
+            messages.append("Погодные ограничения не снижают безопасность")
+        else:
+            messages.append(f"Основное снижение безопасности: {FACTOR_NAMES[FACTORS[factor_idx]]} "
+                            f"({delta:.1f})")
+    return messages
+
+
+def explain_weather_for_drones(artifact: ModelArtifact, weather_df: pd.DataFrame,
+                               registry: DroneRegistry, drone_ids: Optional[List[str]] = None,
+                               shap: Optional[str] = None,
+                               batch_size: int = DEFAULT_BATCH_SIZE) -> pd.DataFrame:
+    """Предсказание и разложение по факторам для каждой погодной строки и дрона.
+
+    Столбцы: drone_id, timestamp, lat, lon, safety_index_pred,
+    safety_class_pred, delta_<фактор> и при shap — shap_<столбец>.
+    """
+    selected = range(len(registry))
+    if drone_ids is not None:
+        wanted = set(drone_ids)
+        selected = [i for i, drone_id in enumerate(registry.drone_ids) if drone_id in wanted]
+
+    weather = weather_arrays(weather_df, artifact.feature_cols)
+    results = []
+    started = time.perf_counter()
+    for i in selected:
+        X = registry.feature_matrix(artifact.feature_cols, weather, i)
+        prediction = np.clip(artifact.booster.inplace_predict(X), 0, 100)
+        explanation = explain_rows(pair_columns(registry, weather, i), artifact, shap, X, batch_size)
+        frame = {
+            'drone_id': registry.drone_ids[i],
+            'timestamp': weather_df['timestamp'].to_numpy(),
+            'lat': weather_df['lat'].to_numpy(),
+            'lon': weather_df['lon'].to_numpy(),
+            'safety_index_pred': prediction,
+            'safety_class_pred': calc_safety_class_vec(prediction),
+        }
+        for j, factor in enumerate(FACTORS):
+            frame[f"delta_{factor}"] = explanation.deltas[:, j]
+        if explanation.shap is not None:
+            for j, column in enumerate(SHAP_COLUMNS):
+                frame[f"shap_{column}"] = explanation.shap[:, j]
+        results.append(pd.DataFrame(frame))
+
+    explained_df = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+    elapsed = time.perf_counter() - started
+    rows_per_sec = len(explained_df) / elapsed if elapsed > 0 else float('inf')
+    print(f"Объяснено {len(explained_df)} строк погода × дрон за {elapsed:.2f} с "
+          f"({rows_per_sec:,.0f} строк/с{f', SHAP {shap}' if shap else ''})")
+    return explained_df
+
+
+def main(argv: Optional[List[str]] = None):
+    """Разложение safety_index по факторам для погодной таблицы и дронов."""
+    parser = argparse.ArgumentParser(description="Объяснения safety_index по факторам")
+    parser.add_argument('--model-dir', default="models")
+    parser.add_argument('--weather', default="data/weather.csv",
+                        help="CSV или каталог Parquet-хранилища погоды")
+    parser.add_argument('--drones', default="data/drone_specs.csv",
+                        help="CSV паспортов или каталог реестра drone_registry.py")
+    parser.add_argument('--drone', nargs='+', default=None, help="только эти drone_id")
+    parser.add_argument('--shap', choices=SHAP_MODES, default=None,
+                        help="добавить SHAP значения модели (exact — точный и медленный)")
+    parser.add_argument('--output', default="data/safety_factors.csv")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    artifact = load_model_artifact(args.model_dir)
+    if os.path.isdir(args.weather):
+        from weather_store import read_weather_store
+        weather_df = read_weather_store(args.weather)
+    else:
+        weather_df = pd.read_csv(args.weather, parse_dates=['timestamp'])
+    registry = load_drone_registry(args.drones)
+
+    explained_df = explain_weather_for_drones(artifact, weather_df, registry, args.drone,
+                                              args.shap, args.batch_size)
+    explained_df.to_csv(args.output, index=False)
+    print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Предрассчитанные тайлы safety_index для раскраски карты.
+
+Вместо запуска модели на каждый узел сетки при каждом просмотре карты
+пакетное задание заранее оценивает всю область погодных данных для
+каждой категории дронов и каждого часа прогноза. Значение категории —
+минимальный safety_index по её дронам (паспортам из реестра), то есть
+зелёный узел безопасен для любого дрона категории.
+
+Тайлы хранятся компактно: по файлу <категория>.u8 на категорию, uint8
+массив [час][широта][долгота] со значениями 0..100 и TILE_NODATA там, где
+нет погоды. Файл читается через memory-map, так что запрос карты — это
+срез байтов: час t, строка широты i начинаются со смещения
+(t * n_lat + i) * n_lon. Сетка, часы и отпечаток модели лежат в
+tiles.json.
+
+Часы только дописываются в конец файлов: при повторном запуске
+оцениваются лишь часы прогноза позже последнего готового. Если сменились
+модель, паспорта дронов или сетка, тайлы пересчитываются целиком.
+
+Запуск (из каталога ml/):
+    python safety_tiles.py --weather data/weather_store --output data/safety_tiles
+    python safety_tiles.py --weather data/weather_store --output data/safety_tiles --full
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from batch_predictor import DEFAULT_BATCH_SIZE, ModelArtifact, load_model_artifact
+from drone_registry import PAIR_WEATHER_COLUMNS, DroneRegistry, load_drone_registry
+from weather_index import WeatherGridIndex, utc_naive
+
+if TYPE_CHECKING:
+    from weather_store import BBox
+
+
+TILES_MANIFEST = "tiles.json"
+
+# Значение узла без погодных данных
+TILE_NODATA = 255
+
+
+def tiles_fingerprint(artifact: ModelArtifact, registry: DroneRegistry) -> str:
+    """Отпечаток модели и паспортов: при его смене тайлы пересчитываются."""
+    digest = hashlib.sha1(bytes(artifact.booster.save_raw()))
+    digest.update(json.dumps(artifact.feature_cols).encode('utf-8'))
+    digest.update(np.ascontiguousarray(registry.specs).tobytes())
+    digest.update(json.dumps([list(registry.drone_ids), list(registry.categories)]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_tiles_manifest(tiles_dir: str) -> Optional[Dict]:
+    """Манифест тайлов или None, если тайлы ещё не строились."""
+    path = os.path.join(tiles_dir, TILES_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_tiles_manifest(tiles_dir: str, manifest: Dict):
+    path = os.path.join(tiles_dir, TILES_MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _tile_path(tiles_dir: str, category: str) -> str:
+    return os.path.join(tiles_dir, f"{category}.u8")
+
+
+def _weather_after(weather: Union[str, pd.DataFrame], after: Optional[pd.Timestamp]) -> pd.DataFrame:
+    """Погодная таблица из CSV, хранилища или DataFrame; только время позже after."""
+    if isinstance(weather, pd.DataFrame):
+        weather_df = weather
+    elif os.path.isdir(weather):
+        from weather_store import read_weather_store
+        weather_df = read_weather_store(weather, start=None if after is None else str(after))
+    else:
+        weather_df = pd.read_csv(weather, parse_dates=['timestamp'])
+    if after is not None:
+        weather_df = weather_df[pd.to_datetime(weather_df['timestamp']) > after]
+    return weather_df
+
+
+def category_safety_grid(artifact: ModelArtifact, registry: DroneRegistry,
+                         weather: Dict[str, np.ndarray], drone_idx: np.ndarray) -> np.ndarray:
+    """Минимальный по дронам drone_idx safety_index для каждой погодной строки."""
+    worst = None
+    for i in drone_idx:
+        X = registry.feature_matrix(artifact.feature_cols, weather, i)
+        prediction = artifact.booster.inplace_predict(X)
+        worst = prediction if worst is None else np.minimum(worst, prediction)
+    return worst
+
+
+def update_safety_tiles(tiles_dir: str, artifact: ModelArtifact, registry: DroneRegistry,
+                        weather: Union[str, pd.DataFrame], full: bool = False,
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+    """Дописывает тайлы для новых часов прогноза (или пересчитывает всё при full).
+
+    weather — CSV, каталог колоночного хранилища или погодная таблица.
+    Возвращает отчёт: сколько часов добавлено и было ли пересчитано всё.
+    """
+    fingerprint = tiles_fingerprint(artifact, registry)
+    manifest = None if full else load_tiles_manifest(tiles_dir)
+    if manifest is not None and manifest['fingerprint'] != fingerprint:
+        print("Модель или паспорта дронов изменились, тайлы пересчитываются целиком")
+        manifest = None
+
+    after = pd.Timestamp(manifest['times'][-1]) if manifest and manifest['times'] else None
+    weather_df = _weather_after(weather, after)
+    if weather_df.empty:
+        if manifest is None:
+            raise ValueError("Нет погодных данных для построения тайлов")
+        print(f"Новых часов прогноза нет, последний готовый час: {after}")
+        return {'hours_added': 0, 'rebuilt': False, 'hours': len(manifest['times'])}
+
+    index = WeatherGridIndex.from_weather_df(weather_df)
+    if manifest is not None and not (np.array_equal(index.lats, manifest['lats'])
+                                     and np.array_equal(index.lons, manifest['lons'])):
+        print("Сетка новых часов не совпадает с тайлами, тайлы пересчитываются целиком")
+        return update_safety_tiles(tiles_dir, artifact, registry, weather, full=True,
+                                   batch_size=batch_size)
+
+    rebuilt = manifest is None
+    categories = sorted(pd.unique(registry.categories))
+    if rebuilt:
+        if os.path.exists(tiles_dir):
+            shutil.rmtree(tiles_dir)
+        os.makedirs(tiles_dir)
+        manifest = {
+            'fingerprint': fingerprint,
+            'layout': "uint8 [час][широта][долгота], safety_index 0..100",
+            'nodata': TILE_NODATA,
+            'categories': categories,
+            'lats': index.lats.tolist(),
+            'lons': index.lons.tolist(),
+            'times': [],
+        }
+
+    n_times, n_lat, n_lon = index.shape
+    plane = n_lat * n_lon
+    done_bytes = len(manifest['times']) * plane
+    members = {c: np.flatnonzero(registry.categories == c) for c in categories}
+    # Узел без любой из нужных модели переменных помечается TILE_NODATA
+    needed = [v for v in index.variables if v in set(artifact.feature_cols) | set(PAIR_WEATHER_COLUMNS)]
+    hours_per_batch = max(1, batch_size // plane)
+
+    started = time.perf_counter()
+    files = {}
+    try:
+        for category in categories:
+            f = open(_tile_path(tiles_dir, category), 'r+b' if not rebuilt else 'wb')
+            # Хвост прерванного запуска, не попавший в манифест, отбрасывается
+            f.truncate(done_bytes)
+            f.seek(done_bytes)
+            files[category] = f
+
+        for t0 in range(0, n_times, hours_per_batch):
+            t1 = min(t0 + hours_per_batch, n_times)
+            batch = {name: index.cube[index.variables.index(name), t0:t1].ravel() for name in needed}
+            nodata = np.zeros(len(next(iter(batch.values()))), dtype=bool)
+            for name in needed:
+                nodata |= np.isnan(batch[name])
+            for category in categories:
+                safety_index = category_safety_grid(artifact, registry, batch, members[category])
+                tile = np.clip(np.rint(safety_index), 0, 100).astype(np.uint8)
+                tile[nodata] = TILE_NODATA
+                files[category].write(tile.tobytes())
+    finally:
+        for f in files.values():
+            f.close()
+
+    # Манифест обновляется после записи данных: часы в нём всегда готовы
+    manifest['times'] += [str(pd.Timestamp(t)) for t in index.times]
+    _save_tiles_manifest(tiles_dir, manifest)
+
+    elapsed = time.perf_counter() - started
+    n_predictions = n_times * plane * len(registry)
+    print(f"{'Построено' if rebuilt else 'Добавлено'} {n_times} ч × {len(categories)} категорий "
+          f"сетки {n_lat}×{n_lon} за {elapsed:.1f} с "
+          f"({n_predictions / elapsed if elapsed > 0 else float('inf'):,.0f} оценок/с); "
+          f"всего часов: {len(manifest['times'])}")
+    return {'hours_added': n_times, 'rebuilt': rebuilt, 'hours': len(manifest['times']),
+            'seconds': elapsed}
+
+
+class SafetyTiles:
+    """Чтение тайлов через memory-map: срезы без копирования и без модели."""
+
+    def __init__(self, tiles_dir: str):
+        manifest = load_tiles_manifest(tiles_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"Тайлы не найдены: {tiles_dir}")
+        self.tiles_dir = tiles_dir
+        self.categories: List[str] = manifest['categories']
+        self.lats = np.asarray(manifest['lats'], dtype=np.float64)
+        self.lons = np.asarray(manifest['lons'], dtype=np.float64)
+        self.times = pd.DatetimeIndex(manifest['times']).to_numpy(dtype='datetime64[ns]')
+        self._grids: Dict[str, np.ndarray] = {}
+
+    def grid(self, category: str) -> np.ndarray:
+        """uint8 массив категории [час][широта][долгота] (memory-map)."""
+        grid = self._grids.get(category)
+        if grid is None:
+            if category not in self.categories:
+                raise KeyError(f"Нет тайлов для категории {category}")
+            shape = (len(self.times), len(self.lats), len(self.lons))
+            grid = np.memmap(_tile_path(self.tiles_dir, category), dtype=np.uint8, mode='r', shape=shape)
+            self._grids[category] = grid
+        return grid
+
+    def hour_index(self, timestamp) -> int:
+        """Номер ближайшего готового часа прогноза; время с поясом переводится в UTC."""
+        t = np.datetime64(utc_naive(timestamp), 'ns')
+        right = int(np.searchsorted(self.times, t))
+        if right == len(self.times) or (right > 0 and t - self.times[right - 1] <= self.times[right] - t):
+            return max(right - 1, 0)
+        return right
+
+    def window(self, category: str, timestamp,
+               bbox: Optional[BBox] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Тайл области bbox на ближайший час: (значения [широта][долгота], широты, долготы).
+
+        Значения — представление memory-map без копирования.
+        """
+        plane = self.grid(category)[self.hour_index(timestamp)]
+        if bbox is None:
+            return plane, self.lats, self.lons
+        lat_min, lat_max, lon_min, lon_max = bbox
+        i0, i1 = np.searchsorted(self.lats, lat_min, 'left'), np.searchsorted(self.lats, lat_max, 'right')
+        j0, j1 = np.searchsorted(self.lons, lon_min, 'left'), np.searchsorted(self.lons, lon_max, 'right')
+        return plane[i0:i1, j0:j1], self.lats[i0:i1], self.lons[j0:j1]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Строит или дописывает тайлы safety_index по сохранённой модели."""
+    parser = argparse.ArgumentParser(description="Тайлы safety_index для карты")
+    parser.add_argument('--model-dir', default="models")
+    parser.add_argument('--weather', default="data/weather_store",
+                        help="CSV или каталог Parquet-хранилища погоды")
+    parser.add_argument('--drones', default="data/drone_specs.csv",
+                        help="CSV паспортов или каталог реестра drone_registry.py")
+    parser.add_argument('--output', default="data/safety_tiles")
+    parser.add_argument('--full', action='store_true', help="пересчитать все часы")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    artifact = load_model_artifact(args.model_dir)
+    registry = load_drone_registry(args.drones)
+    update_safety_tiles(args.output, artifact, registry, args.weather, args.full, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+HTTP сервис оценки безопасности полёта (FastAPI).
+
+Отдаёт текущую и прогнозную безопасность для точки (lat, lon) и дрона
+в формате типов WeatherData / ForecastPoint фронтенда. Модель загружается
+один раз при старте; признаки одновременных запросов собираются в
+микро-батчи, так что один вызов XGBoost обслуживает многих пользователей.
+
+Запуск (из каталога ml/):
+    uvicorn scoring_service:app --host 0.0.0.0 --port 8000
+
+Настройки через переменные окружения:
+    GUARDIAN_MODEL_DIR     каталог модели (models)
+    GUARDIAN_DRONE_SPECS   паспорта дронов: CSV или каталог реестра drone_registry.py,
+                           общий для воркеров через memory-map (data/drone_specs.csv)
+    GUARDIAN_WEATHER       CSV, каталог Parquet-хранилища или "stub"
+                           для локальной синтетической погоды (data/weather_store)
+    GUARDIAN_TILES         каталог тайлов safety_tiles.py для /safety/tile (data/safety_tiles)
+    GUARDIAN_ANALYTICS     роллапы flight_analytics.py для /analytics (data/analytics_rollups.json)
+    GUARDIAN_MAX_BATCH     максимум строк в микро-батче (4096)
+    GUARDIAN_MAX_WAIT_MS   сколько ждать добора батча, мс (2)
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
+
+from batch_predictor import ModelArtifact, load_model_artifact
+from drone_registry import load_drone_registry, weather_arrays
+from flight_analytics import BUCKETS, FLIGHT_OUTCOMES, FlightAnalytics, flight_bucket
+from safe_windows import find_safe_windows, windows_to_records
+from safety_explanations import SHAP_COLUMNS, describe_factors, explain_rows, pair_columns, safety_message
+from safety_tiles import TILES_MANIFEST, SafetyTiles
+from train_safety_model import calc_safety_class_vec
+from weather_index import StubWeatherProvider, WeatherGridIndex
+
+
+# Целевые задержки обработки запроса, мс
+LATENCY_TARGETS_MS = {'p50': 20.0, 'p99': 100.0}
+
+# Значения по умолчанию для полей, которых нет в погодных данных
+DEFAULT_VISIBILITY_KM = 10.0
+DEFAULT_PRESSURE_HPA = 1013.25
+
+
+def load_weather_provider(source: str):
+    """Создаёт источник погоды по пути к данным или 'stub'.
+
+    Табличные данные загружаются в WeatherGridIndex, ряд для точки
+    выбирается по смещениям в массиве, без фильтрации таблицы.
+    """
+    if source == "stub":
+        return StubWeatherProvider()
+    if os.path.isdir(source):
+        return WeatherGridIndex.from_store(source)
+    return WeatherGridIndex.from_weather_df(pd.read_csv(source, parse_dates=['timestamp']))
+
+
+class LatencyTracker:
+    """Скользящее окно задержек запросов для расчёта перцентилей."""
+
+    def __init__(self, window: int = 10000):
+        self.samples = deque(maxlen=window)
+
+    def record(self, latency_ms: float):
+        self.samples.append(latency_ms)
+
+    def percentiles(self) -> Dict[str, float]:
+        if not self.samples:
+            return {'p50': 0.0, 'p99': 0.0, 'count': 0}
+        values = np.fromiter(self.samples, dtype=np.float64)
+        return {
+            'p50': float(np.percentile(values, 50)),
+            'p99': float(np.percentile(values, 99)),
+            'count': len(values),
+        }
+
+
+class MicroBatcher:
+    """Собирает матрицы признаков одновременных запросов в один вызов модели.
+
+    Запрос ставится в очередь; фоновая задача забирает всё, что накопилось,
+    ждёт добора не дольше max_wait_ms или до max_batch_rows строк, выполняет
+    одно предсказание в отдельном потоке и раздаёт результаты по запросам.
+    """
+
+    def __init__(self, artifact: ModelArtifact, max_batch_rows: int = 4096,
+                 max_wait_ms: float = 2.0):
+        self.artifact = artifact
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        # Один поток: вызовы XGBoost и так используют все ядра
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.batched_rows = 0
+        self.batched_requests = 0
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def predict(self, X: np.ndarray) -> np.ndarray:
+        """Ставит матрицу признаков в очередь и ждёт её предсказания."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, future))
+        return await future
+
+    def _predict_batch(self, X: np.ndarray) -> np.ndarray:
+        return np.clip(self.artifact.booster.inplace_predict(X), 0, 100)
+
+    async def _collect(self) -> List:
+        """Ждёт первый запрос и добирает батч до лимита строк или таймаута."""
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        rows = len(items[0][0])
+        deadline = loop.time() + self.max_wait
+        while rows < self.max_batch_rows:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            items.append(item)
+            rows += len(item[0])
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            batch = np.concatenate([X for X, _ in items])
+            try:
+                predictions = await loop.run_in_executor(self.executor, self._predict_batch, batch)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_rows += len(batch)
+            self.batched_requests += len(items)
+
+            offset = 0
+            for X, future in items:
+                if not future.done():
+                    future.set_result(predictions[offset:offset + len(X)])
+                offset += len(X)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'batches': self.batches,
+            'avg_batch_rows': self.batched_rows / self.batches if self.batches else 0.0,
+            'avg_batch_requests': self.batched_requests / self.batches if self.batches else 0.0,
+        }
+
+
+class ScoringState:
+    """Загруженные при старте модель, паспорта дронов и источник погоды."""
+
+    def __init__(self):
+        self.artifact = load_model_artifact(os.environ.get('GUARDIAN_MODEL_DIR', "models"))
+        self.drones = load_drone_registry(os.environ.get('GUARDIAN_DRONE_SPECS', "data/drone_specs.csv"))
+        self.default_drone_id = self.drones.drone_ids[0]
+        self.weather = load_weather_provider(os.environ.get('GUARDIAN_WEATHER', "data/weather_store"))
+        self.batcher = MicroBatcher(
+            self.artifact,
+            max_batch_rows=int(os.environ.get('GUARDIAN_MAX_BATCH', 4096)),
+            max_wait_ms=float(os.environ.get('GUARDIAN_MAX_WAIT_MS', 2.0)),
+        )
+        self.latency = LatencyTracker()
+        # SHAP (особенно exact) на порядки дороже предсказания: свой поток, чтобы не
+        # задерживать микро-батчи /weather/* в потоке MicroBatcher
+        self.explain_executor = ThreadPoolExecutor(max_workers=1)
+        self.tiles_dir = os.environ.get('GUARDIAN_TILES', "data/safety_tiles")
+        self._tiles: Optional[SafetyTiles] = None
+        self._tiles_mtime = None
+        self.analytics_path = os.environ.get('GUARDIAN_ANALYTICS', "data/analytics_rollups.json")
+        # Каждый исход сразу пишется в журнал роллапов и не теряется при падении процесса
+        self.analytics = FlightAnalytics.open(self.analytics_path)
+
+    def tiles(self) -> SafetyTiles:
+        """Тайлы safety_index; открываются заново, когда задание дописало часы."""
+        try:
+            mtime = os.path.getmtime(os.path.join(self.tiles_dir, TILES_MANIFEST))
+        except OSError:
+            raise HTTPException(status_code=404, detail="Тайлы safety_index не построены")
+        if mtime != self._tiles_mtime:
+            self._tiles = SafetyTiles(self.tiles_dir)
+            self._tiles_mtime = mtime
+        return self._tiles
+
+    async def score(self, lat: float, lon: float, hours: int,
+                    drone_id: Optional[str]) -> Dict:
+        """Строит ответ WeatherData для точки и дрона на hours часов вперёд."""
+        drone_id = drone_id or self.default_drone_id
+        if drone_id not in self.drones:
+            raise HTTPException(status_code=404, detail=f"Неизвестный drone_id: {drone_id}")
+
+        weather = self.weather.series(lat, lon, pd.Timestamp.now(tz='UTC'), hours)
+        X = self.drones.feature_matrix(self.artifact.feature_cols, weather, self.drones.index(drone_id))
+        safety_index = await self.batcher.predict(X)
+        safety_class = calc_safety_class_vec(safety_index)
+
+        times = pd.to_datetime(weather['timestamp']).dt.tz_localize('UTC')
+        n_points = len(weather)
+        visibility = (weather['visibility_km'].to_numpy() if 'visibility_km' in weather.columns
+                      else np.full(n_points, DEFAULT_VISIBILITY_KM))
+        pressure = (weather['pressure_hpa'].to_numpy() if 'pressure_hpa' in weather.columns
+                    else np.full(n_points, DEFAULT_PRESSURE_HPA))
+
+        # Столбцы переводим в списки Python целиком, а не поэлементно
+        columns = {
+            'time': [t.isoformat() for t in times],
+            'temp_c': weather['temp_c'].to_numpy(dtype=np.float64).tolist(),
+            'wind_speed_mps': weather['wind_speed'].to_numpy(dtype=np.float64).tolist(),
+            'wind_gust_mps': weather['wind_gust'].to_numpy(dtype=np.float64).tolist(),
+            'precip_mmph': weather['precip'].to_numpy(dtype=np.float64).tolist(),
+            'visibility_km': visibility.astype(np.float64).tolist(),
+            'pressure_hpa': pressure.astype(np.float64).tolist(),
+            'cloud_cover_pct': weather['cloud_cover'].to_numpy(dtype=np.float64).tolist(),
+            'safety_index': np.round(safety_index.astype(np.float64), 1).tolist(),
+            'safety_class': safety_class.tolist(),
+        }
+        forecast = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        return {
+            'location': {'lat': lat, 'lon': lon},
+            'drone_id': drone_id,
+            'current': forecast[0],
+            'forecast': forecast,
+            'safe_windows': windows_to_records(find_safe_windows(safety_index, 'green'), times),
+        }
+
+    async def explain(self, lat: float, lon: float, hours: int, drone_id: Optional[str],
+                      shap: Optional[str]) -> Dict:
+        """Строит SafetyResult (индекс, класс, сообщение, факторы) на каждый час прогноза."""
+        drone_id = drone_id or self.default_drone_id
+        if drone_id not in self.drones:
+            raise HTTPException(status_code=404, detail=f"Неизвестный drone_id: {drone_id}")
+
+        weather = self.weather.series(lat, lon, pd.Timestamp.now(tz='UTC'), hours)
+        drone_idx = self.drones.index(drone_id)
+        X = self.drones.feature_matrix(self.artifact.feature_cols, weather, drone_idx)
+        safety_index = await self.batcher.predict(X)
+
+        columns = pair_columns(self.drones, weather_arrays(weather, self.artifact.feature_cols), drone_idx)
+        # SHAP считается вне цикла событий и вне потока микро-батчей
+        explanation = await asyncio.get_running_loop().run_in_executor(
+            self.explain_executor, explain_rows, columns, self.artifact, shap, X)
+
+        times = pd.to_datetime(weather['timestamp']).dt.tz_localize('UTC')
+        results = []
+        for k, (factors, message) in enumerate(zip(describe_factors(explanation.deltas, columns),
+                                                   safety_message(explanation.deltas))):
+            result = {
+                'time': times.iloc[k].isoformat(),
+                'safety_index': round(float(safety_index[k]), 1),
+                'safety_class': calc_safety_class_vec(safety_index[k:k + 1])[0],
+                'message': message,
+                'factors': factors,
+            }
+            if explanation.shap is not None:
+                result['shap'] = dict(zip(SHAP_COLUMNS, np.round(explanation.shap[k].astype(np.float64), 2).tolist()))
+            results.append(result)
+        return {'location': {'lat': lat, 'lon': lon}, 'drone_id': drone_id, 'results': results}
+
+    def record_outcome(self, flight: Dict) -> Dict:
+        """Учитывает исход полёта (Flight) в роллапах аналитики за O(1)."""
+        if flight.get('status') not in FLIGHT_OUTCOMES:
+            raise HTTPException(status_code=422,
+                                detail=f"status должен быть одним из: {', '.join(FLIGHT_OUTCOMES)}")
+        drone_id = flight.get('drone_id')
+        if drone_id not in self.drones:
+            raise HTTPException(status_code=404, detail=f"Неизвестный drone_id: {drone_id}")
+        try:
+            bucket = flight_bucket(flight, self.drones, self.weather)
+            recorded = self.analytics.record(flight, bucket)
+        except KeyError as e:
+            raise HTTPException(status_code=422, detail=f"Нет поля полёта: {e.args[0]}")
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=f"Некорректное поле полёта: {e}")
+        return {'recorded': recorded, 'bucket': BUCKETS[bucket]}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.scoring = ScoringState()
+    await app.state.scoring.batcher.start()
+    yield
+    await app.state.scoring.batcher.stop()
+    app.state.scoring.explain_executor.shutdown(wait=False)
+    # Снимок роллапов вместо журнала исходов, принятых через POST /analytics/flights
+    if len(app.state.scoring.analytics):
+        app.state.scoring.analytics.save(app.state.scoring.analytics_path)
+    app.state.scoring.analytics.close()
+
+
+app = FastAPI(title="Guardian AI safety scoring", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    if request.url.path.startswith("/weather/"):
+        request.app.state.scoring.latency.record((time.perf_counter() - started) * 1000)
+    return response
+
+
+@app.get("/weather/current")
+async def current_weather(request: Request, lat: float, lon: float,
+                          drone_id: Optional[str] = None):
+    """Текущая безопасность и прогноз на 6 часов (как getCurrentWeather)."""
+    return await request.app.state.scoring.score(lat, lon, 6, drone_id)
+
+
+@app.get("/weather/forecast")
+async def forecast_weather(request: Request, lat: float, lon: float,
+                           hours: int = Query(24, ge=1, le=240),
+                           drone_id: Optional[str] = None):
+    """Прогноз безопасности на hours часов (как getForecast)."""
+    return await request.app.state.scoring.score(lat, lon, hours, drone_id)
+
+
+@app.get("/safety/explain")
+async def explain_safety(request: Request, lat: float, lon: float,
+                         hours: int = Query(24, ge=1, le=240),
+                         drone_id: Optional[str] = None,
+                         shap: Optional[str] = Query(None, pattern='^(approx|exact)$')):
+    """Разложение safety_index по факторам (SafetyResult) на каждый час прогноза."""
+    return await request.app.state.scoring.explain(lat, lon, hours, drone_id, shap)
+
+
+@app.get("/safety/tile")
+async def safety_tile(request: Request, category: str,
+                      forecast_time: Optional[str] = Query(None, alias='time'),
+                      lat_min: float = -90.0, lat_max: float = 90.0,
+                      lon_min: float = -180.0, lon_max: float = 360.0):
+    """Тайл safety_index категории на ближайший час: uint8 [широта][долгота] без модели.
+
+    Тело — байты тайла, сетка и час — в заголовках X-Tile-*.
+    """
+    tiles = request.app.state.scoring.tiles()
+    if category not in tiles.categories:
+        raise HTTPException(status_code=404, detail=f"Нет тайлов для категории: {category}")
+    timestamp = pd.Timestamp(forecast_time) if forecast_time else pd.Timestamp.now(tz='UTC')
+    values, lats, lons = tiles.window(category, timestamp, (lat_min, lat_max, lon_min, lon_max))
+    hour = tiles.times[tiles.hour_index(timestamp)]
+    headers = {'X-Tile-Time': str(pd.Timestamp(hour)), 'X-Tile-Shape': f"{len(lats)},{len(lons)}"}
+    if len(lats) and len(lons):
+        headers['X-Tile-Bounds'] = f"{lats[0]},{lats[-1]},{lons[0]},{lons[-1]}"
+    return Response(content=values.tobytes(), media_type='application/octet-stream', headers=headers)
+
+
+@app.get("/analytics")
+async def analytics(request: Request, start: Optional[str] = None, end: Optional[str] = None,
+                    period: str = Query('week', pattern='^(week|day)$')):
+    """AnalyticsData по готовым роллапам за период [start, end] (даты YYYY-MM-DD)."""
+    return request.app.state.scoring.analytics.analytics_data(start, end, period)
+
+
+@app.get("/analytics/summary")
+async def analytics_summary(request: Request, start: Optional[str] = None, end: Optional[str] = None):
+    """AnalyticsSummary по готовым роллапам."""
+    return request.app.state.scoring.analytics.summary(start, end)
+
+
+@app.post("/analytics/flights")
+async def record_flight_outcome(request: Request, flight: Dict = Body(...)):
+    """Исход полёта (Flight со status completed / failed / cancelled / postponed)."""
+    return request.app.state.scoring.record_outcome(flight)
+
+
+@app.get("/health")
+async def health():
+    return {'status': 'ok'}
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """Перцентили задержки, целевые значения и статистика микро-батчей."""
+    state = request.app.state.scoring
+    return {
+        'latency_ms': state.latency.percentiles(),
+        'targets_ms': LATENCY_TARGETS_MS,
+        'batching': state.batcher.stats(),
+    }
@@ -0,0 +1,112 @@
+"""
+Поиск рекомендуемого времени старта (FlightPlanResponse.recommended_start).
+
+Вместо вызова модели на каждый кандидат старта погода и safety_index
+считаются один раз на общей сетке времени горизонта с шагом
+sample_step_minutes. Каждый кандидат — это окно длиной в полёт на этой
+сетке, поэтому минимум и среднее по полёту для всех кандидатов
+получаются скользящими свёртками (sliding_window_view). Точки всех
+планируемых полётов оцениваются одним вызовом модели, так что запрос на
+сотни полётов стоит одного батча.
+"""
+
+from typing import Dict, List, Mapping
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from batch_predictor import ModelArtifact, build_feature_array
+from train_safety_model import DRONE_SPEC_COLUMNS, calc_safety_class_vec
+from weather_index import WeatherGridIndex, utc_naive
+
+
+def _flight_grid(horizon_hours: float, duration_minutes: float,
+                 candidate_step_minutes: int, sample_step_minutes: int):
+    """Возвращает (число кандидатов, шаг кандидатов в отсчётах, длину окна полёта, длину ряда)."""
+    if candidate_step_minutes % sample_step_minutes:
+        raise ValueError("candidate_step_minutes должен быть кратен sample_step_minutes")
+    stride = candidate_step_minutes // sample_step_minutes
+    n_candidates = int(horizon_hours * 60 // candidate_step_minutes) + 1
+    # Полёт оценивается в точках от старта до посадки включительно
+    window = int(np.ceil(duration_minutes / sample_step_minutes)) + 1
+    n_samples = (n_candidates - 1) * stride + window
+    return n_candidates, stride, window, n_samples
+
+
+def optimize_start_times(artifact: ModelArtifact, index: WeatherGridIndex,
+                         flights: List[Mapping], horizon_start,
+                         horizon_hours: float = 24,
+                         candidate_step_minutes: int = 30,
+                         sample_step_minutes: int = 10,
+                         top_k: int = 5) -> List[Dict]:
+    """Подбирает лучшее время старта для каждого полёта на горизонте прогноза.
+
+    flights — словари с ключами drone_spec (паспорт дрона), lat, lon,
+    duration_minutes. Кандидаты ранжируются по минимальному safety_index
+    за полёт, при равенстве — по среднему. Возвращает для каждого полёта
+    recommended_start, его оценки и top_k лучших кандидатов.
+    """
+    if not flights:
+        return []
+    start = utc_naive(horizon_start)
+    step = np.timedelta64(sample_step_minutes, 'm')
+
+    grids = [_flight_grid(horizon_hours, f['duration_minutes'],
+                          candidate_step_minutes, sample_step_minutes) for f in flights]
+    lengths = [g[3] for g in grids]
+
+    # Точки времени всех полётов подряд: у каждого полёта свой ряд длиной n_samples
+    times = np.concatenate([np.datetime64(start, 'ns') + np.arange(n) * step for n in lengths])
+    lats = np.repeat([f['lat'] for f in flights], lengths)
+    lons = np.repeat([f['lon'] for f in flights], lengths)
+
+    rows = pd.DataFrame(index.bilinear(lats, lons, times))
+    for col in DRONE_SPEC_COLUMNS:
+        rows[col] = np.repeat(np.array([f['drone_spec'][col] for f in flights]), lengths)
+
+    # Один вызов модели на все полёты и все моменты горизонта
+    safety_index = np.clip(artifact.booster.inplace_predict(build_feature_array(artifact, rows)), 0, 100)
+
+    results = []
+    offsets = np.cumsum([0] + lengths)
+    for k, (n_candidates, stride, window, _) in enumerate(grids):
+        series = safety_index[offsets[k]:offsets[k + 1]].astype(np.float64)
+        windows = sliding_window_view(series, window)[::stride][:n_candidates]
+        window_min = windows.min(axis=1)
+        window_mean = windows.mean(axis=1)
+
+        # Сортировка по убыванию: сначала минимум за полёт, затем среднее
+        order = np.lexsort((-window_mean, -window_min))
+        candidate_starts = start + pd.to_timedelta(np.arange(n_candidates) * candidate_step_minutes, unit='m')
+        classes = calc_safety_class_vec(window_min)
+
+        ranked = [
+            {
+                'start': candidate_starts[c].tz_localize('UTC').isoformat(),
+                'min_safety_index': round(float(window_min[c]), 1),
+                'mean_safety_index': round(float(window_mean[c]), 1),
+                'safety_class': classes[c],
+            }
+            for c in order[:top_k]
+        ]
+        best = ranked[0]
+        results.append({
+            'recommended_start': best['start'],
+            'min_safety_index': best['min_safety_index'],
+            'mean_safety_index': best['mean_safety_index'],
+            'safety_class': best['safety_class'],
+            'alternatives': ranked[1:],
+        })
+    return results
+
+
+def recommend_start(artifact: ModelArtifact, index: WeatherGridIndex,
+                    drone_spec: Mapping, lat: float, lon: float,
+                    duration_minutes: float, horizon_start,
+                    horizon_hours: float = 24, **kwargs) -> Dict:
+    """Рекомендуемое время старта для одного полёта (см. optimize_start_times)."""
+    flight = {'drone_spec': drone_spec, 'lat': lat, 'lon': lon,
+              'duration_minutes': duration_minutes}
+    return optimize_start_times(artifact, index, [flight], horizon_start,
+                                horizon_hours=horizon_hours, **kwargs)[0]
@@ -0,0 +1,95 @@
+"""
+Синтетические входные данные для бенчмарков и тестов: погода в именах и
+единицах ERA5, её запись в GRIB2 и паспорта дронов.
+
+Модуль лёгкий (без моделей и сервиса), его импортируют и
+benchmark_suite.py, и тесты в tests/.
+"""
+
+import numpy as np
+import pandas as pd
+
+from synthetic_weather import synthetic_weather_table
+
+
+# paramId ECMWF для переменных ERA5 и их имена в cfgrib
+ERA5_PARAMS = {
+    't2m': 167, 'u10': 165, 'v10': 166, 'i10fg': 228029, 'tp': 228, 'tcc': 164,
+}
+
+DRONE_CATEGORIES = ['multirotor', 'fixed_wing', 'vtol', 'hybrid_vtol']
+
+
+def synthetic_era5_dataset(n_lat: int, n_lon: int, n_times: int,
+                           seed: int = 42) -> 'xr.Dataset':
+    """Синтетическая погода (synthetic_weather.py) в единицах и именах ERA5.
+
+    Температура в K, осадки в м, облачность — доля.
+    """
+    import xarray as xr
+
+    times = pd.date_range('2024-01-01', periods=n_times, freq='h')
+    lats = 60.0 - 0.25 * np.arange(n_lat)
+    lons = 20.0 + 0.25 * np.arange(n_lon)
+    weather_df = synthetic_weather_table(times, lats, lons, seed=seed)
+
+    era5 = {
+        't2m': weather_df['temp_c'] + 273.15,
+        'u10': weather_df['wind_u'],
+        'v10': weather_df['wind_v'],
+        'i10fg': weather_df['wind_gust'],
+        'tp': weather_df['precip'] / 1000,
+        'tcc': weather_df['cloud_cover'] / 100,
+    }
+    dims = ('time', 'latitude', 'longitude')
+    shape = (n_times, n_lat, n_lon)
+    return xr.Dataset(
+        {name: (dims, values.to_numpy(dtype=np.float32).reshape(shape)) for name, values in era5.items()},
+        coords={'time': times, 'latitude': lats, 'longitude': lons},
+    )
+
+
+def write_synthetic_grib(ds: 'xr.Dataset', path: str) -> str:
+    """Записывает датасет в GRIB2: по сообщению на переменную и шаг времени."""
+    import eccodes
+
+    lats, lons = ds['latitude'].values, ds['longitude'].values
+    with open(path, 'wb') as f:
+        for t, timestamp in enumerate(pd.to_datetime(ds['time'].values)):
+            for name, param_id in ERA5_PARAMS.items():
+                handle = eccodes.codes_grib_new_from_samples('regular_ll_sfc_grib2')
+                for key, value in [
+                    ('Ni', len(lons)), ('Nj', len(lats)),
+                    ('latitudeOfFirstGridPointInDegrees', float(lats[0])),
+                    ('latitudeOfLastGridPointInDegrees', float(lats[-1])),
+                    ('longitudeOfFirstGridPointInDegrees', float(lons[0])),
+                    ('longitudeOfLastGridPointInDegrees', float(lons[-1])),
+                    ('iDirectionIncrementInDegrees', float(abs(lons[1] - lons[0]))),
+                    ('jDirectionIncrementInDegrees', float(abs(lats[1] - lats[0]))),
+                    ('dataDate', int(timestamp.strftime('%Y%m%d'))),
+                    ('dataTime', timestamp.hour * 100),
+                    ('paramId', param_id),
+                ]:
+                    eccodes.codes_set(handle, key, value)
+                eccodes.codes_set_values(handle, ds[name].values[t].astype(np.float64).ravel())
+                eccodes.codes_write(handle, f)
+                eccodes.codes_release(handle)
+    return path
+
+
+def synthetic_drone_specs(n_drones: int, seed: int = 42) -> pd.DataFrame:
+    """Паспорта дронов со значениями в диапазонах data/drone_specs.csv."""
+    rng = np.random.default_rng(seed)
+    mtow = rng.uniform(0.5, 25, n_drones)
+    return pd.DataFrame({
+        'drone_id': [f"bench_{i:03d}" for i in range(n_drones)],
+        'max_wind_mps': rng.uniform(6, 15, n_drones).round(1),
+        'temp_min_c': rng.choice([-20.0, -10.0, 0.0], n_drones),
+        'temp_max_c': rng.choice([40.0, 45.0, 50.0], n_drones),
+        'allow_precip_mmph': rng.choice([0.0, 0.5, 2.0], n_drones),
+        'min_visibility_km': rng.uniform(1, 5, n_drones).round(1),
+        'mtow_kg': mtow,
+        'category': rng.choice(DRONE_CATEGORIES, n_drones),
+        'weight_kg': mtow * rng.uniform(0.6, 0.9, n_drones),
+        'max_flight_time_min': rng.uniform(20, 120, n_drones),
+    })
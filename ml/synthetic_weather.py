@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Синтетические погодные данные без GRIB файлов.
+
+Погодная таблица (те же столбцы и единицы, что у convert_grib_to_weather_csv)
+строится векторно для любой сетки широта × долгота × время:
+
+- климат: температура падает к северу, сезонный ход с максимумом в июле,
+  суточный ход по местному солнечному времени, зимой ветер сильнее;
+- погода: аномалии каждой переменной — сумма бегущих плоских волн с
+  длиной волны 3–30° и периодом 1–10 суток, поэтому соседние узлы и
+  соседние часы коррелированы, а фронты осадков и облачности смещаются;
+- осадки выпадают там, где поле осадков выше порога (около 10% узлов),
+  облачность связана с осадками.
+
+Параметры волн задаются только seed, а значения — абсолютным временем и
+координатами узла. Поэтому таблица, выданная кусками по времени
+(iter_synthetic_weather), совпадает с таблицей, построенной за один вызов,
+и её можно потоково писать в колоночное хранилище любого размера.
+
+Запуск (из каталога ml/):
+    python synthetic_weather.py --output data/weather.csv
+    python synthetic_weather.py --store data/weather_store --days 365 --lat 40 --lon 40
+"""
+
+import argparse
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from weather_store import write_weather_store
+
+
+# Поля аномалий, для каждого свой набор волн
+ANOMALY_FIELDS = ['temp', 'wind_u', 'wind_v', 'gust', 'precip', 'cloud']
+
+# Число волн на поле: больше — мельче детали
+N_MODES = 24
+
+# Отсчёт абсолютного времени для фаз волн
+EPOCH = pd.Timestamp('2000-01-01')
+
+# Порог поля осадков (в стандартных отклонениях): осадки примерно в 10% узлов
+PRECIP_THRESHOLD = 1.3
+
+# Сетка по умолчанию: 30 дней каждые 3 часа, 5 × 5 узлов в районе Москвы
+DEFAULT_START = '2024-01-01'
+DEFAULT_PERIODS = 240
+DEFAULT_FREQ = '3h'
+DEFAULT_LATS = np.linspace(55.0, 56.0, 5)
+DEFAULT_LONS = np.linspace(37.0, 38.0, 5)
+
+
+def default_synthetic_grid() -> Tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
+    """Сетка по умолчанию: (times, lats, lons)."""
+    times = pd.date_range(DEFAULT_START, periods=DEFAULT_PERIODS, freq=DEFAULT_FREQ)
+    return times, DEFAULT_LATS, DEFAULT_LONS
+
+
+def _wave_modes(seed: int) -> Dict[str, np.ndarray]:
+    """Параметры бегущих волн для всех полей: массивы формы (поле, волна)."""
+    rng = np.random.default_rng(seed)
+    shape = (len(ANOMALY_FIELDS), N_MODES)
+    wavelength = np.exp(rng.uniform(np.log(3.0), np.log(30.0), shape))  # градусы
+    direction = rng.uniform(0, 2 * np.pi, shape)
+    period = np.exp(rng.uniform(np.log(24.0), np.log(240.0), shape))  # часы
+    wavenumber = 2 * np.pi / wavelength
+    return {
+        'k_lat': wavenumber * np.sin(direction),
+        'k_lon': wavenumber * np.cos(direction),
+        'omega': 2 * np.pi / period,
+        'phase': rng.uniform(0, 2 * np.pi, shape),
+    }
+
+
+def _anomaly_fields(modes: Dict[str, np.ndarray], hours: np.ndarray,
+                    lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Поля аномалий с единичной дисперсией, форма (поле, время, узел).
+
+    cos(s - ωt) = cos s·cos ωt + sin s·sin ωt, поэтому сумма волн по всем
+    узлам и часам сводится к двум матричным умножениям на поле.
+    """
+    spatial = (modes['k_lat'][..., None] * lat + modes['k_lon'][..., None] * lon
+               + modes['phase'][..., None])                      # (поле, волна, узел)
+    temporal = modes['omega'][..., None] * hours                  # (поле, волна, время)
+    fields = (np.matmul(np.cos(temporal).transpose(0, 2, 1), np.cos(spatial))
+              + np.matmul(np.sin(temporal).transpose(0, 2, 1), np.sin(spatial)))
+    return fields * np.sqrt(2.0 / N_MODES)
+
+
+def synthetic_weather_table(times: Sequence, lats: Sequence[float], lons: Sequence[float],
+                            seed: int = 42, modes: Optional[Dict[str, np.ndarray]] = None) -> pd.DataFrame:
+    """Погодная таблица для сетки times × lats × lons в порядке (время, широта, долгота)."""
+    times = pd.DatetimeIndex(times)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    modes = modes if modes is not None else _wave_modes(seed)
+    n_cells = len(lats) * len(lons)
+
+    # Узлы сетки (1, узел) и время (время, 1)
+    lat = np.repeat(lats, len(lons))[None, :]
+    lon = np.tile(lons, len(lats))[None, :]
+    hours = ((times - EPOCH) / pd.Timedelta(1, 'h')).to_numpy(dtype=np.float64)
+    temp_a, u_a, v_a, gust_a, precip_a, cloud_a = _anomaly_fields(modes, hours, lat, lon)
+
+    day_of_year = times.dayofyear.to_numpy(dtype=np.float64)[:, None]
+    # Сезон: +1 в середине июля, -1 в середине января
+    season = -np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+    # Местное солнечное время узла
+    solar_hour = (times.hour.to_numpy(dtype=np.float64)[:, None] + lon / 15.0) % 24
+
+    # Облачность связана с полем осадков, в облачную погоду суточный ход слабее
+    cloud_cover = 100.0 / (1.0 + np.exp(-(1.2 * cloud_a + 0.8 * precip_a + 0.3)))
+    diurnal = np.cos(2 * np.pi * (solar_hour - 15) / 24) * (1 - 0.5 * cloud_cover / 100)
+    temp_c = 8.0 - 0.7 * (lat - 50.0) + 12.0 * season + 4.0 * diurnal + 3.0 * temp_a
+
+    # Западный перенос; зимой и днём (перемешивание) ветер сильнее
+    wind_scale = (1 - 0.25 * season) * (1 + 0.15 * np.cos(2 * np.pi * (solar_hour - 14) / 24))
+    wind_u = (3.0 + 4.0 * u_a) * wind_scale
+    wind_v = 4.0 * v_a * wind_scale
+    wind_speed = np.hypot(wind_u, wind_v)
+    wind_gust = wind_speed * (1.3 + 0.1 * np.clip(gust_a, -2, 2)) + 0.5
+
+    # Летом осадки интенсивнее (конвекция)
+    precip = np.maximum(0.0, precip_a - PRECIP_THRESHOLD) * 3.0 * (1 + 0.3 * season)
+
+    def flat(values):
+        return np.broadcast_to(values, (len(times), n_cells)).ravel()
+
+    return pd.DataFrame({
+        'timestamp': np.repeat(times.values, n_cells),
+        'lat': flat(lat),
+        'lon': flat(lon),
+        'temp_c': flat(temp_c),
+        'wind_u': flat(wind_u),
+        'wind_v': flat(wind_v),
+        'wind_gust': flat(wind_gust),
+        'precip': flat(precip),
+        'cloud_cover': flat(cloud_cover),
+        'wind_speed': flat(wind_speed),
+    })
+
+
+def iter_synthetic_weather(times: Sequence, lats: Sequence[float], lons: Sequence[float],
+                           seed: int = 42, chunk_size: int = 24) -> Iterator[pd.DataFrame]:
+    """Отдаёт погодную таблицу кусками по chunk_size шагов времени.
+
+    Склеенные куски совпадают с synthetic_weather_table на всей сетке.
+    """
+    times = pd.DatetimeIndex(times)
+    modes = _wave_modes(seed)
+    for start in range(0, len(times), chunk_size):
+        yield synthetic_weather_table(times[start:start + chunk_size], lats, lons, modes=modes)
+
+
+def write_synthetic_weather(times: Sequence, lats: Sequence[float], lons: Sequence[float],
+                            output_path: Optional[str] = None, store_dir: Optional[str] = None,
+                            seed: int = 42, chunk_size: int = 24) -> Dict[str, float]:
+    """Потоково пишет синтетическую погоду в CSV и/или колоночное хранилище."""
+    total_rows = 0
+    started = time.perf_counter()
+    for i, chunk_df in enumerate(iter_synthetic_weather(times, lats, lons, seed, chunk_size)):
+        if output_path:
+            chunk_df.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        if store_dir:
+            write_weather_store(chunk_df, store_dir, overwrite=(i == 0))
+        total_rows += len(chunk_df)
+
+    total_time = time.perf_counter() - started
+    rows_per_sec = total_rows / total_time if total_time > 0 else float('inf')
+    print(f"Сгенерировано {total_rows} строк за {total_time:.1f} с ({rows_per_sec:,.0f} строк/с)")
+    return {'rows': total_rows, 'seconds': total_time, 'rows_per_sec': rows_per_sec}
+
+
+def main(argv: Optional[List[str]] = None):
+    """Генерирует синтетическую погоду в CSV и/или колоночное хранилище."""
+    parser = argparse.ArgumentParser(description="Синтетические погодные данные без GRIB")
+    parser.add_argument('--output', default=None, help="CSV файл погодной таблицы")
+    parser.add_argument('--store', default=None, help="каталог колоночного хранилища")
+    parser.add_argument('--start', default=DEFAULT_START)
+    parser.add_argument('--days', type=float, default=None,
+                        help="длительность в сутках (по умолчанию 240 шагов)")
+    parser.add_argument('--freq', default=DEFAULT_FREQ, help="шаг времени, например 1h или 3h")
+    parser.add_argument('--lat', type=int, default=len(DEFAULT_LATS), help="узлов по широте")
+    parser.add_argument('--lon', type=int, default=len(DEFAULT_LONS), help="узлов по долготе")
+    parser.add_argument('--lat-range', type=float, nargs=2, default=(55.0, 56.0))
+    parser.add_argument('--lon-range', type=float, nargs=2, default=(37.0, 38.0))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=24, help="шагов времени в куске")
+    args = parser.parse_args(argv)
+
+    if not args.output and not args.store:
+        parser.error("нужно указать --output и/или --store")
+
+    if args.days is None:
+        times = pd.date_range(args.start, periods=DEFAULT_PERIODS, freq=args.freq)
+    else:
+        end = pd.Timestamp(args.start) + pd.Timedelta(days=args.days)
+        times = pd.date_range(args.start, end, freq=args.freq, inclusive='left')
+    lats = np.linspace(*args.lat_range, args.lat)
+    lons = np.linspace(*args.lon_range, args.lon)
+
+    print(f"Сетка {args.lat}×{args.lon}, {len(times)} шагов времени "
+          f"({times[0]} .. {times[-1]}), seed {args.seed}")
+    write_synthetic_weather(times, lats, lons, args.output, args.store, args.seed, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
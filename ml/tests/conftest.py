@@ -0,0 +1,6 @@
+"""Модули ml/ импортируются тестами так же, как при запуске из каталога ml/."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,37 @@
+"""Попадание в кэш конвертации возвращает ту же таблицу, что и промах, и переписывает выходные файлы."""
+
+import numpy as np
+import pandas as pd
+
+from synthetic_inputs import synthetic_era5_dataset, write_synthetic_grib
+from train_safety_model import convert_grib_to_weather_csv
+from weather_store import read_weather_store
+
+
+def test_cache_hit_matches_miss(tmp_path):
+    grib_path = write_synthetic_grib(synthetic_era5_dataset(4, 5, 6), str(tmp_path / "data.grib"))
+    cache_dir = str(tmp_path / "cache")
+
+    miss = convert_grib_to_weather_csv(grib_path, str(tmp_path / "miss.csv"), cache_dir=cache_dir)
+    hit = convert_grib_to_weather_csv(grib_path, str(tmp_path / "hit.csv"), cache_dir=cache_dir)
+
+    pd.testing.assert_frame_equal(hit, miss, check_exact=True)
+    assert (tmp_path / "hit.csv").read_bytes() == (tmp_path / "miss.csv").read_bytes()
+
+
+def test_cache_hit_rewrites_outputs_of_another_file(tmp_path):
+    # a.grib, b.grib и снова a.grib в одни и те же weather.csv и хранилище
+    a_path = write_synthetic_grib(synthetic_era5_dataset(4, 5, 6, seed=1), str(tmp_path / "a.grib"))
+    b_path = write_synthetic_grib(synthetic_era5_dataset(4, 5, 6, seed=2), str(tmp_path / "b.grib"))
+    output_path, store_dir = str(tmp_path / "weather.csv"), str(tmp_path / "store")
+    cache_dir = str(tmp_path / "cache")
+
+    convert_grib_to_weather_csv(a_path, output_path, store_dir, cache_dir)
+    convert_grib_to_weather_csv(b_path, output_path, store_dir, cache_dir)
+    hit = convert_grib_to_weather_csv(a_path, output_path, store_dir, cache_dir)
+
+    on_disk = pd.read_csv(output_path, parse_dates=['timestamp'])
+    pd.testing.assert_frame_equal(on_disk, hit, check_dtype=False)
+    stored = read_weather_store(store_dir).sort_values(['timestamp', 'lat', 'lon'], ignore_index=True)
+    expected = hit.sort_values(['timestamp', 'lat', 'lon'], ignore_index=True)
+    np.testing.assert_allclose(stored['temp_c'], expected['temp_c'], rtol=1e-6)
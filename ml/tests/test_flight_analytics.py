@@ -0,0 +1,74 @@
+"""Роллапы аналитики: record по одному исходу совпадает с backfill, журнал переживает падение."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from drone_registry import DroneRegistry
+from flight_analytics import FlightAnalytics, backfill_analytics, flight_bucket, synthetic_flight_history
+from synthetic_inputs import synthetic_drone_specs
+from synthetic_weather import synthetic_weather_table
+from weather_index import StubWeatherProvider, WeatherGridIndex
+
+
+@pytest.fixture(scope='module')
+def registry():
+    return DroneRegistry.from_dataframe(synthetic_drone_specs(8))
+
+
+@pytest.fixture(scope='module')
+def weather():
+    times = pd.date_range("2024-03-01", periods=72, freq="h")
+    return WeatherGridIndex.from_weather_df(
+        synthetic_weather_table(times, np.linspace(55.0, 56.0, 11), np.linspace(37.0, 38.0, 11)))
+
+
+def flight_history(registry, weather) -> pd.DataFrame:
+    flights = synthetic_flight_history(registry, weather, 400)
+    # Часть planned_start — строки с поясом +03:00 и минутами ближе к следующему часу
+    planned = flights['planned_start'].dt.floor('h') + pd.Timedelta(minutes=40)
+    local = planned.dt.tz_convert('Europe/Moscow').map(lambda t: t.isoformat())
+    flights['planned_start'] = np.where(np.arange(len(flights)) % 2 == 0, local,
+                                        planned.map(lambda t: t.isoformat()))
+    flights['lat'] = flights['lat'].clip(55.0, 56.0)
+    flights['lon'] = flights['lon'].clip(37.0, 38.0)
+    return flights
+
+
+def record_all(analytics: FlightAnalytics, flights: pd.DataFrame, registry, weather):
+    for flight in flights.to_dict('records'):
+        flight['location'] = {'lat': flight.pop('lat'), 'lon': flight.pop('lon')}
+        analytics.record(flight, flight_bucket(flight, registry, weather))
+
+
+def assert_same_rollups(actual: FlightAnalytics, expected: FlightAnalytics):
+    assert sorted(actual.days) == sorted(expected.days)
+    for day, matrix in expected.days.items():
+        np.testing.assert_allclose(actual.days[day], matrix)
+    np.testing.assert_allclose(actual.totals, expected.totals)
+
+
+@pytest.mark.parametrize('provider', ['index', 'stub'])
+def test_record_matches_backfill(registry, weather, provider):
+    flights = flight_history(registry, weather)
+    source = weather if provider == 'index' else StubWeatherProvider()
+    analytics = FlightAnalytics()
+    record_all(analytics, flights, registry, source)
+    assert_same_rollups(analytics, backfill_analytics(flights, registry, source))
+
+
+def test_journal_replayed_without_save(tmp_path, registry, weather):
+    flights = flight_history(registry, weather)
+    path = str(tmp_path / "rollups.json")
+    first, rest = flights.iloc[:100], flights.iloc[100:]
+
+    analytics = FlightAnalytics.open(path)
+    record_all(analytics, first, registry, weather)
+    analytics.save(path)
+    record_all(analytics, rest, registry, weather)
+    analytics.close()  # процесс упал: снимок только с первыми исходами
+
+    reopened = FlightAnalytics.open(path)
+    assert len(reopened) == len(analytics)
+    assert_same_rollups(reopened, backfill_analytics(flights, registry, weather))
+    reopened.close()
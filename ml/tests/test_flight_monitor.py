@@ -0,0 +1,100 @@
+"""Гистерезис классов FlightMonitor.apply и время телеметрии в UTC.
+
+Пороги классов — 80 и 60, margin по умолчанию 3 пункта, новый класс
+подтверждается за confirm_ticks = 2 такта.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from drone_registry import DroneRegistry
+from flight_monitor import FlightMonitor
+from synthetic_inputs import synthetic_drone_specs
+from weather_index import StubWeatherProvider
+
+
+@pytest.fixture
+def monitor():
+    registry = DroneRegistry.from_dataframe(synthetic_drone_specs(2))
+    # apply не вызывает модель: артефакту нужна только схема признаков
+    return FlightMonitor(SimpleNamespace(feature_cols=[]), registry, StubWeatherProvider())
+
+
+def telemetry(monitor, flight_id: str = "FLT-1", time=None) -> dict:
+    return {'id': flight_id, 'drone_id': monitor.registry.drone_ids[0],
+            'lat': 55.7, 'lon': 37.6, 'time': time}
+
+
+@pytest.mark.parametrize('time, expected', [
+    ("2024-03-01T12:00:00+03:00", "2024-03-01T09:00:00"),
+    ("2024-03-01T09:00:00Z", "2024-03-01T09:00:00"),
+    ("2024-03-01T09:00:00", "2024-03-01T09:00:00"),
+    (pd.Timestamp("2024-03-01T12:00:00", tz='Europe/Moscow'), "2024-03-01T09:00:00"),
+])
+def test_telemetry_time_in_utc(monitor, time, expected):
+    monitor.ingest(telemetry(monitor, time=time))
+    assert monitor.clock == np.datetime64(expected, 'ns')
+
+
+def test_missing_time_is_now_utc(monitor):
+    before = np.datetime64(pd.Timestamp.now(tz='UTC').tz_localize(None), 'ns')
+    monitor.ingest(telemetry(monitor))
+    after = np.datetime64(pd.Timestamp.now(tz='UTC').tz_localize(None), 'ns')
+    assert before <= monitor.clock <= after
+
+
+def run_ticks(monitor, series: dict) -> list:
+    """Такты apply для полётов {flight_id: [safety_index по тактам]}; предупреждения каждого такта."""
+    for flight_id in series:
+        monitor.ingest(telemetry(monitor, flight_id, "2024-03-01T09:00:00Z"))
+    slots = np.array([monitor._slot[flight_id] for flight_id in series])
+    ticks = []
+    for values in zip(*series.values()):
+        events = monitor.apply(slots, np.array(values, dtype=np.float32))
+        ticks.append([(e['flight_id'], e['level']) for e in events])
+    return ticks
+
+
+@pytest.mark.parametrize('safety_index, expected', [
+    (90.0, []), (80.0, []), (79.0, ['warning']), (60.0, ['warning']), (59.0, ['critical']),
+])
+def test_first_tick_warns_unless_green(monitor, safety_index, expected):
+    ticks = run_ticks(monitor, {'F': [safety_index]})
+    assert [level for _, level in ticks[0]] == expected
+
+
+def test_oscillation_inside_margin_is_silent(monitor):
+    ticks = run_ticks(monitor, {
+        'green': [90, 79, 81, 78, 82, 77.5, 79],
+        'yellow': [70, 61, 58, 62, 57.5, 82, 78],
+    })
+    assert ticks == [[('yellow', 'warning')]] + [[]] * 6
+    assert monitor.level[[monitor._slot['green'], monitor._slot['yellow']]].tolist() == [0, 1]
+
+
+def test_degrade_and_recover_outside_margin(monitor):
+    ticks = run_ticks(monitor, {'F': [90, 76, 76, 55, 55, 65, 65, 84, 84]})
+    assert ticks == [[], [], [('F', 'warning')], [], [('F', 'critical')],
+                     [], [('F', 'info')], [], [('F', 'info')]]
+    assert monitor.level[monitor._slot['F']] == 0
+
+
+def test_confirm_ticks_must_be_consecutive(monitor):
+    ticks = run_ticks(monitor, {'F': [90, 76, 90, 76, 90, 76, 76]})
+    assert ticks == [[]] * 6 + [[('F', 'warning')]]
+
+
+def test_jump_two_classes_is_critical(monitor):
+    ticks = run_ticks(monitor, {'F': [90, 40, 40]})
+    assert ticks == [[], [], [('F', 'critical')]]
+
+
+@pytest.mark.parametrize('confirm_ticks', [1, 3])
+def test_confirm_ticks_setting(monitor, confirm_ticks):
+    monitor.confirm_ticks = confirm_ticks
+    ticks = run_ticks(monitor, {'F': [90] + [70] * 3})
+    first = next(k for k, events in enumerate(ticks) if events)
+    assert first == confirm_ticks
@@ -0,0 +1,48 @@
+"""Открытие GRIB: переменные на разных уровнях собираются из гиперкубов cfgrib."""
+
+import cfgrib
+import pytest
+import xarray as xr
+
+from synthetic_inputs import synthetic_era5_dataset, write_synthetic_grib
+from train_safety_model import WEATHER_VAR_ALIASES, open_grib_dataset, resolve_weather_vars
+
+
+@pytest.fixture
+def grib_path(tmp_path):
+    # u10 / v10 / i10fg на 10 м, t2m на 2 м, tp и tcc на поверхности — четыре гиперкуба
+    return write_synthetic_grib(synthetic_era5_dataset(3, 3, 4), str(tmp_path / "levels.grib"))
+
+
+@pytest.fixture
+def open_datasets_calls(monkeypatch):
+    calls = []
+    open_datasets = cfgrib.open_datasets
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return open_datasets(*args, **kwargs)
+
+    monkeypatch.setattr(cfgrib, 'open_datasets', counting)
+    return calls
+
+
+def test_variables_from_all_levels(grib_path, open_datasets_calls):
+    var_map = resolve_weather_vars(open_grib_dataset(grib_path))
+    assert all(var_map[column] is not None for column in WEATHER_VAR_ALIASES)
+    assert len(open_datasets_calls) == 1
+
+
+def test_no_reopen_after_open_datasets(grib_path, open_datasets_calls, monkeypatch):
+    open_dataset = xr.open_dataset
+
+    def mixed_editions(*args, **kwargs):
+        # Первое открытие (фильтр edition=2) падает, как на файле с GRIB1 и GRIB2
+        if kwargs.get('backend_kwargs') == {'filter_by_keys': {'edition': 2}}:
+            raise ValueError("multiple values for key 'edition'")
+        return open_dataset(*args, **kwargs)
+
+    monkeypatch.setattr(xr, 'open_dataset', mixed_editions)
+    var_map = resolve_weather_vars(open_grib_dataset(grib_path))
+    assert all(var_map[column] is not None for column in WEATHER_VAR_ALIASES)
+    assert len(open_datasets_calls) == 1
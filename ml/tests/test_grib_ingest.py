@@ -0,0 +1,42 @@
+"""Загрузка GRIB файла, упавшая на середине, не оставляет частей в хранилище и записи в манифесте."""
+
+import glob
+import os
+
+import train_safety_model
+from grib_ingest import ingest_grib_file, ingest_grib_files, load_ingest_manifest, source_part_prefix
+from synthetic_inputs import synthetic_era5_dataset, write_synthetic_grib
+
+
+def test_failed_file_leaves_no_parts(tmp_path, monkeypatch):
+    grib_path = write_synthetic_grib(synthetic_era5_dataset(3, 3, 6), str(tmp_path / "a.grib"))
+    store_dir = str(tmp_path / "store")
+    iter_chunks = train_safety_model.iter_weather_chunks
+
+    def failing_chunks(*args, **kwargs):
+        chunks = iter_chunks(*args, **kwargs)
+        yield next(chunks)
+        raise OSError("обрыв чтения")
+
+    monkeypatch.setattr(train_safety_model, 'iter_weather_chunks', failing_chunks)
+    report = ingest_grib_file(grib_path, store_dir, chunk_size=2)
+
+    assert report['error'] == "OSError: обрыв чтения"
+    parts = glob.glob(os.path.join(store_dir, 'date=*', f"{source_part_prefix(grib_path)}-*.parquet"))
+    assert parts == []
+
+
+def test_failed_append_drops_manifest_entry(tmp_path):
+    grib_path = write_synthetic_grib(synthetic_era5_dataset(3, 3, 6), str(tmp_path / "a.grib"))
+    store_dir = str(tmp_path / "store")
+    ingest_grib_files([grib_path], store_dir, workers=1)
+    assert os.path.abspath(grib_path) in load_ingest_manifest(store_dir)
+
+    # Файл изменился и больше не читается: его старые части удалены, запись манифеста тоже
+    with open(grib_path, 'wb') as f:
+        f.write(b"not a grib file")
+    summary = ingest_grib_files([grib_path], store_dir, workers=1, append=True)
+
+    assert summary['failed'] == [grib_path]
+    assert load_ingest_manifest(store_dir) == {}
+    assert glob.glob(os.path.join(store_dir, 'date=*', "*.parquet")) == []
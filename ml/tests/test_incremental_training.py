@@ -0,0 +1,54 @@
+"""Выбор режима дообучения по сдвигу распределения новой погоды."""
+
+import os
+
+import pytest
+
+from synthetic_inputs import synthetic_drone_specs, synthetic_era5_dataset, write_synthetic_grib
+from incremental_training import MANIFEST_FILE, incremental_update, load_manifest, save_manifest
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    drones_path = str(tmp_path / "drone_specs.csv")
+    synthetic_drone_specs(6).to_csv(drones_path, index=False)
+    base = synthetic_era5_dataset(4, 4, 24)
+    shifted = base.copy()
+    # Жара на 25 °C и вдвое сильнее ветер: PSI заведомо выше порога
+    shifted['t2m'] = shifted['t2m'] + 25.0
+    shifted['u10'] = shifted['u10'] * 2.0
+    shifted['v10'] = shifted['v10'] * 2.0
+    shifted['i10fg'] = shifted['i10fg'] * 2.0
+    return {
+        'drones': drones_path,
+        'model_dir': str(tmp_path / "models"),
+        'cache_dir': str(tmp_path / "cache"),
+        'base': write_synthetic_grib(base, str(tmp_path / "base.grib")),
+        'shifted': write_synthetic_grib(shifted, str(tmp_path / "shifted.grib")),
+    }
+
+
+def update(ws, paths):
+    return incremental_update(paths, ws['drones'], ws['model_dir'], ws['cache_dir'], samples_per_drone=20)
+
+
+def test_shifted_weather_without_baseline_retrains(workspace):
+    assert update(workspace, [workspace['base']])['mode'] == 'full'
+    # Манифест без эталона, как после дообучений warm старой версии
+    manifest = load_manifest(workspace['model_dir'])
+    manifest['baseline'] = {}
+    save_manifest(manifest, workspace['model_dir'])
+
+    report = update(workspace, [workspace['base'], workspace['shifted']])
+    assert report['mode'] == 'full'
+    assert max(report['psi'].values()) > 0.25
+
+
+def test_model_without_manifest_retrains_on_new_weather(workspace):
+    update(workspace, [workspace['base']])
+    # Модель из train_safety_model.py: манифеста нет
+    os.remove(os.path.join(workspace['model_dir'], MANIFEST_FILE))
+
+    report = update(workspace, [workspace['shifted']])
+    assert report['mode'] == 'full'
+    assert report['psi'] == {}
@@ -0,0 +1,141 @@
+"""Векторный разметчик совпадает со скалярным эталоном побитово.
+
+Скалярные calc_*_penalty, calc_safety_index и calc_safety_class — эталон;
+их векторные аналоги проверяются на точках излома каждого штрафа, на
+значениях вплотную к ним, на порогах классов и на случайных данных.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from train_safety_model import (
+    calc_gust_penalty,
+    calc_gust_penalty_vec,
+    calc_precip_penalty,
+    calc_precip_penalty_vec,
+    calc_safety_class,
+    calc_safety_class_vec,
+    calc_safety_index,
+    calc_safety_index_vec,
+    calc_temp_penalty,
+    calc_temp_penalty_vec,
+    calc_visibility_penalty,
+    calc_visibility_penalty_vec,
+    calc_wind_penalty,
+    calc_wind_penalty_vec,
+)
+
+
+def around(*points: float) -> list:
+    """Точки излома и ближайшие к ним float64 с обеих сторон."""
+    values = []
+    for point in points:
+        values += [np.nextafter(point, -np.inf), point, np.nextafter(point, np.inf)]
+    return values
+
+
+def assert_same(scalar_fn, vec_fn, *args):
+    args = [np.asarray(a, dtype=np.float64) for a in args]
+    expected = np.array([scalar_fn(*vals) for vals in zip(*args)], dtype=np.float64)
+    actual = vec_fn(*args)
+    assert np.array_equal(expected, actual, equal_nan=True), \
+        f"{vec_fn.__name__} расходится с {scalar_fn.__name__}: {expected} != {actual}"
+
+
+@pytest.mark.parametrize('ratio', around(0.0, 0.7, 1.0) + [0.35, 0.85, 1.5, 3.0, np.nan])
+def test_wind_penalty(ratio):
+    assert_same(calc_wind_penalty, calc_wind_penalty_vec, [ratio])
+
+
+@pytest.mark.parametrize('ratio', around(0.0, 1.0, 1.3) + [0.5, 1.15, 2.0, np.nan])
+def test_gust_penalty(ratio):
+    assert_same(calc_gust_penalty, calc_gust_penalty_vec, [ratio])
+
+
+@pytest.mark.parametrize('below, above', [
+    (0.0, 0.0), (20.0, 0.0), (np.nextafter(20.0, 0), 0.0), (25.0, 0.0),
+    (0.0, 20.0 / 0.7), (0.0, 40.0), (10.0, 10.0), (np.nan, 0.0), (0.0, np.nan),
+])
+def test_temp_penalty(below, above):
+    assert_same(calc_temp_penalty, calc_temp_penalty_vec, [below], [above])
+
+
+@pytest.mark.parametrize('precip, allow', [
+    (0.0, 0.0), (1e-12, 0.0), (1.0, 0.0), (1.5, 0.0), (3.0, 0.0),
+    (0.0, 2.0), (2.0, 2.0), (np.nextafter(2.0, np.inf), 2.0), (5.0, 2.0), (8.0, 2.0), (20.0, 2.0),
+    (1.0, -1.0), (np.nan, 2.0), (1.0, np.nan),
+])
+def test_precip_penalty(precip, allow):
+    assert_same(calc_precip_penalty, calc_precip_penalty_vec, [precip], [allow])
+
+
+@pytest.mark.parametrize('vis', around(1.0) + [0.0, 0.5, 5.0, np.nan])
+@pytest.mark.parametrize('min_vis', [1.0, 3.0])
+def test_visibility_penalty(vis, min_vis):
+    assert_same(calc_visibility_penalty, calc_visibility_penalty_vec, [vis], [min_vis])
+
+
+@pytest.mark.parametrize('safety_index', around(60.0, 80.0) + [0.0, 100.0, np.nan])
+def test_safety_class(safety_index):
+    expected = np.array([calc_safety_class(safety_index)], dtype=object)
+    assert np.array_equal(expected, calc_safety_class_vec(np.array([safety_index])))
+
+
+def pairs_frame(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Случайные пары погода × паспорт, включая нулевой max_wind_mps и запрет осадков."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'wind_speed': rng.uniform(0, 30, n_rows),
+        'wind_gust': rng.uniform(0, 40, n_rows),
+        'max_wind_mps': rng.choice([0.0, 8.0, 10.0, 12.0, 15.0], n_rows),
+        'temp_c': rng.uniform(-40, 50, n_rows),
+        'temp_min_c': rng.choice([-20.0, -10.0, 0.0], n_rows),
+        'temp_max_c': rng.choice([35.0, 40.0, 45.0], n_rows),
+        'precip': np.where(rng.random(n_rows) < 0.5, 0.0, rng.exponential(3.0, n_rows)),
+        'allow_precip_mmph': rng.choice([0.0, 0.5, 2.0, 5.0], n_rows),
+        'visibility_km': rng.uniform(0.0, 15.0, n_rows),
+        'min_visibility_km': rng.choice([0.5, 1.0, 3.0], n_rows),
+    })
+
+
+def assert_index_matches(df: pd.DataFrame):
+    expected = df.apply(calc_safety_index, axis=1).to_numpy(dtype=np.float64)
+    actual = calc_safety_index_vec(df)
+    assert np.array_equal(expected, actual, equal_nan=True)
+    expected_class = np.array([calc_safety_class(v) for v in expected], dtype=object)
+    assert np.array_equal(expected_class, calc_safety_class_vec(actual))
+
+
+@pytest.mark.parametrize('seed', [0, 42])
+def test_safety_index_random(seed):
+    assert_index_matches(pairs_frame(5000, seed))
+
+
+def test_safety_index_breakpoints():
+    # Ветер и порывы ровно на изломах, видимость ровно на минимуме, пропуск температуры
+    ratios = np.array(around(0.0, 0.7, 1.0, 1.3))
+    df = pairs_frame(len(ratios) + 1)
+    df.loc[:len(ratios) - 1, 'max_wind_mps'] = 10.0
+    df.loc[:len(ratios) - 1, 'wind_speed'] = ratios * 10.0
+    df.loc[:len(ratios) - 1, 'wind_gust'] = ratios * 10.0
+    df['visibility_km'] = df['min_visibility_km']
+    df.loc[len(ratios), 'temp_c'] = np.nan
+    assert_index_matches(df)
+
+
+@pytest.mark.parametrize('target', around(60.0, 80.0))
+def test_safety_index_class_thresholds(target):
+    # Весь штраф даёт ветер выше допустимого (9.5 + (r - 1) * 30): индекс около порога класса
+    wind_ratio = 1.0 + (100.0 - target - 9.5) / 30.0
+    df = pd.DataFrame({
+        'wind_speed': [wind_ratio], 'wind_gust': [0.0], 'max_wind_mps': [1.0],
+        'temp_c': [20.0], 'temp_min_c': [0.0], 'temp_max_c': [40.0],
+        'precip': [0.0], 'allow_precip_mmph': [0.0],
+        'visibility_km': [10.0], 'min_visibility_km': [1.0],
+    })
+    assert_index_matches(df)
+
+
+def test_safety_index_without_visibility_column():
+    assert_index_matches(pairs_frame(500).drop(columns='visibility_km'))
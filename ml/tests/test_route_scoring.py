@@ -0,0 +1,23 @@
+"""Времена точек маршрута приводятся к UTC одинаково для явных eta и времени по умолчанию."""
+
+import numpy as np
+import pandas as pd
+
+from route_scoring import route_arrays
+
+
+def test_default_and_explicit_eta_share_utc():
+    waypoints = [
+        {'lat': 55.7, 'lon': 37.6, 'eta': "2024-01-01T12:00:00+03:00"},
+        {'lat': 55.8, 'lon': 37.7},
+    ]
+    arrays = route_arrays(waypoints, default_time="2024-01-01T12:00:00+03:00")
+    expected = np.datetime64("2024-01-01T09:00:00", 'ns')
+    assert (arrays['eta'] == expected).all()
+
+
+def test_default_now_is_utc():
+    before = pd.Timestamp.now(tz='UTC').tz_localize(None)
+    eta = pd.Timestamp(route_arrays([{'lat': 55.7, 'lon': 37.6}])['eta'][0])
+    after = pd.Timestamp.now(tz='UTC').tz_localize(None)
+    assert before <= eta <= after
@@ -0,0 +1,66 @@
+"""Инварианты объяснений: delta факторов складываются в safety_index, SHAP — в предсказание модели."""
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from batch_predictor import ModelArtifact, build_feature_array
+from safety_explanations import SHAP_COLUMNS, SHAP_MODES, explain_rows, shap_contributions
+from train_safety_model import calc_safety_index_vec
+
+FEATURE_COLS = ['wind_speed', 'wind_gust', 'max_wind_mps', 'temp_c', 'temp_min_c', 'temp_max_c',
+                'precip', 'allow_precip_mmph', 'visibility_km', 'min_visibility_km', 'cloud_cover',
+                'wind_ratio', 'category_multirotor']
+
+
+def pairs_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Пары погода × паспорт с заметными штрафами по всем факторам."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'wind_speed': rng.uniform(0, 25, n_rows),
+        'wind_gust': rng.uniform(0, 35, n_rows),
+        'max_wind_mps': rng.choice([8.0, 10.0, 15.0], n_rows),
+        'temp_c': rng.uniform(-35, 50, n_rows),
+        'temp_min_c': rng.choice([-20.0, -10.0], n_rows),
+        'temp_max_c': rng.choice([40.0, 45.0], n_rows),
+        'precip': np.where(rng.random(n_rows) < 0.5, 0.0, rng.exponential(4.0, n_rows)),
+        'allow_precip_mmph': rng.choice([0.0, 2.0], n_rows),
+        'visibility_km': rng.uniform(0.0, 12.0, n_rows),
+        'min_visibility_km': rng.choice([1.0, 3.0], n_rows),
+        'cloud_cover': rng.uniform(0, 100, n_rows),
+        'category': rng.choice(['multirotor', 'fixed_wing'], n_rows),
+    })
+
+
+def test_rule_deltas_sum_to_safety_index():
+    df = pairs_frame(5000)
+    explanation = explain_rows(df)
+    expected = calc_safety_index_vec(df)
+    np.testing.assert_allclose(np.clip(100 + explanation.deltas.sum(axis=1), 0, 100), expected, atol=1e-9)
+    np.testing.assert_allclose(explanation.safety_index, expected, atol=1e-9)
+    assert (explanation.deltas <= 0).all()
+    # Выборка не вырожденная: у части строк 100 + сумма delta ниже нуля и срабатывает обрезка
+    assert expected.min() == 0 and (100 + explanation.deltas.sum(axis=1) < 0).any()
+
+
+@pytest.fixture(scope='module')
+def artifact():
+    df = pairs_frame(2000, seed=1)
+    artifact = ModelArtifact(booster=None, feature_cols=FEATURE_COLS, schema={})
+    # Цель сдвинута на +10: часть предсказаний выходит за 100, как у регрессии без ограничения
+    dtrain = xgb.DMatrix(build_feature_array(artifact, df), label=calc_safety_index_vec(df) + 10,
+                         feature_names=FEATURE_COLS)
+    booster = xgb.train({'max_depth': 3, 'eta': 0.3, 'nthread': 1}, dtrain, num_boost_round=20)
+    return artifact._replace(booster=booster)
+
+
+@pytest.mark.parametrize('mode', SHAP_MODES)
+def test_shap_rows_sum_to_unclipped_prediction(artifact, mode):
+    X = build_feature_array(artifact, pairs_frame(300, seed=2))
+    prediction = artifact.booster.inplace_predict(X)
+    assert prediction.max() > 100
+
+    contributions = shap_contributions(artifact, X, mode, batch_size=128)
+    assert contributions.shape == (len(X), len(SHAP_COLUMNS))
+    np.testing.assert_allclose(contributions.sum(axis=1), prediction, rtol=0, atol=1e-3)
@@ -0,0 +1,33 @@
+"""Выбор часа тайла по времени запроса."""
+
+import json
+
+import pandas as pd
+import pytest
+
+from safety_tiles import TILES_MANIFEST, SafetyTiles
+
+
+@pytest.fixture
+def tiles(tmp_path):
+    manifest = {
+        'categories': ['multirotor'],
+        'lats': [55.0, 56.0],
+        'lons': [37.0, 38.0],
+        'times': [str(t) for t in pd.date_range("2024-01-01", periods=24, freq="h")],
+    }
+    (tmp_path / TILES_MANIFEST).write_text(json.dumps(manifest), encoding='utf-8')
+    return SafetyTiles(str(tmp_path))
+
+
+@pytest.mark.parametrize('timestamp, hour', [
+    ("2024-01-01T09:00", 9),
+    ("2024-01-01T09:20", 9),
+    ("2024-01-01T09:40", 10),
+    ("2024-01-01T09:00Z", 9),
+    ("2024-01-01T12:00+03:00", 9),
+    ("2023-12-31T00:00", 0),
+    ("2024-01-05T00:00", 23),
+])
+def test_hour_index_uses_utc(tiles, timestamp, hour):
+    assert tiles.hour_index(timestamp) == hour
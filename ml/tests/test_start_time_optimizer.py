@@ -0,0 +1,70 @@
+"""Ранжирование кандидатов старта: минимум safety_index за полёт, затем среднее."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from start_time_optimizer import optimize_start_times
+
+HORIZON_START = np.datetime64("2024-03-01T09:00:00", 'ns')
+
+# Отсчёты каждые 10 минут; кандидаты каждые 30 минут, полёт 20 минут — окно из трёх отсчётов.
+# Кандидаты 09:00..11:00: минимумы 50, 70, 70, 60, 65; у 10:00 среднее выше, чем у 09:30
+SERIES = {
+    0.0: [90, 90, 50, 70, 75, 80, 70, 90, 90, 60, 60, 60, 95, 95, 65],
+    # Минимум везде 85: выбирает среднее, лучшее у первого кандидата
+    1.0: [100, 85, 85] + [85] * 12,
+}
+
+
+class SeriesIndex:
+    """Индекс погоды, у которого temp_c — заданный ряд по отсчётам от HORIZON_START."""
+
+    def bilinear(self, lats, lons, times, **kwargs):
+        k = ((times - HORIZON_START) // np.timedelta64(10, 'm')).astype(int)
+        return {'temp_c': np.array([SERIES[lat][i] for lat, i in zip(lats, k)], dtype=np.float64)}
+
+
+class IdentityBooster:
+    """«Модель», которая возвращает первый признак как safety_index."""
+
+    def inplace_predict(self, X):
+        return X[:, 0]
+
+
+@pytest.fixture
+def artifact():
+    return SimpleNamespace(booster=IdentityBooster(), feature_cols=['temp_c'], schema={})
+
+
+def flight(lat: float) -> dict:
+    spec = {'max_wind_mps': 10.0, 'temp_min_c': -20.0, 'temp_max_c': 40.0, 'allow_precip_mmph': 0.0,
+            'min_visibility_km': 1.0, 'mtow_kg': 2.0, 'category': 'multirotor',
+            'weight_kg': 1.5, 'max_flight_time_min': 30.0}
+    return {'drone_spec': spec, 'lat': lat, 'lon': 37.6, 'duration_minutes': 20}
+
+
+def test_no_flights_returns_empty_list():
+    # Модель и индекс не нужны: до них дело не доходит
+    assert optimize_start_times(None, None, [], "2024-01-01T00:00Z") == []
+
+
+def test_ranking_by_min_then_mean(artifact):
+    # Начало горизонта в +03:00 — тот же момент, что HORIZON_START в UTC
+    results = optimize_start_times(artifact, SeriesIndex(), [flight(0.0), flight(1.0)],
+                                   "2024-03-01T12:00:00+03:00", horizon_hours=2, top_k=3)
+
+    first = results[0]
+    assert first['recommended_start'] == "2024-03-01T10:00:00+00:00"
+    assert (first['min_safety_index'], first['mean_safety_index']) == (70.0, 83.3)
+    assert first['safety_class'] == 'yellow'
+    assert [(a['start'], a['min_safety_index'], a['mean_safety_index']) for a in first['alternatives']] == [
+        ("2024-03-01T09:30:00+00:00", 70.0, 75.0),
+        ("2024-03-01T11:00:00+00:00", 65.0, 85.0),
+    ]
+
+    second = results[1]
+    assert second['recommended_start'] == "2024-03-01T09:00:00+00:00"
+    assert (second['min_safety_index'], second['mean_safety_index']) == (85.0, 90.0)
+    assert second['safety_class'] == 'green'
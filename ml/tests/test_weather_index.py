@@ -0,0 +1,37 @@
+"""Поиск по времени в WeatherGridIndex: часовые пояса и ближайший шаг."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from weather_index import WeatherGridIndex
+
+
+@pytest.fixture
+def index():
+    times = pd.date_range("2024-01-01", periods=8, freq="3h")
+    lats, lons = np.array([55.0, 56.0]), np.array([37.0, 38.0])
+    t, i, j = np.meshgrid(np.arange(len(times)), np.arange(len(lats)), np.arange(len(lons)), indexing='ij')
+    return WeatherGridIndex.from_weather_df(pd.DataFrame({
+        'timestamp': times[t.ravel()],
+        'lat': lats[i.ravel()],
+        'lon': lons[j.ravel()],
+        'temp_c': t.ravel().astype(np.float64),
+    }))
+
+
+@pytest.mark.parametrize('start, expected', [
+    ("2024-01-01 06:00", "2024-01-01 06:00"),
+    ("2024-01-01 07:00", "2024-01-01 06:00"),   # ближайший шаг, а не следующий
+    ("2024-01-01 08:00", "2024-01-01 09:00"),
+    ("2024-01-01 09:10+03:00", "2024-01-01 06:00"),
+    ("2024-01-01 06:00Z", "2024-01-01 06:00"),
+])
+def test_series_starts_at_nearest_utc_step(index, start, expected):
+    series = index.series(55.0, 37.0, start, 2)
+    assert series['timestamp'].iloc[0] == pd.Timestamp(expected)
+
+
+def test_series_shifts_to_available_range(index):
+    series = index.series(55.0, 37.0, "2024-01-05", 3)
+    assert list(series['temp_c']) == [5.0, 6.0, 7.0]
@@ -7,23 +7,30 @@
 2. Погодные данные (data.grib -> weather.csv)
 3. Генерирует обучающий датасет с метками safety_index
 4. Обучает XGBoost модель для предсказания индекса безопасности
+
+Тяжёлые зависимости (xarray / cfgrib, xgboost, sklearn, pyarrow)
+импортируются внутри функций, которым они нужны: функции разметки,
+признаков и константы схемы загружаются за время импорта pandas, и
+инструменты, которым нужны только они (сервис оценки, оптимизаторы,
+CLI), не платят за декодер GRIB и бустинг.
 """
 
+from __future__ import annotations
+
 import os
 import sys
+import json
+import time
 import pandas as pd
 import numpy as np
-from typing import Dict, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
-import xarray as xr
-import cfgrib
+from instrumentation import RunReport, peak_rss_mb
 
-import xgboost as xgb
-
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+if TYPE_CHECKING:
+    import xarray as xr
 
 
 def load_drone_specs(csv_path: str = "data/drone_specs.csv") -> pd.DataFrame:
@@ -45,209 +52,331 @@ def load_drone_specs(csv_path: str = "data/drone_specs.csv") -> pd.DataFrame:
     return df
 
 
-def convert_grib_to_weather_csv(grib_path: str = "data/data.grib",
-                                 output_path: str = "data/weather.csv") -> pd.DataFrame:
-    """Конвертирует GRIB файл в CSV с погодными данными."""
-    print("ШАГ 2: Конвертация GRIB файла в CSV")
-
-    '''
-    if not HAS_GRIB:
-        return generate_synthetic_weather_data(output_path)
-        print("\nWARNING: Библиотеки для GRIB недоступны. Генерирую синтетические погодные данные...")
-
-    if not os.path.exists(grib_path):
-        print(f"\nWARNING: Файл {grib_path} не найден. Генерирую синтетические погодные данные...")
-        return generate_synthetic_weather_data(output_path)
-    '''
-
-    try:
-        print(f"\nЧтение GRIB файла: {grib_path}")
-
-        # Открываем GRIB файл
-        # Обрабатываем ошибку "multiple values for key 'edition'"
-        # которая возникает когда файл содержит сообщения разных редакций GRIB
-        try:
-            # Пробуем открыть с фильтром по edition=2 (GRIB2)
-            ds = xr.open_dataset(grib_path, engine='cfgrib',
-                                backend_kwargs={'filter_by_keys': {'edition': 2}})
-        except (ValueError, KeyError) as e:
-            if 'multiple values' in str(e) or 'edition' in str(e).lower():
-                print("Обнаружены сообщения разных редакций GRIB. Используем open_datasets...")
-                # Используем open_datasets для обработки всех сообщений
-                datasets = cfgrib.open_datasets(grib_path)
-                if len(datasets) == 0:
-                    raise ValueError("Не удалось открыть GRIB файл")
-                # Объединяем все датасеты
-                if len(datasets) == 1:
-                    ds = datasets[0]
-                else:
-                    # Объединяем по измерению, если есть несколько датасетов
-                    ds = xr.merge(datasets)
-            else:
-                # Если это другая ошибка, пробуем открыть без фильтров
-                try:
-                    ds = xr.open_dataset(grib_path, engine='cfgrib')
-                except (ValueError, KeyError) as e2:
-                    if 'multiple values' in str(e2) or 'edition' in str(e2).lower():
-                        # Последняя попытка - используем open_datasets
-                        datasets = cfgrib.open_datasets(grib_path)
-                        if len(datasets) == 0:
-                            raise ValueError("Не удалось открыть GRIB файл")
-                        ds = datasets[0] if len(datasets) == 1 else xr.merge(datasets)
-                    else:
-                        raise e2
-
-        print("\nДоступные переменные в GRIB файле:")
-        print(list(ds.data_vars.keys()))
-        print("\nКоординаты:")
-        print(list(ds.coords.keys()))
-        print("\nРазмеры:")
-        print(dict(ds.dims))
-
-        # Определяем нужные переменные
-        weather_vars = {}
-
-        # Температура на 2м
-        temp_vars = ['t2m', '2t', '2m_temperature', 'temperature_2m']
-        temp_var = None
-        for v in temp_vars:
-            if v in ds.data_vars:
-                temp_var = v
-                break
-
-        # Компоненты ветра на 10м
-        u_wind_vars = ['u10', '10u', '10m_u_component_of_wind', 'u_component_of_wind_10m']
-        v_wind_vars = ['v10', '10v', '10m_v_component_of_wind', 'v_component_of_wind_10m']
-        u_var = None
-        v_var = None
-        for v in u_wind_vars:
-            if v in ds.data_vars:
-                u_var = v
-                break
-        for v in v_wind_vars:
-            if v in ds.data_vars:
-                v_var = v
-                break
-
-        # Порывы ветра
-        gust_vars = ['i10fg', '10fg', 'instantaneous_10m_wind_gust', 'wind_gust_10m']
-        gust_var = None
-        for v in gust_vars:
+# Возможные имена переменных GRIB для каждого столбца погодной таблицы
+WEATHER_VAR_ALIASES = {
+    # Температура на 2м
+    'temp_c': ['t2m', '2t', '2m_temperature', 'temperature_2m'],
+    # Компоненты ветра на 10м
+    'wind_u': ['u10', '10u', '10m_u_component_of_wind', 'u_component_of_wind_10m'],
+    'wind_v': ['v10', '10v', '10m_v_component_of_wind', 'v_component_of_wind_10m'],
+    # Порывы ветра
+    'wind_gust': ['i10fg', '10fg', 'instantaneous_10m_wind_gust', 'wind_gust_10m'],
+    # Осадки
+    'precip': ['tp', 'total_precipitation', 'precipitation'],
+    # Облачность
+    'cloud_cover': ['tcc', 'total_cloud_cover', 'cloud_cover'],
+}
+
+
+def resolve_weather_vars(ds: xr.Dataset) -> Dict[str, Optional[str]]:
+    """Находит в датасете переменные GRIB для каждого погодного столбца."""
+    var_map = {}
+    for column, aliases in WEATHER_VAR_ALIASES.items():
+        var_map[column] = None
+        for v in aliases:
             if v in ds.data_vars:
-                gust_var = v
+                var_map[column] = v
                 break
+    return var_map
 
-        # Осадки
-        precip_vars = ['tp', 'total_precipitation', 'precipitation']
-        precip_var = None
-        for v in precip_vars:
-            if v in ds.data_vars:
-                precip_var = v
-                break
 
-        # Облачность
-        cloud_vars = ['tcc', 'total_cloud_cover', 'cloud_cover']
-        cloud_var = None
-        for v in cloud_vars:
-            if v in ds.data_vars:
-                cloud_var = v
-                break
+def resolve_grid_coords(ds: xr.Dataset) -> Tuple[str, str, str]:
+    """Определяет имена координат времени, широты и долготы."""
+    time_coord = None
+    lat_coord = None
+    lon_coord = None
+
+    for coord in ['time', 'valid_time', 't']:
+        if coord in ds.coords:
+            time_coord = coord
+            break
+
+    for coord in ['latitude', 'lat']:
+        if coord in ds.coords:
+            lat_coord = coord
+            break
+
+    for coord in ['longitude', 'lon']:
+        if coord in ds.coords:
+            lon_coord = coord
+            break
+
+    if time_coord is None or lat_coord is None or lon_coord is None:
+        raise ValueError("Не найдены необходимые координаты в GRIB файле")
+
+    return time_coord, lat_coord, lon_coord
+
+
+def _grid_values(da: xr.DataArray, dims: Tuple[str, str, str]) -> np.ndarray:
+    """Возвращает значения переменной как плоский массив в порядке (время, широта, долгота)."""
+    # Лишние измерения размера 1 (step, number, surface) убираем
+    extra_dims = [d for d in da.dims if d not in dims]
+    if extra_dims:
+        da = da.squeeze(extra_dims, drop=True)
+    return np.asarray(da.transpose(*dims).values, dtype=np.float64).ravel()
+
+
+def extract_weather_table(ds: xr.Dataset, var_map: Dict[str, Optional[str]],
+                          time_coord: str, lat_coord: str, lon_coord: str) -> pd.DataFrame:
+    """Векторно превращает массивы переменных GRIB в столбцы погодной таблицы.
+
+    Каждая переменная декодируется один раз целиком, единицы измерения
+    пересчитываются поэлементно по тем же правилам, что и раньше.
+    """
+    dims = (time_coord, lat_coord, lon_coord)
+    times = pd.to_datetime(ds[time_coord].values)
+    lats = np.asarray(ds[lat_coord].values, dtype=np.float64)
+    lons = np.asarray(ds[lon_coord].values, dtype=np.float64)
+    n_times, n_lats, n_lons = len(times), len(lats), len(lons)
+
+    # Координаты сетки в порядке (время, широта, долгота)
+    columns = {
+        'timestamp': np.repeat(times.values, n_lats * n_lons),
+        'lat': np.tile(np.repeat(lats, n_lons), n_times),
+        'lon': np.tile(lons, n_times * n_lats),
+    }
+
+    # Температура (конвертируем из Кельвинов в Цельсии, если нужно)
+    if var_map.get('temp_c'):
+        temp = _grid_values(ds[var_map['temp_c']], dims)
+        columns['temp_c'] = np.where(temp > 200, temp - 273.15, temp)
+
+    # Компоненты ветра
+    if var_map.get('wind_u'):
+        columns['wind_u'] = _grid_values(ds[var_map['wind_u']], dims)
+    if var_map.get('wind_v'):
+        columns['wind_v'] = _grid_values(ds[var_map['wind_v']], dims)
+
+    # Порывы ветра
+    if var_map.get('wind_gust'):
+        columns['wind_gust'] = _grid_values(ds[var_map['wind_gust']], dims)
+
+    # Осадки (конвертируем из м в мм/ч, если нужно)
+    if var_map.get('precip'):
+        precip = _grid_values(ds[var_map['precip']], dims)
+        columns['precip'] = np.where(precip < 0.1, precip * 1000, precip)
+
+    # Облачность (нормализуем до 0-100%, если нужно)
+    if var_map.get('cloud_cover'):
+        cloud = _grid_values(ds[var_map['cloud_cover']], dims)
+        columns['cloud_cover'] = np.where(cloud <= 1.0, cloud * 100, cloud)
+
+    return pd.DataFrame(columns)
+
+
+def _merge_hypercubes(datasets: List[xr.Dataset]) -> xr.Dataset:
+    """Объединяет гиперкубы cfgrib в один датасет.
+
+    Скалярные координаты уровня у гиперкубов разные (heightAboveGround 2 м
+    у t2m и 10 м у u10 / v10), compat='override' берёт первую из них.
+    """
+    import xarray as xr
+
+    if len(datasets) == 0:
+        raise ValueError("Не удалось открыть GRIB файл")
+    return datasets[0] if len(datasets) == 1 else xr.merge(datasets, compat='override')
+
+
+def open_grib_dataset(grib_path: str) -> xr.Dataset:
+    """Открывает GRIB файл, обходя конфликт редакций GRIB1/GRIB2.
+
+    Если в открытом гиперкубе нет части погодных переменных (они лежат на
+    другом уровне), файл открывается через cfgrib.open_datasets и
+    гиперкубы объединяются.
+    """
+    import cfgrib
+    import xarray as xr
+
+    hypercubes = False
+    # Обрабатываем ошибку "multiple values for key 'edition'"
+    # которая возникает когда файл содержит сообщения разных редакций GRIB
+    try:
+        # Пробуем открыть с фильтром по edition=2 (GRIB2)
+        ds = xr.open_dataset(grib_path, engine='cfgrib',
+                            backend_kwargs={'filter_by_keys': {'edition': 2}})
+    except (ValueError, KeyError) as e:
+        if 'multiple values' in str(e) or 'edition' in str(e).lower():
+            print("Обнаружены сообщения разных редакций GRIB. Используем open_datasets...")
+            # Используем open_datasets для обработки всех сообщений
+            ds = _merge_hypercubes(cfgrib.open_datasets(grib_path))
+            hypercubes = True
+        else:
+            # Если это другая ошибка, пробуем открыть без фильтров
+            try:
+                ds = xr.open_dataset(grib_path, engine='cfgrib')
+            except (ValueError, KeyError) as e2:
+                if 'multiple values' in str(e2) or 'edition' in str(e2).lower():
+                    # Последняя попытка - используем open_datasets
+                    ds = _merge_hypercubes(cfgrib.open_datasets(grib_path))
+                    hypercubes = True
+                else:
+                    raise e2
+
+    # open_dataset отдаёт один гиперкуб: переменные другого уровня (u10 / v10
+    # на 10 м рядом с t2m на 2 м) в него не попадают. open_datasets уже собрал
+    # все гиперкубы, тогда повторно файл не открываем.
+    if not hypercubes:
+        found = sum(name is not None for name in resolve_weather_vars(ds).values())
+        if found < len(WEATHER_VAR_ALIASES):
+            merged = _merge_hypercubes(cfgrib.open_datasets(grib_path))
+            if sum(name is not None for name in resolve_weather_vars(merged).values()) > found:
+                ds = merged
+    return ds
+
+
+def open_grib_hypercubes(grib_path: str) -> xr.Dataset:
+    """Открывает GRIB по одному индексу сообщений, без цепочки повторных открытий.
+
+    cfgrib.open_datasets индексирует файл один раз и сам разбивает сообщения
+    на гиперкубы по конфликтующим ключам (редакция, тип и высота уровня, тип
+    шага). Из них берутся только гиперкубы с погодными переменными и
+    объединяются в один датасет. Используется при пакетной загрузке архива
+    (grib_ingest.py).
+    """
+    import cfgrib
+
+    aliases = {name for names in WEATHER_VAR_ALIASES.values() for name in names}
+    datasets = [ds for ds in cfgrib.open_datasets(grib_path) if aliases & set(ds.data_vars)]
+    if not datasets:
+        raise ValueError(f"В GRIB файле {grib_path} нет погодных переменных")
+    return _merge_hypercubes(datasets)
+
+
+def finalize_weather_table(weather_df: pd.DataFrame) -> pd.DataFrame:
+    """Добавляет производные столбцы ветра и заполняет пропуски."""
+    # Вычисляем скорость ветра
+    if 'wind_u' in weather_df.columns and 'wind_v' in weather_df.columns:
+        weather_df['wind_speed'] = np.sqrt(weather_df['wind_u']**2 + weather_df['wind_v']**2)
+
+    # Если порывы не найдены, оцениваем их
+    if 'wind_gust' not in weather_df.columns and 'wind_speed' in weather_df.columns:
+        weather_df['wind_gust'] = weather_df['wind_speed'] * 1.3
+
+    # Заполняем пропуски
+    return weather_df.fillna(0)
+
+
+def _print_grib_summary(ds: xr.Dataset, var_map: Dict[str, Optional[str]]):
+    """Печатает состав GRIB датасета и найденные переменные."""
+    print("\nДоступные переменные в GRIB файле:")
+    print(list(ds.data_vars.keys()))
+    print("\nКоординаты:")
+    print(list(ds.coords.keys()))
+    print("\nРазмеры:")
+    print(dict(ds.sizes))
+
+    print(f"\nНайденные переменные:")
+    print(f"  Температура: {var_map['temp_c']}")
+    print(f"  Ветер U: {var_map['wind_u']}")
+    print(f"  Ветер V: {var_map['wind_v']}")
+    print(f"  Порывы: {var_map['wind_gust']}")
+    print(f"  Осадки: {var_map['precip']}")
+    print(f"  Облачность: {var_map['cloud_cover']}")
+
+
+def iter_weather_chunks(ds: xr.Dataset, var_map: Dict[str, Optional[str]],
+                        time_coord: str, lat_coord: str, lon_coord: str,
+                        chunk_size: int = 24):
+    """Отдаёт погодную таблицу кусками по chunk_size шагов времени.
+
+    Переменные cfgrib читаются лениво, поэтому в память декодируется
+    только текущий временной срез.
+    """
+    n_times = ds.sizes[time_coord]
+    for start in range(0, n_times, chunk_size):
+        slab = ds.isel({time_coord: slice(start, start + chunk_size)})
+        yield finalize_weather_table(
+            extract_weather_table(slab, var_map, time_coord, lat_coord, lon_coord)
+        )
+
+
+def stream_grib_to_weather_csv(grib_path: str = "data/data.grib",
+                               output_path: str = "data/weather.csv",
+                               chunk_size: int = 24,
+                               store_dir: Optional[str] = None) -> Dict[str, float]:
+    """Потоково конвертирует GRIB в CSV кусками по времени с ограниченной памятью.
+
+    Если задан store_dir, каждый кусок также дописывается в колоночное
+    Parquet-хранилище.
+    """
+    from weather_store import write_weather_store
+
+    print("ШАГ 2: Потоковая конвертация GRIB файла в CSV")
+    print(f"\nЧтение GRIB файла: {grib_path} (кусками по {chunk_size} шагов времени)")
+
+    ds = open_grib_dataset(grib_path)
+    var_map = resolve_weather_vars(ds)
+    _print_grib_summary(ds, var_map)
+    time_coord, lat_coord, lon_coord = resolve_grid_coords(ds)
+
+    total_rows = 0
+    started = chunk_started = time.perf_counter()
+    chunks = iter_weather_chunks(ds, var_map, time_coord, lat_coord, lon_coord, chunk_size)
+    for i, chunk_df in enumerate(chunks):
+        # Первый кусок перезаписывает файл вместе с заголовком, остальные дописываются
+        chunk_df.to_csv(output_path, mode='w' if i == 0 else 'a',
+                        header=(i == 0), index=False)
+        if store_dir:
+            write_weather_store(chunk_df, store_dir, overwrite=(i == 0))
+        total_rows += len(chunk_df)
+        # Время куска включает декодирование среза и запись
+        elapsed = time.perf_counter() - chunk_started
+        rows_per_sec = len(chunk_df) / elapsed if elapsed > 0 else float('inf')
+        print(f"  Кусок {i + 1}: {len(chunk_df)} строк, "
+              f"{rows_per_sec:,.0f} строк/с, пиковая память {peak_rss_mb():.1f} МБ")
+        chunk_started = time.perf_counter()
+
+    total_time = time.perf_counter() - started
+    print(f"\nЗаписано {total_rows} строк в {output_path} за {total_time:.1f} с")
+
+    return {'rows': total_rows, 'seconds': total_time, 'peak_rss_mb': peak_rss_mb()}
+
+
+def grib_to_weather_table(grib_path: str) -> Tuple[pd.DataFrame, Dict[str, Optional[str]]]:
+    """Декодирует GRIB файл в погодную таблицу в памяти; возвращает (таблица, var_map)."""
+    print(f"\nЧтение GRIB файла: {grib_path}")
+
+    # Открываем GRIB файл
+    ds = open_grib_dataset(grib_path)
+
+    # Определяем нужные переменные и координаты
+    var_map = resolve_weather_vars(ds)
+    _print_grib_summary(ds, var_map)
+    time_coord, lat_coord, lon_coord = resolve_grid_coords(ds)
+
+    # Извлекаем данные целыми массивами, без обхода ячеек в Python
+    weather_df = extract_weather_table(ds, var_map, time_coord, lat_coord, lon_coord)
+    return finalize_weather_table(weather_df), var_map
 
-        print(f"\nНайденные переменные:")
-        print(f"  Температура: {temp_var}")
-        print(f"  Ветер U: {u_var}")
-        print(f"  Ветер V: {v_var}")
-        print(f"  Порывы: {gust_var}")
-        print(f"  Осадки: {precip_var}")
-        print(f"  Облачность: {cloud_var}")
-
-        # Извлекаем данные
-        data_list = []
-
-        # Определяем координаты времени, широты, долготы
-        time_coord = None
-        lat_coord = None
-        lon_coord = None
-
-        for coord in ['time', 'valid_time', 't']:
-            if coord in ds.coords:
-                time_coord = coord
-                break
 
-        for coord in ['latitude', 'lat']:
-            if coord in ds.coords:
-                lat_coord = coord
-                break
+def convert_grib_to_weather_csv(grib_path: str = "data/data.grib",
+                                 output_path: str = "data/weather.csv",
+                                 store_dir: Optional[str] = None,
+                                 cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """Конвертирует GRIB файл в CSV с погодными данными.
+
+    Если задан store_dir, таблица также сохраняется в колоночное
+    Parquet-хранилище (см. weather_store.py). Если задан cache_dir,
+    неизменённый GRIB файл повторно не декодируется (см. conversion_cache.py).
+    """
+    from conversion_cache import cache_key, load_cached_weather, save_cached_weather
+    from weather_store import write_weather_store
 
-        for coord in ['longitude', 'lon']:
-            if coord in ds.coords:
-                lon_coord = coord
-                break
+    print("ШАГ 2: Конвертация GRIB файла в CSV")
 
-        if time_coord is None or lat_coord is None or lon_coord is None:
-            raise ValueError("Не найдены необходимые координаты в GRIB файле")
-
-        # Преобразуем в DataFrame
-        times = ds[time_coord].values
-        lats = ds[lat_coord].values
-        lons = ds[lon_coord].values
-
-        for t_idx, time_val in enumerate(times):
-            for lat_idx, lat_val in enumerate(lats):
-                for lon_idx, lon_val in enumerate(lons):
-                    row = {
-                        'timestamp': pd.to_datetime(time_val),
-                        'lat': float(lat_val),
-                        'lon': float(lon_val)
-                    }
-
-                    # Температура (конвертируем из Кельвинов в Цельсии, если нужно)
-                    if temp_var:
-                        temp_val = float(ds[temp_var].isel({time_coord: t_idx, lat_coord: lat_idx, lon_coord: lon_idx}).values)
-                        if temp_val > 200:
-                            temp_val = temp_val - 273.15
-                        row['temp_c'] = temp_val
-
-                    # Компоненты ветра
-                    if u_var:
-                        row['wind_u'] = float(ds[u_var].isel({time_coord: t_idx, lat_coord: lat_idx, lon_coord: lon_idx}).values)
-                    if v_var:
-                        row['wind_v'] = float(ds[v_var].isel({time_coord: t_idx, lat_coord: lat_idx, lon_coord: lon_idx}).values)
-
-                    # Порывы ветра
-                    if gust_var:
-                        row['wind_gust'] = float(ds[gust_var].isel({time_coord: t_idx, lat_coord: lat_idx, lon_coord: lon_idx}).values)
-
-                    # Осадки
-                    if precip_var:
-                        precip_val = float(ds[precip_var].isel({time_coord: t_idx, lat_coord: lat_idx, lon_coord: lon_idx}).values)
-                        # Конвертируем из м в мм/ч, если нужно
-                        if precip_val < 0.1:
-                            precip_val = precip_val * 1000
-                        row['precip'] = precip_val
-
-                    # Облачность
-                    if cloud_var:
-                        cloud_val = float(ds[cloud_var].isel({time_coord: t_idx, lat_coord: lat_idx, lon_coord: lon_idx}).values)
-                        # Нормализуем до 0-100%, если нужно
-                        if cloud_val <= 1.0:
-                            cloud_val = cloud_val * 100
-                        row['cloud_cover'] = cloud_val
-
-                    data_list.append(row)
-
-        weather_df = pd.DataFrame(data_list)
-
-        # Вычисляем скорость ветра
-        if 'wind_u' in weather_df.columns and 'wind_v' in weather_df.columns:
-            weather_df['wind_speed'] = np.sqrt(weather_df['wind_u']**2 + weather_df['wind_v']**2)
-
-        # Если порывы не найдены, оцениваем их
-        if 'wind_gust' not in weather_df.columns and 'wind_speed' in weather_df.columns:
-            weather_df['wind_gust'] = weather_df['wind_speed'] * 1.3
-
-        # Заполняем пропуски
-        weather_df = weather_df.fillna(0)
+    try:
+        if cache_dir:
+            key = cache_key(grib_path, WEATHER_VAR_ALIASES, cache_dir)
+            weather_df = load_cached_weather(key, cache_dir)
+            if weather_df is not None:
+                print(f"\nGRIB файл не изменился, загружено из кэша {cache_dir}: {len(weather_df)} строк")
+                # Выходные файлы могли остаться от другого GRIB файла: переписываем всегда
+                weather_df.to_csv(output_path, index=False)
+                if store_dir:
+                    write_weather_store(weather_df, store_dir)
+                return weather_df
+
+        weather_df, var_map = grib_to_weather_table(grib_path)
 
         print(f"\nСоздан DataFrame с {len(weather_df)} строками")
         print(f"\nПервые 5 строк:")
@@ -257,65 +386,36 @@ def convert_grib_to_weather_csv(grib_path: str = "data/data.grib",
         weather_df.to_csv(output_path, index=False)
         print(f"\nДанные сохранены в {output_path}")
 
+        if store_dir:
+            write_weather_store(weather_df, store_dir)
+            print(f"Колоночное хранилище записано в {store_dir}")
+
+        if cache_dir:
+            save_cached_weather(key, grib_path, weather_df, var_map, cache_dir)
+
         return weather_df
 
     except Exception as e:
         print(f"\nОшибка при чтении GRIB файла: {e}")
         print("Генерирую синтетические погодные данные...")
-        return generate_synthetic_weather_data(output_path)
-
-'''
-def generate_synthetic_weather_data(output_path: str = "data/weather.csv") -> pd.DataFrame:
-    """Генерирует синтетические погодные данные для обучения модели."""
-    print("\nГенерация синтетических погодных данных...")
-
-    np.random.seed(42)
-
-    # Генерируем временной ряд (30 дней, каждые 3 часа)
-    dates = pd.date_range('2024-01-01', periods=240, freq='3H')
-
-    # Генерируем координаты (примерно для региона Москвы)
-    lats = np.linspace(55.0, 56.0, 5)  # 5 точек по широте
-    lons = np.linspace(37.0, 38.0, 5)  # 5 точек по долготе
-
-    data_list = []
+        return generate_synthetic_weather_data(output_path, store_dir)
 
-    for date in dates:
-        for lat in lats:
-            for lon in lons:
-                # Температура: сезонная вариация + случайность
-                base_temp = 10 + 15 * np.sin(2 * np.pi * date.dayofyear / 365)
-                temp_c = base_temp + np.random.normal(0, 5)
 
-                # Ветер: базовый + случайные порывы
-                base_wind = 5 + 3 * np.random.random()
-                wind_u = base_wind * np.cos(np.random.uniform(0, 2*np.pi))
-                wind_v = base_wind * np.sin(np.random.uniform(0, 2*np.pi))
-                wind_speed = np.sqrt(wind_u**2 + wind_v**2)
+def generate_synthetic_weather_data(output_path: str = "data/weather.csv",
+                                    store_dir: Optional[str] = None,
+                                    seed: int = 42) -> pd.DataFrame:
+    """Генерирует синтетические погодные данные для обучения модели.
 
-                # Порывы ветра (обычно на 30% выше скорости ветра)
-                wind_gust = wind_speed * (1.2 + 0.3 * np.random.random())
+    30 дней каждые 3 часа на сетке 5 × 5 в районе Москвы; генератор
+    описан в synthetic_weather.py.
+    """
+    from synthetic_weather import default_synthetic_grid, synthetic_weather_table
+    from weather_store import write_weather_store
 
-                # Осадки (редко, но бывают)
-                precip = 0 if np.random.random() > 0.1 else np.random.exponential(2.0)
-
-                # Облачность (0-100%)
-                cloud_cover = np.random.uniform(0, 100)
-
-                data_list.append({
-                    'timestamp': date,
-                    'lat': lat,
-                    'lon': lon,
-                    'temp_c': temp_c,
-                    'wind_u': wind_u,
-                    'wind_v': wind_v,
-                    'wind_speed': wind_speed,
-                    'wind_gust': wind_gust,
-                    'precip': precip,
-                    'cloud_cover': cloud_cover
-                })
+    print("\nГенерация синтетических погодных данных...")
 
-    weather_df = pd.DataFrame(data_list)
+    times, lats, lons = default_synthetic_grid()
+    weather_df = synthetic_weather_table(times, lats, lons, seed=seed)
 
     print(f"\nСоздан синтетический DataFrame с {len(weather_df)} строками")
     print(f"\nПервые 5 строк:")
@@ -325,8 +425,12 @@ def generate_synthetic_weather_data(output_path: str = "data/weather.csv") -> pd
     weather_df.to_csv(output_path, index=False)
     print(f"\nДанные сохранены в {output_path}")
 
+    if store_dir:
+        write_weather_store(weather_df, store_dir)
+        print(f"Колоночное хранилище записано в {store_dir}")
+
     return weather_df
-'''
+
 
 def calc_wind_penalty(wind_ratio: float) -> float:
     """Вычисляет штраф за скорость ветра."""
@@ -414,10 +518,207 @@ def calc_safety_class(safety_index: float) -> str:
         return "red"
 
 
+# Векторные аналоги штрафных функций. Ветвления повторяют скалярные версии
+# один в один, а min/max — семантику встроенных min/max Python (в том числе
+# для NaN), поэтому на float64 входах результаты совпадают побитово.
+
+def _py_min(a, b) -> np.ndarray:
+    """Поэлементный аналог встроенного min(a, b)."""
+    return np.where(b < a, b, a)
+
+
+def _py_max(a, b) -> np.ndarray:
+    """Поэлементный аналог встроенного max(a, b)."""
+    return np.where(b > a, b, a)
+
+
+def calc_wind_penalty_vec(wind_ratio: np.ndarray) -> np.ndarray:
+    """Векторный аналог calc_wind_penalty."""
+    r = np.asarray(wind_ratio, dtype=np.float64)
+    return np.select(
+        [r <= 0.7, r <= 1.0],
+        [r * 5, 3.5 + (r - 0.7) * 20],
+        3.5 + 6 + (r - 1.0) * 30,
+    )
+
+
+def calc_gust_penalty_vec(gust_ratio: np.ndarray) -> np.ndarray:
+    """Векторный аналог calc_gust_penalty."""
+    g = np.asarray(gust_ratio, dtype=np.float64)
+    return np.select(
+        [g <= 1.0, g <= 1.3],
+        [0.0, (g - 1.0) * 20],
+        6 + (g - 1.3) * 25,
+    )
+
+
+def calc_temp_penalty_vec(temp_below: np.ndarray, temp_above: np.ndarray) -> np.ndarray:
+    """Векторный аналог calc_temp_penalty."""
+    below = np.asarray(temp_below, dtype=np.float64)
+    above = np.asarray(temp_above, dtype=np.float64)
+    return _py_min(below * 1.0 + above * 0.7, 20.0)
+
+
+def calc_precip_penalty_vec(precip: np.ndarray, allow_precip: np.ndarray) -> np.ndarray:
+    """Векторный аналог calc_precip_penalty."""
+    precip = np.asarray(precip, dtype=np.float64)
+    allow = np.asarray(allow_precip, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        excess = _py_max(0.0, precip - allow)
+        return np.select(
+            [(allow == 0) & (precip > 0), allow > 0],
+            [_py_min(precip * 10, 15.0), _py_min(excess * 5, 15.0)],
+            0.0,
+        )
+
+
+def calc_visibility_penalty_vec(vis_km: np.ndarray, min_visibility_km: np.ndarray) -> np.ndarray:
+    """Векторный аналог calc_visibility_penalty."""
+    vis = np.asarray(vis_km, dtype=np.float64)
+    min_vis = np.asarray(min_visibility_km, dtype=np.float64)
+    deficit = min_vis - vis
+    return np.where(vis >= min_vis, 0.0, _py_min(deficit * 5, 10.0))
+
+
+# Столбцы матрицы штрафов calc_penalties_vec в порядке сложения calc_safety_index
+PENALTY_COLUMNS = ['wind', 'gust', 'temp', 'precip', 'visibility']
+
+
+def calc_penalties_vec(df: pd.DataFrame) -> np.ndarray:
+    """Матрица штрафов (строка × PENALTY_COLUMNS) за один колоночный проход.
+
+    df — таблица пар погода × паспорт или словарь столбцов с теми же именами.
+    """
+    col = lambda name: np.asarray(df[name], dtype=np.float64)
+    max_wind = col('max_wind_mps')
+    temp_c = col('temp_c')
+
+    # Вычисляем ratio и дельты
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wind_ratio = np.where(max_wind > 0, col('wind_speed') / max_wind, 0.0)
+        gust_ratio = np.where(max_wind > 0, col('wind_gust') / max_wind, 0.0)
+
+    temp_below = _py_max(0.0, col('temp_min_c') - temp_c)
+    temp_above = _py_max(0.0, temp_c - col('temp_max_c'))
+
+    # Видимость (по умолчанию хорошая, если нет в данных)
+    if 'visibility_km' in df:
+        vis_km = col('visibility_km')
+    else:
+        vis_km = np.full(len(temp_c), 10.0)
+
+    penalties = np.empty((len(temp_c), len(PENALTY_COLUMNS)), dtype=np.float64)
+    penalties[:, 0] = calc_wind_penalty_vec(wind_ratio)
+    penalties[:, 1] = calc_gust_penalty_vec(gust_ratio)
+    penalties[:, 2] = calc_temp_penalty_vec(temp_below, temp_above)
+    penalties[:, 3] = calc_precip_penalty_vec(col('precip'), col('allow_precip_mmph'))
+    penalties[:, 4] = calc_visibility_penalty_vec(vis_km, col('min_visibility_km'))
+    return penalties
+
+
+def calc_safety_index_vec(df: pd.DataFrame) -> np.ndarray:
+    """Вычисляет safety_index для всех строк DataFrame за один колоночный проход.
+
+    Векторный аналог calc_safety_index (эталонной скалярной версии).
+    """
+    return safety_index_from_penalties(calc_penalties_vec(df))
+
+
+def safety_index_from_penalties(p: np.ndarray) -> np.ndarray:
+    """safety_index по матрице штрафов calc_penalties_vec."""
+    # Общий штраф (тот же порядок сложения, что и в скалярной версии)
+    total_penalty = p[:, 0] + p[:, 1] + p[:, 2] + p[:, 3] + p[:, 4]
+
+    # Индекс безопасности (100 - штраф, ограничен [0, 100])
+    return _py_max(0.0, _py_min(100.0, 100 - total_penalty))
+
+
+def calc_safety_class_vec(safety_index: np.ndarray) -> np.ndarray:
+    """Векторный аналог calc_safety_class."""
+    si = np.asarray(safety_index, dtype=np.float64)
+    return np.select([si >= 80, si >= 60], ["green", "yellow"], "red").astype(object)
+
+
+# Столбцы погоды и паспорта дрона, из которых собирается строка датасета
+WEATHER_SAMPLE_COLUMNS = ['timestamp', 'lat', 'lon', 'temp_c', 'wind_u', 'wind_v',
+                          'wind_speed', 'wind_gust', 'precip', 'cloud_cover']
+DRONE_SPEC_COLUMNS = ['max_wind_mps', 'temp_min_c', 'temp_max_c', 'allow_precip_mmph',
+                      'min_visibility_km', 'mtow_kg', 'category', 'weight_kg',
+                      'max_flight_time_min']
+
+
+def sample_drone_weather_pairs(n_drones: int, n_weather: int,
+                               samples_per_drone: Optional[int] = 20,
+                               per_drone_sampling: bool = True,
+                               random_state: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """Возвращает пары индексов (дрон, погода) для построения датасета.
+
+    samples_per_drone=None (или не меньше числа погодных строк) даёт полное
+    декартово произведение. Иначе каждому дрону достаётся выборка без
+    повторов: своя для каждого дрона при per_drone_sampling=True или одна
+    общая на всех при per_drone_sampling=False.
+    """
+    if samples_per_drone is None or samples_per_drone >= n_weather:
+        drone_idx = np.repeat(np.arange(n_drones), n_weather)
+        weather_idx = np.tile(np.arange(n_weather), n_drones)
+        return drone_idx, weather_idx
+
+    rng = np.random.default_rng(random_state)
+    drone_idx = np.repeat(np.arange(n_drones), samples_per_drone)
+    if per_drone_sampling:
+        weather_idx = np.concatenate([
+            rng.choice(n_weather, size=samples_per_drone, replace=False)
+            for _ in range(n_drones)
+        ])
+    else:
+        weather_idx = np.tile(rng.choice(n_weather, size=samples_per_drone, replace=False), n_drones)
+    return drone_idx, weather_idx
+
+
+def engineered_features(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Вычисляет инженерные признаки (отношения к лимитам дрона и превышения)."""
+    col = lambda name: df[name].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'wind_ratio': col('wind_speed') / col('max_wind_mps'),
+            'gust_ratio': col('wind_gust') / col('max_wind_mps'),
+            'temp_below': np.maximum(0, col('temp_min_c') - col('temp_c')),
+            'temp_above': np.maximum(0, col('temp_c') - col('temp_max_c')),
+            'precip_excess': np.maximum(0, col('precip') - col('allow_precip_mmph')),
+        }
+
+
+def add_engineered_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Добавляет инженерные признаки в DataFrame."""
+    for name, values in engineered_features(df).items():
+        df[name] = values
+    return df
+
+
+def gather_pair_columns(drone_specs_df: pd.DataFrame, weather_df: pd.DataFrame,
+                        drone_idx: np.ndarray, weather_idx: np.ndarray) -> pd.DataFrame:
+    """Собирает строки пар дрон × погода по массивам индексов."""
+    columns = {'drone_id': drone_specs_df['drone_id'].to_numpy()[drone_idx]}
+    # Погодные признаки
+    for col in WEATHER_SAMPLE_COLUMNS:
+        columns[col] = weather_df[col].to_numpy()[weather_idx]
+    # Паспортные признаки дрона
+    for col in DRONE_SPEC_COLUMNS:
+        columns[col] = drone_specs_df[col].to_numpy()[drone_idx]
+    return pd.DataFrame(columns)
+
+
 def build_training_dataset(drone_specs_df: pd.DataFrame,
                           weather_df: pd.DataFrame,
-                          n_samples: Optional[int] = None) -> pd.DataFrame:
-    """Создаёт обучающий датасет, объединяя данные дронов и погоды."""
+                          n_samples: Optional[int] = None,
+                          samples_per_drone: Optional[int] = 20,
+                          per_drone_sampling: bool = True,
+                          random_state: int = 42) -> pd.DataFrame:
+    """Создаёт обучающий датасет, объединяя данные дронов и погоды.
+
+    Комбинации дрон × погода собираются сборкой столбцов по массивам
+    индексов (см. sample_drone_weather_pairs), без обхода строк в Python.
+    """
     print("ШАГ 3: Создание обучающего датасета")
 
     # Если указано количество сэмплов, ограничиваем погодные данные
@@ -425,61 +726,28 @@ def build_training_dataset(drone_specs_df: pd.DataFrame,
         weather_df = weather_df.sample(n=n_samples, random_state=42)
 
     # Создаём комбинации дронов и погодных условий
-    training_data = []
-
-    # Для каждого дрона создаём записи с разными погодными условиями
-    for _, drone_row in drone_specs_df.iterrows():
-        # Берём случайную выборку погодных условий
-        n_weather_samples = min(20, len(weather_df))  # До 20 записей на дрон
-        weather_sample = weather_df.sample(n=n_weather_samples, random_state=42)
-
-        for _, weather_row in weather_sample.iterrows():
-            combined_row = {
-                'drone_id': drone_row['drone_id'],
-                'timestamp': weather_row['timestamp'],
-                'lat': weather_row['lat'],
-                'lon': weather_row['lon'],
-                # Погодные признаки
-                'temp_c': weather_row['temp_c'],
-                'wind_u': weather_row['wind_u'],
-                'wind_v': weather_row['wind_v'],
-                'wind_speed': weather_row['wind_speed'],
-                'wind_gust': weather_row['wind_gust'],
-                'precip': weather_row['precip'],
-                'cloud_cover': weather_row['cloud_cover'],
-                # Паспортные признаки дрона
-                'max_wind_mps': drone_row['max_wind_mps'],
-                'temp_min_c': drone_row['temp_min_c'],
-                'temp_max_c': drone_row['temp_max_c'],
-                'allow_precip_mmph': drone_row['allow_precip_mmph'],
-                'min_visibility_km': drone_row['min_visibility_km'],
-                'mtow_kg': drone_row['mtow_kg'],
-                'category': drone_row['category'],
-                'weight_kg': drone_row['weight_kg'],
-                'max_flight_time_min': drone_row['max_flight_time_min']
-            }
-            training_data.append(combined_row)
-
-    train_df = pd.DataFrame(training_data)
+    drone_idx, weather_idx = sample_drone_weather_pairs(
+        len(drone_specs_df), len(weather_df),
+        samples_per_drone=samples_per_drone,
+        per_drone_sampling=per_drone_sampling,
+        random_state=random_state,
+    )
+
+    train_df = gather_pair_columns(drone_specs_df, weather_df, drone_idx, weather_idx)
 
     print(f"\nСоздан обучающий датасет: {len(train_df)} строк")
 
     # Вычисляем дополнительные инженерные признаки
     print("\nВычисление инженерных признаков...")
-
-    train_df['wind_ratio'] = train_df['wind_speed'] / train_df['max_wind_mps']
-    train_df['gust_ratio'] = train_df['wind_gust'] / train_df['max_wind_mps']
-    train_df['temp_below'] = np.maximum(0, train_df['temp_min_c'] - train_df['temp_c'])
-    train_df['temp_above'] = np.maximum(0, train_df['temp_c'] - train_df['temp_max_c'])
-    train_df['precip_excess'] = np.maximum(0, train_df['precip'] - train_df['allow_precip_mmph'])
+    add_engineered_features(train_df)
 
     np.random.seed(42)
     train_df['visibility_km'] = np.random.uniform(0.5, 15.0, len(train_df))
 
     # Вычисляем safety_index и safety_class
     print("\nВычисление safety_index и safety_class...")
-    train_df['safety_index'] = train_df.apply(calc_safety_index, axis=1)
-    train_df['safety_class'] = train_df['safety_index'].apply(calc_safety_class)
+    train_df['safety_index'] = calc_safety_index_vec(train_df)
+    train_df['safety_class'] = calc_safety_class_vec(train_df['safety_index'].to_numpy())
 
     print(f"\nРаспределение safety_class:")
     print(train_df['safety_class'].value_counts())
@@ -490,29 +758,106 @@ def build_training_dataset(drone_specs_df: pd.DataFrame,
     return train_df
 
 
-def train_xgboost_model(train_df: pd.DataFrame) -> Tuple:
-    """Обучает XGBoost модель для предсказания safety_index."""
+# Признаки модели в порядке столбцов матрицы; за ними идут столбцы category_*
+BASE_FEATURE_COLUMNS = [
+    # Погодные признаки
+    'temp_c', 'wind_speed', 'wind_gust', 'precip', 'cloud_cover',
+    # Паспортные признаки
+    'max_wind_mps', 'temp_min_c', 'temp_max_c', 'allow_precip_mmph',
+    'min_visibility_km', 'mtow_kg', 'weight_kg', 'max_flight_time_min',
+    # Инженерные признаки
+    'wind_ratio', 'gust_ratio', 'temp_below', 'temp_above', 'precip_excess',
+    'visibility_km'
+]
+
+
+def category_feature_columns(categories) -> list:
+    """Возвращает имена one-hot столбцов категорий в порядке pd.get_dummies."""
+    return [f"category_{c}" for c in sorted(pd.unique(pd.Series(categories).dropna()))]
+
+
+def build_feature_matrix(df: pd.DataFrame, feature_cols: list) -> np.ndarray:
+    """Собирает float32 матрицу признаков в заданном порядке столбцов.
+
+    Инженерные признаки вычисляются, если их нет в df. Категории вне списка
+    feature_cols дают нулевой one-hot вектор; видимость по умолчанию 10 км,
+    как в calc_safety_index. Пропуски заполняются нулями.
+    """
+    X = np.empty((len(df), len(feature_cols)), dtype=np.float32)
+    engineered = None
+    for j, col in enumerate(feature_cols):
+        if col.startswith('category_'):
+            X[:, j] = df['category'].to_numpy() == col[len('category_'):]
+        elif col in df.columns:
+            X[:, j] = df[col].to_numpy()
+        elif col == 'visibility_km':
+            X[:, j] = 10.0
+        else:
+            if engineered is None:
+                engineered = engineered_features(df)
+            X[:, j] = engineered[col]
+    X[np.isnan(X)] = 0
+    return X
+
+
+def build_feature_frame(df: pd.DataFrame, feature_cols: list) -> pd.DataFrame:
+    """Собирает матрицу признаков как DataFrame с именами столбцов (для обучения)."""
+    return pd.DataFrame(build_feature_matrix(df, feature_cols), columns=feature_cols, index=df.index)
+
+
+def save_model_artifact(model, feature_cols: list, model_dir: str = "models",
+                        model_format: str = "json") -> str:
+    """Сохраняет бустер XGBoost и манифест схемы признаков.
+
+    model_format: 'json' или 'ubj' (бинарный формат XGBoost).
+    Возвращает путь к файлу модели.
+    """
+    import xgboost as xgb
+
+    os.makedirs(model_dir, exist_ok=True)
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    model_path = os.path.join(model_dir, f"safety_model.{model_format}")
+    booster.save_model(model_path)
+
+    schema = {
+        'model_file': os.path.basename(model_path),
+        'feature_cols': list(feature_cols),
+        'categories': [c[len('category_'):] for c in feature_cols if c.startswith('category_')],
+        'target': 'safety_index',
+        'xgboost_version': xgb.__version__,
+    }
+    with open(os.path.join(model_dir, "feature_schema.json"), 'w', encoding='utf-8') as f:
+        json.dump(schema, f, ensure_ascii=False, indent=2)
+
+    print(f"\nМодель сохранена в {model_path}")
+    return model_path
+
+
+# Гиперпараметры XGBoost (общие для полного обучения и дообучения)
+XGB_PARAMS = {
+    'objective': 'reg:squarederror',
+    'n_estimators': 100,
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'random_state': 42,
+    'n_jobs': -1,
+}
+
+
+def train_xgboost_model(train_df: pd.DataFrame, params: Optional[Dict] = None) -> Tuple:
+    """Обучает XGBoost модель для предсказания safety_index.
+
+    params переопределяют XGB_PARAMS (например, лучшие параметры подбора
+    из hyperparameter_search.py).
+    """
+    import xgboost as xgb
+    from sklearn.model_selection import train_test_split
+
     print("ШАГ 4: Обучение модели")
 
-    # Подготовка признаков
-    feature_cols = [
-        # Погодные признаки
-        'temp_c', 'wind_speed', 'wind_gust', 'precip', 'cloud_cover',
-        # Паспортные признаки
-        'max_wind_mps', 'temp_min_c', 'temp_max_c', 'allow_precip_mmph',
-        'min_visibility_km', 'mtow_kg', 'weight_kg', 'max_flight_time_min',
-        # Инженерные признаки
-        'wind_ratio', 'gust_ratio', 'temp_below', 'temp_above', 'precip_excess',
-        'visibility_km'
-    ]
-
-    # One-hot кодирование категории
-    category_dummies = pd.get_dummies(train_df['category'], prefix='category')
-    train_df = pd.concat([train_df, category_dummies], axis=1)
-    feature_cols.extend(category_dummies.columns.tolist())
-
-    # Убираем пропуски
-    X = train_df[feature_cols].fillna(0)
+    # Подготовка признаков: базовые + one-hot кодирование категории
+    feature_cols = BASE_FEATURE_COLUMNS + category_feature_columns(train_df['category'])
+    X = build_feature_frame(train_df, feature_cols)
     y = train_df['safety_index']
 
     # Разделение на train/test
@@ -526,14 +871,7 @@ def train_xgboost_model(train_df: pd.DataFrame) -> Tuple:
 
     # Обучение модели
     print("\nОбучение XGBoost модели...")
-    model = xgb.XGBRegressor(
-        objective='reg:squarederror',
-        n_estimators=100,
-        max_depth=6,
-        learning_rate=0.1,
-        random_state=42,
-        n_jobs=-1
-    )
+    model = xgb.XGBRegressor(**{**XGB_PARAMS, **(params or {})})
 
     model.fit(X_train, y_train)
 
@@ -547,6 +885,8 @@ def train_xgboost_model(train_df: pd.DataFrame) -> Tuple:
 def evaluate_model(y_true: np.ndarray, y_pred: np.ndarray,
                    dataset_name: str = "Test") -> Dict[str, float]:
     """Вычисляет метрики качества модели."""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
     mae = mean_absolute_error(y_true, y_pred)
     rmse = np.sqrt(mean_squared_error(y_true, y_pred))
     r2 = r2_score(y_true, y_pred)
@@ -591,7 +931,7 @@ def print_final_report(train_df: pd.DataFrame, model, X_test: pd.DataFrame,
     print(sample_df[display_cols].to_string(index=False))
 
     # 4. Важные признаки
-    if HAS_XGBOOST and hasattr(model, 'feature_importances_'):
+    if hasattr(model, 'feature_importances_'):
         print("\n4. ТОП-10 ВАЖНЫХ ПРИЗНАКОВ:")
         importances = model.feature_importances_
         feature_importance = list(zip(feature_cols, importances))
@@ -599,32 +939,45 @@ def print_final_report(train_df: pd.DataFrame, model, X_test: pd.DataFrame,
 
         for i, (feat, imp) in enumerate(feature_importance[:10], 1):
             print(f"   {i:2d}. {feat:30s} {imp:.4f}")
-    elif hasattr(model, 'feature_importances_'):
-        print("\n4. ТОП-10 ВАЖНЫХ ПРИЗНАКОВ:")
-        importances = model.feature_importances_
-        feature_importance = list(zip(feature_cols, importances))
-        feature_importance.sort(key=lambda x: x[1], reverse=True)
 
-        for i, (feat, imp) in enumerate(feature_importance[:10], 1):
-            print(f"   {i:2d}. {feat:30s} {imp:.4f}")
 
+def main(report_path: str = "reports/run_report.json",
+         profile_stage: Optional[str] = None,
+         profile_format: str = 'cprofile'):
+    """Основная функция для запуска всего пайплайна.
+
+    Каждый этап замеряется (время, CPU, пиковая память, строк/с), отчёт
+    запуска сохраняется в report_path. profile_stage — имя этапа
+    (specs, convert, build, train, evaluate) для профилирования.
+    """
+    from sklearn.model_selection import train_test_split
 
-def main():
-    """Основная функция для запуска всего пайплайна."""
     print("ОБУЧЕНИЕ МОДЕЛИ БЕЗОПАСНОСТИ ПОЛЁТА ДРОНОВ")
+    run = RunReport(profile_stage=profile_stage, profile_format=profile_format,
+                    profile_dir=os.path.dirname(report_path) or ".")
 
     # Шаг 1: Загрузка данных о дронах
-    drone_specs_df = load_drone_specs("data/drone_specs.csv")
+    with run.stage('specs') as stage:
+        drone_specs_df = load_drone_specs("data/drone_specs.csv")
+        stage.rows = len(drone_specs_df)
 
     # Шаг 2: Конвертация GRIB в CSV
-    weather_df = convert_grib_to_weather_csv("data/data.grib", "data/weather.csv")
+    with run.stage('convert') as stage:
+        weather_df = convert_grib_to_weather_csv("data/data.grib", "data/weather.csv",
+                                                 store_dir="data/weather_store",
+                                                 cache_dir="data/cache")
+        stage.rows = len(weather_df)
 
     # Шаг 3: Создание обучающего датасета
-    train_df = build_training_dataset(drone_specs_df, weather_df, n_samples=1000)
+    with run.stage('build') as stage:
+        train_df = build_training_dataset(drone_specs_df, weather_df, n_samples=1000)
+        stage.rows = len(train_df)
 
     # Шаг 4: Обучение модели
-    model, X_train, X_test, y_train, y_test, y_train_pred, y_test_pred, feature_cols = \
-        train_xgboost_model(train_df)
+    with run.stage('train') as stage:
+        model, X_train, X_test, y_train, y_test, y_train_pred, y_test_pred, feature_cols = \
+            train_xgboost_model(train_df)
+        stage.rows = len(X_train)
 
     # Получаем индексы тестовой выборки для отчёта
     _, X_test_idx, _, _ = train_test_split(
@@ -633,15 +986,39 @@ def main():
     )
 
     # Шаг 5: Оценка модели
-    print("ШАГ 5: Оценка модели")
-    train_metrics = evaluate_model(y_train, y_train_pred, "Train")
-    test_metrics = evaluate_model(y_test, y_test_pred, "Test")
+    with run.stage('evaluate') as stage:
+        print("ШАГ 5: Оценка модели")
+        train_metrics = evaluate_model(y_train, y_train_pred, "Train")
+        test_metrics = evaluate_model(y_test, y_test_pred, "Test")
+        stage.rows = len(y_train) + len(y_test)
 
     # Шаг 6: Финальный отчёт
     print_final_report(train_df, model, X_test, y_test, y_test_pred, feature_cols, X_test_idx)
 
+    # Шаг 7: Сохранение модели и схемы признаков
+    with run.stage('save'):
+        save_model_artifact(model, feature_cols, "models")
+
+    run.print_summary()
+    run.write(report_path)
+
     print("ОБУЧЕНИЕ ЗАВЕРШЕНО")
 
 
+def cli_main(argv: Optional[List[str]] = None):
+    """Запуск пайплайна из командной строки."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Обучение модели безопасности полёта дронов")
+    parser.add_argument('--report', default="reports/run_report.json",
+                        help="путь JSON отчёта запуска")
+    parser.add_argument('--profile-stage', default=None,
+                        choices=['specs', 'convert', 'build', 'train', 'evaluate', 'save'],
+                        help="этап для профилирования")
+    parser.add_argument('--profile-format', default='cprofile', choices=['cprofile', 'pyinstrument'])
+    args = parser.parse_args(argv)
+    main(args.report, args.profile_stage, args.profile_format)
+
+
 if __name__ == "__main__":
-    main()
+    cli_main()
@@ -0,0 +1,210 @@
+"""
+Индекс погодных данных для поиска по (lat, lon, t) без сканирования таблицы.
+
+Плоская погодная таблица раскладывается в плотный массив
+(переменная, время, широта, долгота). Сетка ERA5 регулярная, поэтому
+широта и долгота переводятся в смещения массива арифметикой за O(1);
+для нерегулярной оси используется бинарный поиск (O(log n)). Все запросы
+принимают массивы точек, так что маршрут из тысячи точек — это одна
+векторная операция, а не тысяча фильтров DataFrame.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Погодные переменные, которые попадают в индекс (если есть в таблице)
+INDEX_VARIABLES = ['temp_c', 'wind_u', 'wind_v', 'wind_speed', 'wind_gust',
+                   'precip', 'cloud_cover']
+
+
+def utc_naive(timestamp) -> pd.Timestamp:
+    """Момент на оси времени сетки (наивное UTC); время без зоны считается UTC."""
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp
+
+
+def _regular_step(axis: np.ndarray) -> Optional[float]:
+    """Возвращает шаг оси, если он постоянный, иначе None."""
+    if len(axis) < 2:
+        return None
+    steps = np.diff(axis)
+    if np.allclose(steps, steps[0], rtol=1e-6, atol=0):
+        return float(steps[0])
+    return None
+
+
+def _fractional_position(axis: np.ndarray, step: Optional[float],
+                         values: np.ndarray) -> np.ndarray:
+    """Переводит значения в дробные индексы оси, зажатые в её границы."""
+    if len(axis) == 1:
+        return np.zeros(len(values))
+    if step is not None:
+        pos = (values - axis[0]) / step
+    else:
+        right = np.clip(np.searchsorted(axis, values), 1, len(axis) - 1)
+        left = right - 1
+        pos = left + (values - axis[left]) / (axis[right] - axis[left])
+    return np.clip(pos, 0, len(axis) - 1)
+
+
+class WeatherGridIndex:
+    """Плотный массив погоды с поиском ближайшего узла и билинейной интерполяцией."""
+
+    def __init__(self, times: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                 cube: np.ndarray, variables: List[str]):
+        self.times = times.astype('datetime64[ns]')
+        self.lats = lats
+        self.lons = lons
+        # cube[v, t, i, j] — значение переменной variables[v]
+        self.cube = cube
+        self.variables = variables
+        self._var_pos = {name: k for k, name in enumerate(variables)}
+
+        self._t_axis = self.times.astype(np.int64).astype(np.float64)
+        self._t_step = _regular_step(self._t_axis)
+        self._lat_step = _regular_step(lats)
+        self._lon_step = _regular_step(lons)
+
+    @classmethod
+    def from_weather_df(cls, weather_df: pd.DataFrame) -> "WeatherGridIndex":
+        """Строит индекс из плоской погодной таблицы (timestamp, lat, lon, переменные)."""
+        times_col = pd.to_datetime(weather_df['timestamp']).to_numpy(dtype='datetime64[ns]')
+        lat_col = weather_df['lat'].to_numpy(dtype=np.float64)
+        lon_col = weather_df['lon'].to_numpy(dtype=np.float64)
+
+        times, t_idx = np.unique(times_col, return_inverse=True)
+        lats, lat_idx = np.unique(lat_col, return_inverse=True)
+        lons, lon_idx = np.unique(lon_col, return_inverse=True)
+
+        variables = [v for v in INDEX_VARIABLES if v in weather_df.columns]
+        cube = np.full((len(variables), len(times), len(lats), len(lons)), np.nan, dtype=np.float32)
+        for k, name in enumerate(variables):
+            cube[k, t_idx, lat_idx, lon_idx] = weather_df[name].to_numpy()
+
+        return cls(times, lats, lons, cube, variables)
+
+    @classmethod
+    def from_store(cls, store_dir: str, start: Optional[str] = None,
+                   end: Optional[str] = None, bbox=None) -> "WeatherGridIndex":
+        """Строит индекс по срезу колоночного хранилища погоды."""
+        from weather_store import read_weather_store
+        return cls.from_weather_df(read_weather_store(store_dir, start=start, end=end, bbox=bbox))
+
+    @property
+    def shape(self):
+        """Размер сетки (время, широта, долгота)."""
+        return self.cube.shape[1:]
+
+    def _positions(self, lats, lons, times):
+        """Дробные индексы точек по осям времени, широты и долготы."""
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        times = np.atleast_1d(np.asarray(times, dtype='datetime64[ns]'))
+        lats, lons, times = np.broadcast_arrays(lats, lons, times)
+        t_pos = _fractional_position(self._t_axis, self._t_step,
+                                     times.astype(np.int64).astype(np.float64))
+        lat_pos = _fractional_position(self.lats, self._lat_step, lats)
+        lon_pos = _fractional_position(self.lons, self._lon_step, lons)
+        return t_pos, lat_pos, lon_pos
+
+    def nearest_indices(self, lats, lons, times):
+        """Индексы (t, i, j) ближайшего узла сетки для каждой точки."""
+        t_pos, lat_pos, lon_pos = self._positions(lats, lons, times)
+        return (np.rint(t_pos).astype(np.intp),
+                np.rint(lat_pos).astype(np.intp),
+                np.rint(lon_pos).astype(np.intp))
+
+    def nearest(self, lats, lons, times,
+                variables: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Погода в ближайшем узле сетки и ближайший момент времени для массива точек."""
+        t, i, j = self.nearest_indices(lats, lons, times)
+        variables = variables or self.variables
+        return {name: self.cube[self._var_pos[name], t, i, j] for name in variables}
+
+    def bilinear(self, lats, lons, times, interpolate_time: bool = True,
+                 variables: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Билинейная интерполяция по широте и долготе (и линейная по времени) для массива точек."""
+        t_pos, lat_pos, lon_pos = self._positions(lats, lons, times)
+        variables = variables or self.variables
+
+        def corners(pos, size):
+            lo = np.minimum(np.floor(pos).astype(np.intp), max(size - 2, 0))
+            hi = np.minimum(lo + 1, size - 1)
+            return lo, hi, pos - lo
+
+        n_t, n_lat, n_lon = self.shape
+        i0, i1, wi = corners(lat_pos, n_lat)
+        j0, j1, wj = corners(lon_pos, n_lon)
+        if interpolate_time:
+            t0, t1, wt = corners(t_pos, n_t)
+        else:
+            t0 = t1 = np.rint(t_pos).astype(np.intp)
+            wt = np.zeros_like(t_pos)
+
+        result = {}
+        for name in variables:
+            grid = self.cube[self._var_pos[name]]
+
+            def plane(t):
+                top = grid[t, i0, j0] * (1 - wj) + grid[t, i0, j1] * wj
+                bottom = grid[t, i1, j0] * (1 - wj) + grid[t, i1, j1] * wj
+                return top * (1 - wi) + bottom * wi
+
+            result[name] = plane(t0) * (1 - wt) + plane(t1) * wt
+        return result
+
+    def series(self, lat: float, lon: float, start, hours: int) -> pd.DataFrame:
+        """Ряд погоды в ближайшем узле: hours шагов начиная с ближайшего к start момента.
+
+        start с часовым поясом переводится в UTC. Если данные не покрывают
+        start (исторический архив), ряд сдвигается к ближайшему доступному
+        отрезку.
+        """
+        t, i, j = self.nearest_indices(lat, lon, np.datetime64(utc_naive(start), 'ns'))
+        t_start = max(0, min(int(t[0]), len(self.times) - hours))
+        t_slice = slice(t_start, t_start + hours)
+
+        columns = {
+            'timestamp': self.times[t_slice],
+            'lat': self.lats[i[0]],
+            'lon': self.lons[j[0]],
+        }
+        for k, name in enumerate(self.variables):
+            columns[name] = self.cube[k, t_slice, i[0], j[0]]
+        return pd.DataFrame(columns)
+
+
+class StubWeatherProvider:
+    """Локальная детерминированная замена погодных данных для нагрузочных тестов."""
+
+    variables = ['temp_c', 'wind_speed', 'wind_gust', 'precip', 'cloud_cover']
+
+    @staticmethod
+    def _weather(lat, lon, times: pd.DatetimeIndex) -> Dict[str, np.ndarray]:
+        hour = times.hour.to_numpy()
+        phase = np.sin(np.radians(lat * 7 + lon * 3))
+        wind_speed = 5 + 4 * np.abs(np.sin(2 * np.pi * hour / 24 + phase))
+        return {
+            'temp_c': 10 + 8 * np.sin(2 * np.pi * (hour - 9) / 24) + 5 * phase,
+            'wind_speed': wind_speed,
+            'wind_gust': wind_speed * 1.3,
+            'precip': np.maximum(0, 2 * np.sin(2 * np.pi * hour / 48 + phase) - 1.5),
+            'cloud_cover': 50 + 40 * np.sin(2 * np.pi * hour / 36 + phase),
+        }
+
+    def series(self, lat: float, lon: float, start: pd.Timestamp, hours: int) -> pd.DataFrame:
+        """Возвращает гладкий синтетический ряд погоды, зависящий от точки и времени."""
+        times = pd.date_range(utc_naive(start).floor('h'), periods=hours, freq='h')
+        return pd.DataFrame({'timestamp': times, 'lat': lat, 'lon': lon,
+                             **self._weather(lat, lon, times)})
+
+    def nearest(self, lats, lons, times, variables: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Погода ближайшего часа для массива точек, как WeatherGridIndex.nearest."""
+        times = pd.DatetimeIndex(np.asarray(times, dtype='datetime64[ns]')).round('h')
+        weather = self._weather(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64), times)
+        return {name: weather[name] for name in variables or self.variables}
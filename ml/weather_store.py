@@ -0,0 +1,167 @@
+"""
+Колоночное хранилище погодных данных (Parquet, партиции по дате).
+
+Заменяет повторный разбор data/weather.csv: числовые столбцы хранятся
+как float32, время — как timestamp, чтение идёт через memory-map и
+отбирает только нужные партиции и группы строк по времени и области.
+"""
+
+import glob
+import os
+import shutil
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+
+# Схема партиционирования: каталог date=YYYY-MM-DD на каждый день
+PARTITIONING = pads.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+
+# Ограничивающий прямоугольник: (lat_min, lat_max, lon_min, lon_max)
+BBox = Tuple[float, float, float, float]
+
+
+def _to_arrow(weather_df: pd.DataFrame, float_dtype=np.float32) -> pa.Table:
+    """Приводит погодную таблицу к float_dtype и добавляет столбец партиции date."""
+    df = weather_df.copy()
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    float_cols = df.select_dtypes(include=[np.floating]).columns
+    df[float_cols] = df[float_cols].astype(float_dtype)
+    df['date'] = df['timestamp'].dt.strftime('%Y-%m-%d')
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_weather_store(weather_df: pd.DataFrame, store_dir: str = "data/weather_store",
+                        overwrite: bool = True, part_prefix: str = "part",
+                        float_dtype=np.float32) -> str:
+    """Записывает погодную таблицу в Parquet-хранилище, партиционированное по дате.
+
+    При overwrite=False части дописываются к уже существующему хранилищу,
+    это используется потоковой конвертацией. part_prefix — начало имён
+    файлов-частей, по нему части одного источника можно удалить
+    (remove_store_parts). float_dtype=np.float64 хранит значения без
+    потерь (кэш конвертации), по умолчанию — компактный float32.
+    """
+    if overwrite and os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+
+    pq.write_to_dataset(
+        _to_arrow(weather_df, float_dtype),
+        root_path=store_dir,
+        partition_cols=['date'],
+        # Уникальное имя части, чтобы дозапись не затирала предыдущие куски
+        basename_template=f"{part_prefix}-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    return store_dir
+
+
+def remove_store_parts(store_dir: str, part_prefix: str) -> int:
+    """Удаляет из всех партиций файлы-части с именами part_prefix-*; возвращает их число."""
+    removed = 0
+    for path in glob.glob(os.path.join(store_dir, 'date=*', f"{glob.escape(part_prefix)}-*.parquet")):
+        os.remove(path)
+        removed += 1
+    return removed
+
+
+def _build_filter(start: Optional[pd.Timestamp], end: Optional[pd.Timestamp],
+                  bbox: Optional[BBox]) -> Optional[pc.Expression]:
+    """Строит выражение фильтра для отсечения партиций и групп строк."""
+    conditions = []
+
+    if start is not None:
+        # Сначала отсекаем целые дни по партиции, затем точное время
+        conditions.append(pads.field('date') >= start.strftime('%Y-%m-%d'))
+        conditions.append(pads.field('timestamp') >= pa.scalar(start.to_datetime64()))
+    if end is not None:
+        conditions.append(pads.field('date') <= end.strftime('%Y-%m-%d'))
+        conditions.append(pads.field('timestamp') <= pa.scalar(end.to_datetime64()))
+
+    if bbox is not None:
+        lat_min, lat_max, lon_min, lon_max = bbox
+        conditions.append(pads.field('lat') >= np.float32(lat_min))
+        conditions.append(pads.field('lat') <= np.float32(lat_max))
+        conditions.append(pads.field('lon') >= np.float32(lon_min))
+        conditions.append(pads.field('lon') <= np.float32(lon_max))
+
+    if not conditions:
+        return None
+    expr = conditions[0]
+    for cond in conditions[1:]:
+        expr = expr & cond
+    return expr
+
+
+def open_weather_store(store_dir: str = "data/weather_store") -> pads.Dataset:
+    """Открывает хранилище как pyarrow Dataset с чтением через memory-map."""
+    return pads.dataset(
+        store_dir,
+        format='parquet',
+        partitioning=PARTITIONING,
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def read_weather_store(store_dir: str = "data/weather_store",
+                       start: Optional[str] = None,
+                       end: Optional[str] = None,
+                       bbox: Optional[BBox] = None,
+                       columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Читает срез хранилища по времени [start, end] и области bbox.
+
+    Фильтры передаются в сканер Arrow: лишние дни не открываются вовсе,
+    а группы строк вне диапазона отбрасываются по статистикам Parquet.
+    """
+    dataset = open_weather_store(store_dir)
+    start_ts = pd.Timestamp(start) if start is not None else None
+    end_ts = pd.Timestamp(end) if end is not None else None
+
+    if columns is not None:
+        columns = [c for c in columns if c != 'date']
+    else:
+        columns = [name for name in dataset.schema.names if name != 'date']
+
+    table = dataset.to_table(columns=columns, filter=_build_filter(start_ts, end_ts, bbox))
+    weather_df = table.to_pandas()
+    # Порядок файлов-частей не гарантирован; внутри части порядок сетки сохранён
+    if 'timestamp' in weather_df.columns:
+        weather_df = weather_df.sort_values('timestamp', kind='stable')
+    return weather_df.reset_index(drop=True)
+
+
+def store_dates(store_dir: str = "data/weather_store") -> List[str]:
+    """Список дней (партиций date=...) хранилища по возрастанию."""
+    prefix = 'date='
+    return sorted(name[len(prefix):] for name in os.listdir(store_dir)
+                  if name.startswith(prefix))
+
+
+def iter_weather_batches(store_dir: str = "data/weather_store",
+                         start: Optional[str] = None,
+                         end: Optional[str] = None,
+                         bbox: Optional[BBox] = None,
+                         columns: Optional[List[str]] = None,
+                         batch_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """Потоково читает срез хранилища кусками не больше batch_rows строк.
+
+    В памяти находится только текущий кусок; порядок кусков одинаков при
+    каждом проходе, что нужно для многопроходных итераторов XGBoost.
+    """
+    dataset = open_weather_store(store_dir)
+    start_ts = pd.Timestamp(start) if start is not None else None
+    end_ts = pd.Timestamp(end) if end is not None else None
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != 'date']
+
+    for batch in dataset.to_batches(columns=columns, filter=_build_filter(start_ts, end_ts, bbox),
+                                    batch_size=batch_rows):
+        if batch.num_rows:
+            yield batch.to_pandas()